@@ -1,17 +1,30 @@
-import yaml
+import functools
 from pathlib import Path
-from crewai import Agent
-from crewai_tools import SerperDevTool
+from typing import TYPE_CHECKING
 
-# Importar ferramentas customizadas
-from .tools.llama_cloud_parsing_tool import LlamaParseDirectTool # Importar a ferramenta de parseo
-from .tools import KnowledgeBaseQueryTool
-from .tools import SupabaseDocumentContentTool # Nova ferramenta
+# crewai e as ferramentas (crewai_tools, llama_parse, supabase) são importados no primeiro uso,
+# dentro de CadastroAgents, para que os comandos da CLI não paguem essas importações ao iniciar.
+if TYPE_CHECKING:
+    from crewai import Agent
 
-# Carregar configurações dos agentes do arquivo YAML
+# Configurações dos agentes (arquivo YAML), lidas no primeiro uso
 agents_config_path = Path(__file__).parent / 'config/agents.yaml'
-with open(agents_config_path, 'r', encoding='utf-8') as file:
-    agents_config = yaml.safe_load(file)
+
+
+@functools.lru_cache(maxsize=None)
+def load_agents_config() -> dict:
+    """Lê o agents.yaml uma única vez por processo."""
+    import yaml
+
+    with open(agents_config_path, 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
+def __getattr__(name):
+    # `agents_config` continua disponível como atributo do módulo (lido no primeiro acesso).
+    if name == 'agents_config':
+        return load_agents_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # NÃO instanciar ferramentas aqui a nível de módulo
 # serper_tool = SerperDevTool()
@@ -24,19 +37,32 @@ class CadastroAgents:
     As definições base (role, goal, backstory) são carregadas do agents.yaml.
     As ferramentas são atribuídas aqui.
     """
-    def __init__(self):
+    def __init__(self, llm=None):
+        # Importar ferramentas customizadas
+        from .tools import LlamaParseDirectTool # Ferramenta de parseo
+        from .tools import KnowledgeBaseQueryTool
+        from .tools import SupabaseDocumentContentTool # Nova ferramenta
+        from .tools import CadastroSerperTool # SerperDevTool sem buscas com CNPJ/CPF inválidos
+        from .llm_cache import wrap_llm
+
+        # `llm` (nome do modelo ou instância de BaseLLM) é usado por todos os agentes;
+        # se omitido, o LLM padrão da CrewAI (variáveis de ambiente). Ele é envolvido pelo
+        # cache de respostas (llm_cache.py), salvo com LLM_CACHE_MODE=off.
+        self.llm = wrap_llm(llm)
         # Instanciar ferramentas aqui, dentro do __init__
         # Isto garante que são criadas APÓS load_dotenv() em main.py ter sido chamado,
         # assumindo que CadastroAgents() é chamado depois disso.
         print("INFO (CadastroAgents): Inicializando ferramentas...")
-        self.serper_tool = SerperDevTool()
+        self.serper_tool = CadastroSerperTool()
         self.kb_tool = KnowledgeBaseQueryTool()
         self.supabase_doc_tool = SupabaseDocumentContentTool()
         self.llama_parse_tool = LlamaParseDirectTool() # Instanciar a nova ferramenta
         print("INFO (CadastroAgents): Ferramentas inicializadas.")
 
-    def triagem_validador_agente(self) -> Agent:
-        config = agents_config['triagem_agente']
+    def triagem_validador_agente(self) -> "Agent":
+        from crewai import Agent
+
+        config = load_agents_config()['triagem_agente']
         return Agent(
             role=config['role'],
             goal=config['goal'],
@@ -48,11 +74,13 @@ class CadastroAgents:
                 self.llama_parse_tool, # Adicionar ferramenta de parseo
                 self.kb_tool
             ],
-            # llm=seu_llm_configurado # Opcional: se quiser um LLM específico para este agente
+            llm=self.llm,
         )
 
-    def extrator_info_agente(self) -> Agent:
-        config = agents_config['extrator_agente']
+    def extrator_info_agente(self) -> "Agent":
+        from crewai import Agent
+
+        config = load_agents_config()['extrator_agente']
         return Agent(
             role=config['role'],
             goal=config['goal'],
@@ -63,11 +91,13 @@ class CadastroAgents:
                 self.supabase_doc_tool,
                 self.llama_parse_tool, # Adicionar ferramenta de parseo
             ],
-            # llm=seu_llm_configurado
+            llm=self.llm,
         )
 
-    def analista_risco_agente(self) -> Agent:
-        config = agents_config['risco_agente']
+    def analista_risco_agente(self) -> "Agent":
+        from crewai import Agent
+
+        config = load_agents_config()['risco_agente']
         return Agent(
             role=config['role'],
             goal=config['goal'],
@@ -80,7 +110,7 @@ class CadastroAgents:
                 self.serper_tool,        # Para busca web
                 self.kb_tool             # Para consultar histórico, padrões de fraude, políticas
             ],
-            # llm=seu_llm_configurado
+            llm=self.llm,
         )
 
 # Exemplo de como você poderia usar esta classe em seu crew.py:
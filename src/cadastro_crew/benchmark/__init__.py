@@ -0,0 +1,7 @@
+from .runner import format_report, main, run_benchmark
+
+__all__ = [
+    "run_benchmark",
+    "format_report",
+    "main"
+]
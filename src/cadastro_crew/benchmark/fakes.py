@@ -0,0 +1,285 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallCompletedEvent, LLMCallStartedEvent, LLMCallType
+from crewai.llms.base_llm import BaseLLM
+from llama_index.core.schema import Document
+
+from ..agents import load_agents_config
+from ..tools import CadastroSerperTool, KnowledgeBaseQueryTool, LlamaParseDirectTool, SupabaseDocumentContentTool
+from .fixtures import FixtureCase
+
+# Substitutos locais do LLM, do LlamaParse e do modelo de embedding para o benchmark offline.
+# O ScriptedLLM segue o formato ReAct da CrewAI: chama as ferramentas reais (que falam com o
+# stub HTTP) e devolve respostas finais JSON válidas para os modelos de models.py.
+TOOL_DOCUMENT_INFO = SupabaseDocumentContentTool.model_fields["name"].default
+TOOL_PARSER = LlamaParseDirectTool.model_fields["name"].default
+TOOL_KNOWLEDGE_BASE = KnowledgeBaseQueryTool.model_fields["name"].default
+TOOL_SEARCH = CadastroSerperTool.model_fields["name"].default
+EMBEDDING_DIMENSIONS = 384
+
+# Janelas do CHECKLIST_FIXTURE usadas nas respostas roteirizadas da validação documental.
+_FIXTURE_WINDOWS_DAYS = {"CNPJ": 90, "CertidaoSimplificada": 30, "ComprovanteEnderecoSocio": 92}
+_PARSED_SECTION_RE = re.compile(r"^### Documento: (.+?) \(tipo: ", re.MULTILINE)
+_SHARD_DOCUMENT_RE = re.compile(r"^Documento: (.+?) \(tipo: (\w+)\)", re.MULTILINE)
+_FILE_URL_RE = re.compile(r'"file_url": "([^"]+)"')
+
+
+class HashingEmbedder:
+    """Embedder determinístico (hash de tokens), com a interface encode() do SentenceTransformer."""
+
+    def encode(self, sentences: List[str], convert_to_numpy: bool = True, show_progress_bar: bool = False):
+        vectors = np.zeros((len(sentences), EMBEDDING_DIMENSIONS), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for token in sentence.lower().split():
+                digest = hashlib.md5(token.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS] += 1.0
+            norm = np.linalg.norm(vectors[row])
+            if norm:
+                vectors[row] /= norm
+        return vectors
+
+
+class FixtureParser:
+    """Substituto do LlamaParse: devolve o conteúdo do arquivo baixado (o Markdown da fixture)."""
+
+    def __init__(self, latency_seconds: float, counter: Counter, lock: threading.Lock):
+        self.latency_seconds = latency_seconds
+        self._counter = counter
+        self._lock = lock
+
+    def _documents(self, path: str) -> List[Document]:
+        with self._lock:
+            self._counter["parse"] += 1
+        with open(path, "r", encoding="utf-8") as f:
+            return [Document(text=f.read())]
+
+    def load_data(self, path: str) -> List[Document]:
+        time.sleep(self.latency_seconds)
+        return self._documents(path)
+
+    async def aload_data(self, path: str) -> List[Document]:
+        await asyncio.sleep(self.latency_seconds)
+        return self._documents(path)
+
+
+class FixtureParseTool(LlamaParseDirectTool):
+    """
+    LlamaParseDirectTool com o parser de fixture: download (stub HTTP), hash e cache de
+    parseamento são os reais; só a chamada ao LlamaCloud é substituída.
+    """
+    parse_latency_seconds: float = 0.0
+
+    def __init__(self, parse_latency_seconds: float = 0.0, **kwargs: Any):
+        super().__init__(llama_cloud_api_key="offline-benchmark", parse_latency_seconds=parse_latency_seconds, **kwargs)
+        self._calls = Counter()
+        self._calls_lock = threading.Lock()
+
+    def _get_parser_instance(self, preset, language, result_as_markdown, timeout=None, parsing_instructions=None):
+        return FixtureParser(self.parse_latency_seconds, self._calls, self._calls_lock)
+
+    def parse_count(self) -> int:
+        with self._calls_lock:
+            return self._calls["parse"]
+
+
+def _action(thought: str, tool: str, arguments: Dict[str, Any]) -> str:
+    return f"Thought: {thought}\nAction: {tool}\nAction Input: {json.dumps(arguments, ensure_ascii=False)}"
+
+
+def _final_answer(payload: Dict[str, Any]) -> str:
+    return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(payload, ensure_ascii=False)}"
+
+
+class ScriptedLLM(BaseLLM):
+    """
+    LLM roteirizado para o benchmark: identifica o agente (pelo role no prompt de sistema) e
+    o caso (pelo case_id ou CNPJ citados), conta os passos já concluídos e responde com a
+    próxima ação do roteiro ou com a resposta final. `latency_seconds` simula o tempo do modelo.
+    Emite os eventos LLMCallStarted/Completed como o LLM da CrewAI (usados pelo tracing.py).
+    """
+
+    def __init__(self, cases: List[FixtureCase], latency_seconds: float = 0.0, current_date: Optional[date] = None):
+        super().__init__(model="scripted-offline")
+        self.cases = cases
+        self.latency_seconds = latency_seconds
+        self.current_date = current_date or date.today()
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+        agents_config = load_agents_config()
+        self._roles = {
+            agents_config["triagem_agente"]["role"]: "validacao",
+            agents_config["extrator_agente"]["role"]: "extracao",
+            agents_config["risco_agente"]["role"]: "risco",
+        }
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def call_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.calls)
+
+    def _find_case(self, text: str) -> FixtureCase:
+        for case in self.cases:
+            if case.case_id in text:
+                return case
+        for case in self.cases:
+            if case.cnpj in text:
+                return case
+        raise ValueError("ScriptedLLM: nenhum caso de fixture citado no prompt.")
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(
+            messages=messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, model=self.model,
+        ))
+        response = self._respond(messages)
+        crewai_event_bus.emit(self, event=LLMCallCompletedEvent(
+            messages=messages, response=response, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, model=self.model,
+        ))
+        return response
+
+    def _respond(self, messages: List[Dict[str, Any]]) -> str:
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        text = "\n".join(str(m.get("content") or "") for m in messages)
+        # Cada passo concluído (ação + observação da ferramenta) é uma mensagem do assistente.
+        steps = sum(1 for m in messages if m.get("role") == "assistant")
+        kind = next((k for role, k in self._roles.items() if role in system), None)
+        if kind is None and _SHARD_DOCUMENT_RE.search(text):
+            kind = "extracao_documento"
+        with self._lock:
+            self.calls[kind or "outro"] += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        case = self._find_case(text)
+        if kind == "extracao_documento":
+            return self._shard_extraction(case, text)
+        if kind == "validacao":
+            return self._read_documents(case, text, steps) or self._validation(case, text, steps)
+        if kind == "extracao":
+            return self._read_documents(case, text, steps) or _final_answer(self._dossier(case))
+        return self._risk(case, steps)
+
+    # --- Roteiros ---
+
+    def _pending_documents(self, case: FixtureCase, text: str) -> List[str]:
+        parsed = set(_PARSED_SECTION_RE.findall(text))
+        return [doc.name for doc in case.documents if doc.name not in parsed]
+
+    def _read_documents(self, case: FixtureCase, text: str, steps: int) -> Optional[str]:
+        """Para cada documento não pré-parseado: Supabase Document Info Retriever e depois o parser."""
+        pending = self._pending_documents(case, text)
+        if steps >= 2 * len(pending):
+            return None
+        name = pending[steps // 2]
+        if steps % 2 == 0:
+            return _action(f"Preciso da URL de '{name}'.", TOOL_DOCUMENT_INFO, {"document_name": name, "case_id": case.case_id})
+        urls = _FILE_URL_RE.findall(text)
+        return _action(f"Vou parsear '{name}'.", TOOL_PARSER, {"document_url": urls[-1] if urls else ""})
+
+    def _age_days(self, issue_date: date) -> int:
+        return (self.current_date - issue_date).days
+
+    def _expired(self, case: FixtureCase) -> List[str]:
+        return [
+            doc.name for doc in case.documents
+            if doc.crew_type in _FIXTURE_WINDOWS_DAYS and self._age_days(doc.issue_date) > _FIXTURE_WINDOWS_DAYS[doc.crew_type]
+        ]
+
+    def _validation(self, case: FixtureCase, text: str, steps: int) -> str:
+        read_steps = 2 * len(self._pending_documents(case, text))
+        if steps == read_steps:
+            return _action("Vou consultar a política de validade.", TOOL_KNOWLEDGE_BASE,
+                           {"query": "validade de comprovante de endereço e cartão CNPJ", "top_k": 3})
+        expired = set(self._expired(case))
+        itens = [
+            {
+                "itemChecklist": doc.crew_type,
+                "documentoEncontrado": "Sim",
+                "arquivosAnalisados": [doc.name],
+                "status": "Não Conforme" if doc.name in expired else "Conforme",
+                "observacoes": f"Emitido há {self._age_days(doc.issue_date)} dias." if doc.name in expired else "",
+                "referenciaKnowledgeBase": "politica_cadastro.md",
+            }
+            for doc in case.documents
+        ]
+        itens.append({"itemChecklist": "Faturamento", "documentoEncontrado": "Não", "arquivosAnalisados": [],
+                      "status": "Pendência", "observacoes": "Relação de faturamento não enviada."})
+        return _final_answer({"itens": itens})
+
+    def _company(self, case: FixtureCase) -> Dict[str, Any]:
+        return {
+            "razaoSocial": case.razao_social,
+            "cnpj": case.cnpj,
+            "dataConstituicao": case.data_constituicao.isoformat(),
+            "enderecoSede": case.endereco,
+            "naturezaJuridica": "206-2 - Sociedade Empresária Limitada",
+            "capitalSocial": case.capital_social,
+            "objetoSocial": "prestação de serviços de tecnologia da informação",
+            "situacaoCadastral": "ATIVA",
+        }
+
+    def _socios(self, case: FixtureCase) -> List[Dict[str, Any]]:
+        return [
+            {"nomeCompleto": s.nome, "cpf": s.cpf, "enderecoResidencial": s.endereco,
+             "participacaoSocietaria": s.participacao, "cargo": "Sócio Administrador", "nacionalidade": "BRASILEIRA"}
+            for s in case.socios
+        ]
+
+    def _dossier(self, case: FixtureCase) -> Dict[str, Any]:
+        return {
+            "dadosPessoaJuridica": self._company(case),
+            "dadosSociosRepresentantes": self._socios(case),
+            "dadosFinanceiros": {},
+            "outrasInformacoes": {"numeroRegistroContrato": f"3522{case.cnpj[:6].replace('.', '')}"},
+        }
+
+    def _shard_extraction(self, case: FixtureCase, text: str) -> str:
+        name, doc_type = _SHARD_DOCUMENT_RE.search(text).groups()
+        doc = case.document(name)
+        socios = self._socios(case)
+        if doc_type in ("DocumentoIdentificacaoSocio", "ComprovanteEnderecoSocio"):
+            socios = socios[:1]
+        payload = {
+            "dataEmissao": doc.issue_date.isoformat(),
+            "dadosPessoaJuridica": self._company(case),
+            "socios": socios,
+            "outrasInformacoes": self._dossier(case)["outrasInformacoes"],
+        }
+        return json.dumps(payload, ensure_ascii=False)
+
+    def _risk(self, case: FixtureCase, steps: int) -> str:
+        script = [
+            (TOOL_SEARCH, {"search_query": f"CNPJ {case.cnpj} {case.razao_social}"}),
+            (TOOL_SEARCH, {"search_query": f"{case.socios[0].nome} processos"}),
+            (TOOL_KNOWLEDGE_BASE, {"query": "padrões de fraude em divergência de endereço", "top_k": 3}),
+        ]
+        if steps < len(script):
+            tool, arguments = script[steps]
+            return _action("Preciso de mais informações externas.", tool, arguments)
+        expired = self._expired(case)
+        score = "Baixo" if not expired else "Médio" if len(expired) <= 2 else "Alto"
+        return _final_answer({
+            "sumarioCaso": f"Caso {case.case_id}: {case.razao_social}, CNPJ {case.cnpj}.",
+            "pendenciasCriticas": [f"{name} fora do prazo de validade" for name in expired] + ["Faturamento não enviado"],
+            "inconsistencias": [],
+            "verificacaoExterna": {"cnpj": "Situação cadastral ATIVA.", "socios": "Nenhuma restrição pública encontrada."},
+            "insightsKnowledgeBase": "Comprovantes com mais de 90 dias devem ser reapresentados.",
+            "parecerRisco": "Aprovação condicionada à regularização das pendências documentais.",
+            "scoreRisco": score,
+            "pontuacaoRisco": min(100, 20 + 20 * len(expired)),
+        })
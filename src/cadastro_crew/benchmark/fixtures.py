@@ -0,0 +1,227 @@
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List
+
+from ..identifiers import format_cnpj, format_cpf, is_valid_cnpj, is_valid_cpf
+
+# Casos sintéticos do benchmark offline: linhas das tabelas 'documents', 'app_configs' e
+# 'knowledge_base_chunks' servidas pelo stub PostgREST, e o Markdown "parseado" de cada documento.
+CHECKLIST_CONFIG_NAME = "checklist_cadastro_pj"
+CASE_ID_PREFIX = "BENCH"
+
+CHECKLIST_FIXTURE = """# Checklist Cadastro PJ
+
+## Documentos da Empresa
+- Cartão CNPJ emitido nos últimos 90 dias, com situação cadastral ativa.
+- Contrato Social ou última alteração contratual consolidada, contendo objeto social, capital social e administração.
+- Certidão Simplificada da Junta Comercial com defasagem máxima de 30 dias.
+- QSA (Quadro de Sócios e Administradores) atualizado.
+
+## Documentos dos Sócios
+- Documento oficial com foto (RG ou CNH) de todos os sócios e administradores.
+- Comprovante de residência dos sócios com defasagem máxima de 3 meses em relação à data atual.
+
+## Financeiro
+- Relação de faturamento dos últimos 12 meses assinada pelo contador e pelo representante legal.
+"""
+
+KB_CHUNKS_FIXTURE = [
+    {"id": 1, "content": "Política de cadastro: comprovantes de endereço com mais de 90 dias devem ser reapresentados.",
+     "metadata": {"fonte": "politica_cadastro.md"}},
+    {"id": 2, "content": "Padrão de fraude: divergência entre o endereço do cartão CNPJ e o do contrato social em empresas recém-abertas.",
+     "metadata": {"fonte": "padroes_fraude.md"}},
+    {"id": 3, "content": "Sócios com CPF em situação irregular exigem análise manual do comitê de crédito.",
+     "metadata": {"fonte": "politica_risco.md"}},
+    {"id": 4, "content": "Capital social inferior a R$ 10.000,00 em empresas de serviços financeiros eleva o score de risco.",
+     "metadata": {"fonte": "politica_risco.md"}},
+]
+
+_FIRST_NAMES = ["ANA", "BRUNO", "CARLA", "DIEGO", "ELISA", "FABIO", "GABRIELA", "HUGO", "ISABEL", "JOAO"]
+_LAST_NAMES = ["SILVA", "SOUZA", "OLIVEIRA", "PEREIRA", "COSTA", "RODRIGUES", "ALMEIDA", "NASCIMENTO", "LIMA", "ARAUJO"]
+_STREETS = ["RUA DAS FLORES", "AVENIDA PAULISTA", "RUA AUGUSTA", "AVENIDA BRASIL", "RUA DO COMERCIO"]
+_CITIES = ["SAO PAULO/SP", "CAMPINAS/SP", "CURITIBA/PR", "BELO HORIZONTE/MG", "PORTO ALEGRE/RS"]
+
+# (document_tag, tipo na crew, nome do arquivo)
+_DOCUMENT_LAYOUT = [
+    ("cnpj", "CNPJ", "1- CNPJ.pdf"),
+    ("contrato_social", "ContratoSocial", "2- CONTRATO SOCIAL.pdf"),
+    ("certidao_simplificada", "CertidaoSimplificada", "3- CERTIDAO SIMPLIFICADA.pdf"),
+    ("qsa", "QuadroSocietario", "4- QSA.pdf"),
+    ("doc_id_socio", "DocumentoIdentificacaoSocio", "5- RG SOCIO.pdf"),
+    ("comp_endereco_socio", "ComprovanteEnderecoSocio", "6- COMPROVANTE ENDERECO SOCIO.pdf"),
+]
+
+
+@dataclass
+class FixtureSocio:
+    nome: str
+    cpf: str
+    endereco: str
+    participacao: str
+
+
+@dataclass
+class FixtureDocument:
+    name: str
+    document_tag: str
+    crew_type: str
+    issue_date: date
+    markdown: str
+
+
+@dataclass
+class FixtureCase:
+    case_id: str
+    razao_social: str
+    cnpj: str
+    endereco: str
+    capital_social: str
+    data_constituicao: date
+    socios: List[FixtureSocio]
+    documents: List[FixtureDocument] = field(default_factory=list)
+
+    def document(self, name: str) -> FixtureDocument:
+        return next(doc for doc in self.documents if doc.name == name)
+
+
+def _random_cnpj(rng: random.Random) -> str:
+    while True:
+        base = "".join(str(rng.randint(0, 9)) for _ in range(8)) + "0001"
+        for suffix in range(100):
+            candidate = f"{base}{suffix:02d}"
+            if is_valid_cnpj(candidate):
+                return format_cnpj(candidate)
+
+
+def _random_cpf(rng: random.Random) -> str:
+    while True:
+        base = "".join(str(rng.randint(0, 9)) for _ in range(9))
+        for suffix in range(100):
+            candidate = f"{base}{suffix:02d}"
+            if is_valid_cpf(candidate):
+                return format_cpf(candidate)
+
+
+def _br(value: date) -> str:
+    return value.strftime("%d/%m/%Y")
+
+
+def _document_markdown(case: FixtureCase, crew_type: str, issue_date: date) -> str:
+    socios_table = "\n".join(
+        f"| {s.nome} | {s.cpf} | Sócio Administrador | {s.participacao} |" for s in case.socios
+    )
+    principal = case.socios[0]
+    if crew_type == "CNPJ":
+        return (
+            "# COMPROVANTE DE INSCRIÇÃO E DE SITUAÇÃO CADASTRAL\n\n"
+            f"**NÚMERO DE INSCRIÇÃO:** {case.cnpj} MATRIZ\n\n"
+            f"**DATA DE ABERTURA:** {_br(case.data_constituicao)}\n\n"
+            f"**NOME EMPRESARIAL:** {case.razao_social}\n\n"
+            "**NATUREZA JURÍDICA:** 206-2 - Sociedade Empresária Limitada\n\n"
+            f"**LOGRADOURO:** {case.endereco}\n\n"
+            "**SITUAÇÃO CADASTRAL:** ATIVA\n\n"
+            f"Emitido no dia {_br(issue_date)} às 10:15:00 (data e hora de Brasília).\n"
+        )
+    if crew_type in ("ContratoSocial", "CertidaoSimplificada"):
+        title = "CONTRATO SOCIAL" if crew_type == "ContratoSocial" else "CERTIDÃO SIMPLIFICADA"
+        return (
+            f"# {title}\n\n"
+            f"**{case.razao_social}** - CNPJ {case.cnpj}\n\n"
+            f"Sede: {case.endereco}\n\n"
+            f"Capital social: {case.capital_social}\n\n"
+            "Objeto social: prestação de serviços de tecnologia da informação.\n\n"
+            "| Sócio | CPF | Cargo | Participação |\n|---|---|---|---|\n"
+            f"{socios_table}\n\n"
+            f"NIRE 3522{case.cnpj[:6].replace('.', '')}. Data de emissão: {_br(issue_date)}.\n"
+        )
+    if crew_type == "QuadroSocietario":
+        return (
+            "# QUADRO DE SÓCIOS E ADMINISTRADORES - QSA\n\n"
+            f"CNPJ: {case.cnpj} - {case.razao_social}\n\n"
+            f"Capital social: {case.capital_social}\n\n"
+            "| Nome | CPF | Qualificação | Participação |\n|---|---|---|---|\n"
+            f"{socios_table}\n\n"
+            f"Emitido em {_br(issue_date)}.\n"
+        )
+    if crew_type == "DocumentoIdentificacaoSocio":
+        return (
+            "# REPÚBLICA FEDERATIVA DO BRASIL - CARTEIRA DE IDENTIDADE\n\n"
+            f"NOME: {principal.nome}\n\nCPF: {principal.cpf}\n\n"
+            "RG: 12.345.678-9 SSP/SP\n\nNACIONALIDADE: BRASILEIRA\n\n"
+            f"DATA DE EXPEDIÇÃO: {_br(issue_date)}\n"
+        )
+    return (
+        "# CONTA DE ENERGIA ELÉTRICA\n\n"
+        f"Titular: {principal.nome}\n\nEndereço: {principal.endereco}\n\n"
+        f"Mês de referência: {issue_date.strftime('%m/%Y')}\n\n"
+        f"Data de emissão: {_br(issue_date)}\n"
+    )
+
+
+def build_cases(count: int, seed: int = 42, today: date | None = None) -> List[FixtureCase]:
+    """
+    Gera `count` casos determinísticos (mesma `seed`, mesmos casos), com CNPJ/CPF válidos,
+    um documento de cada tipo mapeado em main.get_documents_for_case e datas de emissão
+    dentro e fora das janelas do CHECKLIST_FIXTURE.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    cases = []
+    for index in range(1, count + 1):
+        socios = [
+            FixtureSocio(
+                nome=f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)} {rng.choice(_LAST_NAMES)}",
+                cpf=_random_cpf(rng),
+                endereco=f"{rng.choice(_STREETS)}, {rng.randint(10, 2000)}, {rng.choice(_CITIES)}",
+                participacao=participacao,
+            )
+            for participacao in ("60%", "40%")
+        ]
+        case = FixtureCase(
+            case_id=f"{CASE_ID_PREFIX}-{index:04d}",
+            razao_social=f"{rng.choice(_LAST_NAMES)} {rng.choice(['TECNOLOGIA', 'SERVICOS', 'COMERCIO'])} LTDA",
+            cnpj=_random_cnpj(rng),
+            endereco=f"{rng.choice(_STREETS)}, {rng.randint(10, 2000)}, {rng.choice(_CITIES)}",
+            capital_social=f"R$ {rng.choice([5, 50, 100, 500])}.000,00",
+            data_constituicao=today - timedelta(days=rng.randint(200, 4000)),
+            socios=socios,
+        )
+        for tag, crew_type, name in _DOCUMENT_LAYOUT:
+            issue_date = today - timedelta(days=rng.randint(1, 150))
+            case.documents.append(FixtureDocument(
+                name=name,
+                document_tag=tag,
+                crew_type=crew_type,
+                issue_date=issue_date,
+                markdown=_document_markdown(case, crew_type, issue_date),
+            ))
+        cases.append(case)
+    return cases
+
+
+def document_rows(cases: List[FixtureCase], files_base_url: str) -> List[Dict]:
+    """Linhas da tabela 'documents' (case_id, name, document_tag, file_url)."""
+    return [
+        {
+            "case_id": case.case_id,
+            "name": doc.name,
+            "document_tag": doc.document_tag,
+            "file_url": f"{files_base_url}/{case.case_id}/{index}.pdf",
+        }
+        for case in cases
+        for index, doc in enumerate(case.documents)
+    ]
+
+
+def file_contents(cases: List[FixtureCase]) -> Dict[str, bytes]:
+    """Conteúdo servido em /files/<case_id>/<n>.pdf (o Markdown do documento, lido pelo parser de fixture)."""
+    return {
+        f"{case.case_id}/{index}.pdf": doc.markdown.encode("utf-8")
+        for case in cases
+        for index, doc in enumerate(case.documents)
+    }
+
+
+def app_config_rows(updated_at: str = "2025-01-01T00:00:00+00:00") -> List[Dict]:
+    return [{"config_name": CHECKLIST_CONFIG_NAME, "content": CHECKLIST_FIXTURE, "updated_at": updated_at}]
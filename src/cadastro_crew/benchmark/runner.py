@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .fixtures import CHECKLIST_CONFIG_NAME, KB_CHUNKS_FIXTURE, app_config_rows, build_cases, document_rows, file_contents
+from .stub_server import ROUTE_FILES, ROUTE_POSTGREST, ROUTE_RPC, ROUTE_SERPER, StubBackend, StubServer
+
+# Latências simuladas padrão (ms) dos serviços substituídos pelos stubs.
+SUPABASE_LATENCY_MS_DEFAULT = 20
+FILES_LATENCY_MS_DEFAULT = 30
+SERPER_LATENCY_MS_DEFAULT = 150
+PARSE_LATENCY_MS_DEFAULT = 800
+LLM_LATENCY_MS_DEFAULT = 400
+# Porta fixa do servidor de stubs quando o cache do LLM está ligado: as URLs dos documentos
+# entram nas mensagens (e portanto nas chaves do cache), então gravação e replay precisam da mesma porta.
+STUB_PORT_LLM_CACHE_DEFAULT = 18765
+BENCHMARK_SUPABASE_KEY = "offline.benchmark.key"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo (MB), ou None onde o módulo resource não existe."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes no macOS, KB no Linux
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    import numpy as np
+
+    if not seconds:
+        return {}
+    values = np.asarray(seconds, dtype=float)
+    summary = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES}
+    summary.update(mean=round(float(values.mean()), 3), max=round(float(values.max()), 3))
+    return summary
+
+
+def _configure_environment(server_url: str, work_dir: Path, options: Dict[str, Any]) -> None:
+    """
+    Aponta o pipeline para os stubs locais. Deve rodar antes de criar as ferramentas
+    (CadastroAgents), que leem o ambiente na instanciação.
+    """
+    os.environ.update({
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+        "CREWAI_TRACING_ENABLED": "false",
+        "CREWAI_TESTING": "true",  # sem o prompt interativo de traces da primeira execução (espera 20s)
+        "SUPABASE_URL": server_url,
+        "SUPABASE_SERVICE_KEY": BENCHMARK_SUPABASE_KEY,
+        "SERPER_BASE_URL": server_url,
+        "SERPER_API_KEY": "offline-benchmark",
+        "LLAMA_CLOUD_API_KEY": "offline-benchmark",
+        "KB_BACKEND": "supabase",
+        "CADASTRO_CACHE_DIR": str(work_dir / "cache"),
+        "CONTEXT_ARCHIVE_DIR": str(work_dir / "context_archive"),
+        "TRACE_DIR": str(work_dir / "traces"),
+    })
+    if options.get("cold"):
+        os.environ.update({"PARSE_CACHE_ENABLED": "false", "SERPER_CACHE_ENABLED": "false"})
+    for name, value in (("PRE_PARSE_DOCUMENTS", options.get("pre_parse")),
+                        ("PARALLEL_TASKS", options.get("parallel_tasks"))):
+        if value is not None:
+            os.environ[name] = "true" if value else "false"
+    # O cache de respostas do LLM fica desligado, salvo pedido explícito: com ele os níveis de
+    # concorrência seguintes ao primeiro não chamariam o LLM roteirizado.
+    os.environ["LLM_CACHE_MODE"] = options.get("llm_cache") or "off"
+    if options.get("extraction_mode"):
+        os.environ["EXTRACTION_MODE"] = options["extraction_mode"]
+
+
+class _ToolCallCounter:
+    """Conta as chamadas de ferramentas dos agentes (eventos ToolUsageFinished/Error da CrewAI)."""
+
+    def __init__(self):
+        from crewai.events import ToolUsageErrorEvent, ToolUsageFinishedEvent, crewai_event_bus
+
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def _on_finished(_source, event):
+            self._count(f"{event.tool_name}{' (cache da crew)' if event.from_cache else ''}")
+
+        @crewai_event_bus.on(ToolUsageErrorEvent)
+        def _on_error(_source, event):
+            self._count(f"{event.tool_name} (erro)")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+
+    def snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self.calls)
+
+
+def run_benchmark(
+    cases: int = 8,
+    concurrency_levels: Optional[List[int]] = None,
+    seed: int = 42,
+    latencies_ms: Optional[Dict[str, float]] = None,
+    work_dir: Optional[Path] = None,
+    keep_work_dir: bool = False,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Executa a CadastroCrew de ponta a ponta contra os stubs locais: Supabase (PostgREST,
+    arquivos e match_kb_chunks) e Serper num servidor HTTP em processo, LlamaParse substituído
+    pelo parser de fixture e o LLM pelo ScriptedLLM. Os casos passam pelo mesmo caminho do
+    run_batch (main._run_single_case). Para cada nível de concorrência, mede latência por caso
+    (percentis), vazão, pico de RSS e as chamadas de ferramentas, LLM e backends.
+    Os caches persistentes ficam num diretório temporário e são compartilhados pelos níveis
+    (o primeiro nível roda a frio); `cold=True` desabilita os caches de parseamento e do Serper.
+    Opções: pre_parse, parallel_tasks, extraction_mode (sobrescrevem as variáveis de ambiente) e
+    llm_cache ("all" grava as respostas do ScriptedLLM no cache; "replay" roda só a partir do
+    cache, sem LLM; use o mesmo `work_dir` nas duas execuções) e stub_port.
+    """
+    concurrency_levels = concurrency_levels or [1, 4]
+    latencies_ms = {
+        "supabase": SUPABASE_LATENCY_MS_DEFAULT, "files": FILES_LATENCY_MS_DEFAULT, "serper": SERPER_LATENCY_MS_DEFAULT,
+        "parse": PARSE_LATENCY_MS_DEFAULT, "llm": LLM_LATENCY_MS_DEFAULT, **(latencies_ms or {}),
+    }
+    owns_work_dir = work_dir is None
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix="cadastro-benchmark-"))
+    fixture_cases = build_cases(cases, seed=seed)
+    backend = StubBackend(
+        tables={"documents": [], "app_configs": app_config_rows()},
+        files=file_contents(fixture_cases),
+        kb_chunks=KB_CHUNKS_FIXTURE,
+        latencies={
+            ROUTE_POSTGREST: latencies_ms["supabase"] / 1000, ROUTE_RPC: latencies_ms["supabase"] / 1000,
+            ROUTE_FILES: latencies_ms["files"] / 1000, ROUTE_SERPER: latencies_ms["serper"] / 1000,
+        },
+    )
+    stub_port = options.get("stub_port")
+    if stub_port is None:
+        stub_port = STUB_PORT_LLM_CACHE_DEFAULT if options.get("llm_cache") not in (None, "off") else 0
+    server = StubServer(backend, port=stub_port).start()
+    backend.tables["documents"] = document_rows(fixture_cases, f"{server.url}/files")
+    _configure_environment(server.url, work_dir, options)
+
+    # Imports tardios: as ferramentas leem o ambiente configurado acima.
+    from ..agents import CadastroAgents
+    from ..checklist import load_checklist
+    from ..clients import get_supabase_client
+    from ..ledger import load_ledgers, summarize_ledgers
+    from ..main import _run_single_case
+    from ..tools.embeddings import EMBEDDING_MODEL_NAME_DEFAULT, register_embedding_model
+    from .fakes import FixtureParseTool, HashingEmbedder, ScriptedLLM
+
+    register_embedding_model(os.getenv("EMBEDDING_MODEL_NAME", EMBEDDING_MODEL_NAME_DEFAULT), HashingEmbedder())
+    llm = ScriptedLLM(fixture_cases, latency_seconds=latencies_ms["llm"] / 1000, current_date=date.today())
+    agents_manager = CadastroAgents(llm=llm)
+    agents_manager.llama_parse_tool = FixtureParseTool(parse_latency_seconds=latencies_ms["parse"] / 1000)
+    tool_counter = _ToolCallCounter()
+    client = get_supabase_client()
+    checklist = load_checklist(client, CHECKLIST_CONFIG_NAME)
+
+    report: Dict[str, Any] = {
+        "config": {
+            "cases": cases, "seed": seed, "latencies_ms": latencies_ms, "cold": bool(options.get("cold")),
+            "pre_parse": os.getenv("PRE_PARSE_DOCUMENTS", "false"), "parallel_tasks": os.getenv("PARALLEL_TASKS", "false"),
+            "extraction_mode": os.getenv("EXTRACTION_MODE", "single"), "checklist_rules": len(checklist.rules),
+            "llm_cache": os.getenv("LLM_CACHE_MODE"),
+        },
+        "levels": [],
+    }
+    try:
+        for concurrency in concurrency_levels:
+            backend.reset_counts()
+            llm_before, tools_before = Counter(llm.call_counts()), tool_counter.snapshot()
+            parses_before = agents_manager.llama_parse_tool.parse_count()
+            reports_dir = work_dir / "reports" / f"concurrency_{concurrency}"
+            started_at = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="benchmark-case") as executor:
+                results = list(executor.map(
+                    lambda case: _run_single_case(case.case_id, client, checklist, agents_manager, reports_dir),
+                    fixture_cases,
+                ))
+            wall_seconds = time.perf_counter() - started_at
+            statuses = Counter(r["status"] for r in results)
+            report["levels"].append({
+                "concurrency": concurrency,
+                "cases": len(results),
+                "status": dict(statuses),
+                "wall_seconds": round(wall_seconds, 3),
+                "throughput_cases_per_hour": round(len(results) / wall_seconds * 3600, 1),
+                "latency_seconds": latency_summary([r["seconds"] for r in results if r["status"] == "ok"]),
+                "peak_rss_mb": peak_rss_mb(),
+                "llm_calls": dict(Counter(llm.call_counts()) - llm_before),
+                "llm_cache": agents_manager.llm.stats() if hasattr(agents_manager.llm, "stats") else None,
+                "tool_calls": dict(tool_counter.snapshot() - tools_before),
+                "parser_calls": agents_manager.llama_parse_tool.parse_count() - parses_before,
+                "backend_requests": backend.request_counts(),
+                "errors": [f"{r['case_id']}: {r['error']}" for r in results if r["error"]],
+                "ledger": summarize_ledgers(load_ledgers(r["ledger"] for r in results if r.get("ledger"))),
+            })
+    finally:
+        server.stop()
+        if owns_work_dir and not keep_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Resumo legível do relatório do benchmark (uma seção por nível de concorrência)."""
+    config = report["config"]
+    lines = [
+        f"Benchmark offline: {config['cases']} casos, extração {config['extraction_mode']}, "
+        f"pré-parseamento {config['pre_parse']}, tarefas paralelas {config['parallel_tasks']}, "
+        f"caches {'desabilitados' if config['cold'] else 'habilitados'}.",
+        f"Latências simuladas (ms): {json.dumps(config['latencies_ms'])}",
+    ]
+    for level in report["levels"]:
+        latency = level["latency_seconds"]
+        lines += [
+            "",
+            f"Concorrência {level['concurrency']}: {level['status']} em {level['wall_seconds']:.1f}s "
+            f"({level['throughput_cases_per_hour']:.0f} casos/hora), pico de RSS {level['peak_rss_mb']} MB",
+            "  Latência por caso (s): " + (", ".join(f"{k}={v}" for k, v in latency.items()) if latency else "-"),
+            f"  Chamadas ao LLM: {level['llm_calls']}"
+            + (f" | Cache do LLM (acumulado): {level['llm_cache']}" if level.get("llm_cache") else ""),
+            f"  Chamadas de ferramentas: {level['tool_calls']}",
+            f"  Parser: {level['parser_calls']} | Backends: {level['backend_requests']}",
+        ]
+        ledger = level.get("ledger") or {}
+        if ledger.get("cases"):
+            lines.append(
+                f"  Ledger por caso: tokens prompt={ledger['prompt_tokens'].get('mean')} "
+                f"completion={ledger['completion_tokens'].get('mean')}, páginas={ledger['llamaparse']['pages'] / ledger['cases']:g}, "
+                f"cache KB={ledger['knowledge_base']['cache_hit_ratio']} Serper={ledger['serper']['cache_hit_ratio']}"
+            )
+        lines += [f"  ERRO {error}" for error in level["errors"]]
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Uso:
+        benchmark --cases 8 --concurrency 1,4,8
+        benchmark --llm-latency-ms 0 --parse-latency-ms 0 --output reports/benchmark.json
+        benchmark --pre-parse --parallel-tasks --extraction-mode sharded --cold
+        benchmark --work-dir /tmp/bench --llm-cache all && benchmark --work-dir /tmp/bench --llm-cache replay
+    """
+    parser = argparse.ArgumentParser(prog="benchmark", description="Benchmark offline da CadastroCrew (stubs locais).")
+    parser.add_argument("--cases", type=int, default=8, help="número de casos sintéticos (padrão: 8)")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="níveis de concorrência, ex: 1,4,8")
+    parser.add_argument("--seed", type=int, default=42, help="semente dos casos sintéticos")
+    parser.add_argument("--supabase-latency-ms", type=float, default=SUPABASE_LATENCY_MS_DEFAULT)
+    parser.add_argument("--files-latency-ms", type=float, default=FILES_LATENCY_MS_DEFAULT)
+    parser.add_argument("--serper-latency-ms", type=float, default=SERPER_LATENCY_MS_DEFAULT)
+    parser.add_argument("--parse-latency-ms", type=float, default=PARSE_LATENCY_MS_DEFAULT)
+    parser.add_argument("--llm-latency-ms", type=float, default=LLM_LATENCY_MS_DEFAULT)
+    parser.add_argument("--pre-parse", action=argparse.BooleanOptionalAction, default=None,
+                        help="força PRE_PARSE_DOCUMENTS (padrão: variável de ambiente)")
+    parser.add_argument("--parallel-tasks", action=argparse.BooleanOptionalAction, default=None,
+                        help="força PARALLEL_TASKS (padrão: variável de ambiente)")
+    parser.add_argument("--extraction-mode", choices=["single", "sharded"], default=None,
+                        help="força EXTRACTION_MODE (padrão: variável de ambiente)")
+    parser.add_argument("--llm-cache", choices=["off", "tasks", "all", "replay"], default=None,
+                        help="LLM_CACHE_MODE do benchmark (padrão: off); replay roda sem LLM a partir do cache")
+    parser.add_argument("--stub-port", type=int, default=None,
+                        help=f"porta do servidor de stubs (padrão: livre; {STUB_PORT_LLM_CACHE_DEFAULT} com --llm-cache)")
+    parser.add_argument("--cold", action="store_true", help="desabilita os caches persistentes de parseamento e do Serper")
+    parser.add_argument("--work-dir", type=Path, default=None, help="diretório de trabalho (padrão: temporário, removido ao fim)")
+    parser.add_argument("--output", type=Path, default=None, help="grava o relatório completo em JSON")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        cases=args.cases,
+        concurrency_levels=args.concurrency,
+        seed=args.seed,
+        latencies_ms={
+            "supabase": args.supabase_latency_ms, "files": args.files_latency_ms, "serper": args.serper_latency_ms,
+            "parse": args.parse_latency_ms, "llm": args.llm_latency_ms,
+        },
+        work_dir=args.work_dir,
+        keep_work_dir=args.work_dir is not None,
+        pre_parse=args.pre_parse,
+        parallel_tasks=args.parallel_tasks,
+        extraction_mode=args.extraction_mode,
+        llm_cache=args.llm_cache,
+        stub_port=args.stub_port,
+        cold=args.cold,
+    )
+    print("\n---\nRESULTADO DO BENCHMARK:\n")
+    print(format_report(report))
+    print("---")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"INFO: Relatório do benchmark salvo em: {args.output}")
@@ -0,0 +1,168 @@
+import json
+import time
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# Stub HTTP local do benchmark offline. Imita o suficiente do PostgREST do Supabase para os
+# acessos do pipeline (select/eq/order/offset/limit, .single() e a RPC match_kb_chunks), serve
+# os arquivos dos documentos e responde como a API do Serper. Cada rota tem uma latência
+# simulada configurável e um contador de requisições.
+ROUTE_POSTGREST = "postgrest"
+ROUTE_RPC = "rpc"
+ROUTE_FILES = "files"
+ROUTE_SERPER = "serper"
+PGRST_OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+
+
+def _select_columns(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+    if not select or select.strip() == "*":
+        return [dict(row) for row in rows]
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    return [{c: row.get(c) for c in columns} for row in rows]
+
+
+def query_rows(rows: List[Dict[str, Any]], params: List[tuple]) -> List[Dict[str, Any]]:
+    """Aplica a `rows` os parâmetros PostgREST suportados: col=eq.valor, order, offset, limit e select."""
+    select, order, offset, limit = None, None, 0, None
+    for name, value in params:
+        if name == "select":
+            select = value
+        elif name == "order":
+            order = value
+        elif name == "offset":
+            offset = int(value)
+        elif name == "limit":
+            limit = int(value)
+        elif value.startswith("eq."):
+            rows = [row for row in rows if str(row.get(name)) == value[3:]]
+    if order:
+        column, _, direction = order.partition(".")
+        rows = sorted(rows, key=lambda row: str(row.get(column) or ""), reverse=direction.startswith("desc"))
+    rows = rows[offset:offset + limit if limit is not None else None]
+    return _select_columns(rows, select)
+
+
+class StubBackend:
+    """Dados e configuração compartilhados pelo servidor: tabelas, arquivos, chunks da KB e latências (s)."""
+
+    def __init__(self, tables: Dict[str, List[Dict[str, Any]]], files: Dict[str, bytes],
+                 kb_chunks: List[Dict[str, Any]], latencies: Optional[Dict[str, float]] = None):
+        self.tables = tables
+        self.files = files
+        self.kb_chunks = kb_chunks
+        self.latencies = latencies or {}
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def hit(self, route: str) -> None:
+        with self._lock:
+            self.requests[route] += 1
+        delay = self.latencies.get(route, 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def request_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.requests)
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como o Supabase e o pool compartilhado de clients.py
+    backend: StubBackend
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Any, status: int = 200, content_type: str = "application/json") -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith("/files/"):
+            self.backend.hit(ROUTE_FILES)
+            content = self.backend.files.get(unquote(url.path[len("/files/"):]))
+            if content is None:
+                return self._send_json({"message": "not found"}, status=404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        if url.path.startswith("/rest/v1/"):
+            self.backend.hit(ROUTE_POSTGREST)
+            table = url.path[len("/rest/v1/"):]
+            if table not in self.backend.tables:
+                return self._send_json({"code": "42P01", "message": f'relation "{table}" does not exist'}, status=404)
+            rows = query_rows(self.backend.tables[table], parse_qsl(url.query, keep_blank_values=True))
+            if PGRST_OBJECT_MEDIA_TYPE in (self.headers.get("Accept") or ""):
+                if len(rows) != 1:
+                    return self._send_json({"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned",
+                                            "details": f"The result contains {len(rows)} rows", "hint": None}, status=406)
+                return self._send_json(rows[0], content_type=PGRST_OBJECT_MEDIA_TYPE)
+            return self._send_json(rows)
+        self._send_json({"message": "not found"}, status=404)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path == "/rest/v1/rpc/match_kb_chunks":
+            self.backend.hit(ROUTE_RPC)
+            params = self._read_json()
+            count = int(params.get("match_count") or 3)
+            rows = [
+                dict(chunk, similarity=round(0.9 - 0.05 * index, 4))
+                for index, chunk in enumerate(self.backend.kb_chunks[:count])
+            ]
+            return self._send_json(rows)
+        if url.path in ("/search", "/news"):
+            self.backend.hit(ROUTE_SERPER)
+            query = str(self._read_json().get("q", ""))
+            return self._send_json({
+                "searchParameters": {"q": query, "type": url.path.strip("/")},
+                "organic": [
+                    {"title": f"Consulta pública: {query}", "link": "https://example.com/consulta", "position": 1,
+                     "snippet": "Situação cadastral ATIVA. Nenhuma restrição pública encontrada."},
+                ],
+            })
+        self._send_json({"message": "not found"}, status=404)
+
+
+class StubServer:
+    """Servidor HTTP em thread daemon; `url` fica disponível após start()."""
+
+    def __init__(self, backend: StubBackend, host: str = "127.0.0.1", port: int = 0):
+        handler = type("StubHandler", (_StubHandler,), {"backend": backend})
+        self.backend = backend
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="benchmark-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
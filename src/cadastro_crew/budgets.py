@@ -0,0 +1,242 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prazo total de um caso quando tasks.yaml não define time_budgets.case_seconds.
+CASE_BUDGET_SECONDS_DEFAULT = 1800.0
+# Nome da etapa usada quando o prazo do caso termina fora de qualquer tarefa/etapa conhecida.
+CASE_STAGE = "caso"
+
+# Prazo do caso em execução e etapa atual (tarefa ou pré-parseamento) no contexto corrente.
+# As ferramentas consultam estes valores para limitar seus timeouts de I/O.
+_current_deadline: contextvars.ContextVar[Optional["CaseDeadline"]] = contextvars.ContextVar(
+    "cadastro_case_deadline", default=None
+)
+_current_stage: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("cadastro_case_stage", default=None)
+
+
+class BudgetExceeded(TimeoutError):
+    """
+    Uma etapa do caso excedeu seu orçamento de tempo (ou o prazo total do caso terminou).
+    Herda de TimeoutError para que a CrewAI não repita a tarefa ao recebê-la.
+    """
+
+    def __init__(self, stage: str, budget_seconds: Optional[float] = None):
+        self.stage = stage
+        self.budget_seconds = budget_seconds
+        detail = f" ({budget_seconds:g}s)" if budget_seconds else ""
+        super().__init__(f"Orçamento de tempo excedido na etapa '{stage}'{detail}.")
+
+
+class CaseDeadline:
+    """
+    Prazo de execução de um caso, com orçamentos por etapa (tarefas, pré-parseamento) e
+    por ferramenta (llama_parse, supabase, knowledge_base, serper).
+    Quando um orçamento é excedido, o prazo é cancelado: as chamadas de I/O seguintes
+    falham imediatamente e a etapa responsável fica registrada em `exceeded_stage`.
+    Seguro para uso entre threads.
+    """
+
+    def __init__(
+        self,
+        case_id: str,
+        case_seconds: float,
+        stage_seconds: Optional[Dict[str, float]] = None,
+        tool_seconds: Optional[Dict[str, float]] = None,
+    ):
+        self.case_id = case_id
+        self.case_seconds = float(case_seconds)
+        self.stage_seconds = {k: float(v) for k, v in (stage_seconds or {}).items() if v}
+        self.tool_seconds = {k: float(v) for k, v in (tool_seconds or {}).items() if v}
+        self.cancelled = threading.Event()
+        self.exceeded_stage: Optional[str] = None
+        self.overruns: List[str] = []
+        self._started_at = time.monotonic()
+        self._expires_at = self._started_at + self.case_seconds
+        self._stage_started: Dict[str, float] = {}
+        self._stage_finished: Dict[str, float] = {}
+        self._task_stages: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    # --- Etapas ---
+
+    def begin_stage(self, stage: str) -> None:
+        """Marca o início de uma etapa (idempotente) e a torna a etapa atual do contexto corrente."""
+        with self._lock:
+            self._stage_started.setdefault(stage, time.monotonic())
+        _current_stage.set(stage)
+
+    def bind_task(self, task: Any, stage: str) -> None:
+        """Associa uma Task da CrewAI à sua etapa; a etapa começa quando a tarefa inicia (enter_task_stage)."""
+        self._task_stages[id(task)] = stage
+
+    def stage_of(self, task: Any) -> Optional[str]:
+        return self._task_stages.get(id(task))
+
+    def end_stage(self, stage: str) -> None:
+        with self._lock:
+            if stage in self._stage_started:
+                self._stage_finished.setdefault(stage, time.monotonic())
+
+    def remaining(self, stage: Optional[str] = None) -> float:
+        """Segundos restantes até o prazo do caso ou, se menor, até o fim do orçamento da etapa (se em andamento)."""
+        now = time.monotonic()
+        expires_at = self._expires_at
+        with self._lock:
+            started_at = self._stage_started.get(stage) if stage and stage not in self._stage_finished else None
+        if started_at is not None and stage in self.stage_seconds:
+            expires_at = min(expires_at, started_at + self.stage_seconds[stage])
+        return max(0.0, expires_at - now)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started_at
+
+    # --- Verificação e cancelamento ---
+
+    def mark_exceeded(self, stage: Optional[str]) -> None:
+        """Registra a primeira etapa que estourou o orçamento e cancela o restante do caso."""
+        stage = stage or CASE_STAGE
+        with self._lock:
+            first = self.exceeded_stage is None
+            if first:
+                self.exceeded_stage = stage
+        self.cancelled.set()
+        if first:
+            logger.warning(
+                f"Caso '{self.case_id}': orçamento de tempo excedido na etapa '{stage}' após {self.elapsed():.1f}s; "
+                f"cancelando as operações em andamento."
+            )
+
+    def check(self, stage: Optional[str] = None) -> float:
+        """
+        Levanta BudgetExceeded se o caso foi cancelado ou se não resta tempo para a etapa
+        (padrão: a etapa atual do contexto). Retorna os segundos restantes.
+        """
+        stage = stage or _current_stage.get()
+        if self.cancelled.is_set():
+            raise BudgetExceeded(self.exceeded_stage or CASE_STAGE)
+        remaining = self.remaining(stage)
+        if remaining <= 0:
+            self.mark_exceeded(stage)
+            budget = self.stage_seconds.get(stage) if stage else None
+            raise BudgetExceeded(stage or CASE_STAGE, budget or self.case_seconds)
+        return remaining
+
+    def timeout_for(self, tool: str, default: Optional[float] = None) -> Optional[float]:
+        """
+        Timeout a aplicar a uma chamada de `tool`: o orçamento da ferramenta (ou `default`)
+        limitado ao tempo restante da etapa e do caso. Levanta BudgetExceeded se não resta tempo.
+        """
+        remaining = self.check()
+        budget = self.tool_seconds.get(tool, default)
+        return remaining if budget is None else min(budget, remaining)
+
+    def running_stages(self) -> List[str]:
+        """Etapas iniciadas e ainda não concluídas, da mais antiga para a mais recente."""
+        with self._lock:
+            running = [(started_at, stage) for stage, started_at in self._stage_started.items()
+                       if stage not in self._stage_finished]
+        return [stage for _, stage in sorted(running)]
+
+    def check_running(self) -> None:
+        """Verifica o orçamento de todas as etapas em andamento (tarefas paralelas) e o prazo do caso."""
+        for stage in self.running_stages() or [CASE_STAGE]:
+            self.check(stage)
+
+    def record_overrun(self, name: str) -> None:
+        """Registra uma chamada (ferramenta ou etapa opcional) que excedeu seu orçamento sem encerrar o caso."""
+        stage = _current_stage.get() or CASE_STAGE
+        entry = name if name == stage else f"{stage}/{name}"
+        with self._lock:
+            self.overruns.append(entry)
+        logger.warning(f"Caso '{self.case_id}': '{name}' excedeu o orçamento de tempo na etapa '{stage}'.")
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumo serializável em JSON (para logs e relatórios)."""
+        with self._lock:
+            stages = {
+                stage: round(self._stage_finished.get(stage, time.monotonic()) - started_at, 2)
+                for stage, started_at in self._stage_started.items()
+            }
+            overruns = list(self.overruns)
+        return {
+            "case_seconds": self.case_seconds,
+            "elapsed_seconds": round(self.elapsed(), 2),
+            "exceeded_stage": self.exceeded_stage,
+            "stage_seconds": stages,
+            "overruns": overruns,
+        }
+
+
+def load_time_budgets(config: Optional[Dict[str, Any]], task_keys: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Lê a seção `time_budgets` do tasks.yaml (e `max_execution_seconds` de cada tarefa em
+    `task_keys`) e devolve os argumentos de CaseDeadline. CASE_TIME_BUDGET_SECONDS sobrescreve
+    o prazo do caso.
+    """
+    config = config or {}
+    budgets = config.get("time_budgets") or {}
+    stage_seconds = dict(budgets.get("stages") or {})
+    for key in task_keys or []:
+        task_budget = (config.get(key) or {}).get("max_execution_seconds")
+        if task_budget:
+            stage_seconds[key] = task_budget
+    case_seconds = os.getenv("CASE_TIME_BUDGET_SECONDS") or budgets.get("case_seconds") or CASE_BUDGET_SECONDS_DEFAULT
+    return {
+        "case_seconds": float(case_seconds),
+        "stage_seconds": stage_seconds,
+        "tool_seconds": dict(budgets.get("tools") or {}),
+    }
+
+
+def current_deadline() -> Optional[CaseDeadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[CaseDeadline]):
+    """Torna `deadline` o prazo do contexto corrente (e de threads/tarefas que copiam o contexto)."""
+    token = _current_deadline.set(deadline)
+    stage_token = _current_stage.set(None)
+    try:
+        yield deadline
+    finally:
+        _current_stage.reset(stage_token)
+        _current_deadline.reset(token)
+
+
+def tool_timeout(tool: str, default: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout para uma chamada de ferramenta. Sem prazo ativo, retorna `default`.
+    Levanta BudgetExceeded se o caso já não tem tempo restante.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    return deadline.timeout_for(tool, default)
+
+
+def record_overrun(name: str) -> None:
+    """Registra no prazo ativo (se houver) que uma chamada de ferramenta excedeu seu orçamento."""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.record_overrun(name)
+
+
+def enter_task_stage(task: Any) -> None:
+    """Inicia, no contexto corrente, a etapa associada a `task` pelo prazo ativo (se houver)."""
+    deadline = _current_deadline.get()
+    stage = deadline.stage_of(task) if deadline is not None else None
+    if stage:
+        deadline.begin_stage(stage)
+
+
+def is_cancelled() -> bool:
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.cancelled.is_set()
@@ -0,0 +1,283 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from .text_utils import normalize_text
+from .tools.cache import cache_base_dir, env_flag
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre verificações de versão (updated_at) do checklist em app_configs.
+CHECKLIST_CHECK_INTERVAL_SECONDS_DEFAULT = 300
+CHECKLIST_ABSENT_ITEM_MAX_CHARS = 120
+
+JanelaUnidade = Literal["dias", "meses", "anos"]
+
+# Palavras-chave (texto normalizado: sem acentos, caixa alta) que identificam o tipo de documento
+# de um item do checklist. Os tipos coincidem com os 'type' de get_documents_for_case (main.py);
+# os demais (Faturamento, Procuracao, ...) não têm documento mapeado e aparecem como itens ausentes.
+DOCUMENT_TYPE_KEYWORDS: Dict[str, List[str]] = {
+    "CNPJ": [r"CARTAO (DO )?CNPJ", r"COMPROVANTE DE INSCRICAO", r"SITUACAO CADASTRAL"],
+    "CertidaoSimplificada": [r"CERTIDAO SIMPLIFICADA"],
+    "ContratoSocial": [r"CONTRATO SOCIAL", r"ESTATUTO SOCIAL", r"ALTERACAO CONTRATUAL", r"ATO CONSTITUTIVO"],
+    "QuadroSocietario": [r"\bQSA\b", r"QUADRO (SOCIETARIO|DE SOCIOS)"],
+    "ComprovanteEnderecoSocio": [r"COMPROVANTE DE (RESIDENCIA|ENDERECO)"],
+    "DocumentoIdentificacaoSocio": [r"\bRG\b", r"\bCNH\b", r"DOCUMENTO (OFICIAL )?DE (IDENTIFICACAO|IDENTIDADE)",
+                                    r"DOCUMENTO OFICIAL COM FOTO"],
+    "Faturamento": [r"FATURAMENTO"],
+    "DemonstracoesFinanceiras": [r"BALANCO", r"\bDRE\b", r"DEMONSTRAC(AO|OES) (FINANCEIRA|CONTABE|DO RESULTADO)"],
+    "Procuracao": [r"PROCURACAO"],
+}
+_DOCUMENT_TYPE_PATTERNS = {doc_type: [re.compile(p) for p in patterns] for doc_type, patterns in DOCUMENT_TYPE_KEYWORDS.items()}
+
+_WINDOW_RE = re.compile(r"(\d+)\s*(DIAS?|MES(?:ES)?|ANOS?)\b")
+# Expressões que antecedem uma janela de validade. As fortes ("defasagem máxima", "emitido há")
+# têm precedência sobre "últimos N", que em itens como faturamento indica o período coberto.
+_WINDOW_STRONG_CONTEXT_RE = re.compile(r"DEFASAGEM|MAXIM|EMITID|EMISSAO|VALIDADE|PRAZO|ATUALIZAD|RECENTE")
+_WINDOW_CONTEXT_RE = re.compile(r"ULTIM|ATE|REFERENCIA")
+WINDOW_CONTEXT_CHARS = 40
+_REQUIRED_FIELDS_RE = re.compile(r"\b(?:contendo|constando|deve(?:m)? conter|deve(?:m)? constar|com)\s+(.+)$", re.IGNORECASE)
+_SIGNED_BY_RE = re.compile(r"assinad[oa]s? pel[oa]s?\s+([\w\s]+?)(?:[,.;(]|$)", re.IGNORECASE)
+_BULLET_RE = re.compile(r"^(\s*)(?:[-*•]|\d+[.)]|[ivx]+\))\s+(.*)$")
+_SECTION_RE = re.compile(r"^(?:#+\s*(.+)|([a-zA-Z]\)\s*.+)|\*\*(.+?)\*\*:?)$")
+
+
+class ChecklistRule(BaseModel):
+    """Item do checklist normativo, com os elementos que podem ser avaliados sem o LLM."""
+    id: str
+    secao: Optional[str] = None
+    tipoDocumento: Optional[str] = Field(default=None, description="Tipo de documento do caso a que a regra se aplica.")
+    texto: str
+    janelaValor: Optional[int] = Field(default=None, description="Janela de validade (ex: 90 em 'últimos 90 dias').")
+    janelaUnidade: Optional[JanelaUnidade] = None
+    camposObrigatorios: List[str] = Field(default_factory=list)
+
+    def describe(self) -> str:
+        details = []
+        if self.janelaValor is not None:
+            details.append(f"janela: {self.janelaValor} {self.janelaUnidade}")
+        if self.camposObrigatorios:
+            details.append(f"campos: {', '.join(self.camposObrigatorios)}")
+        suffix = f" [{'; '.join(details)}]" if details else ""
+        doc_type = f" ({self.tipoDocumento})" if self.tipoDocumento else ""
+        return f"- [{self.id}]{doc_type} {self.texto}{suffix}"
+
+
+def _detect_document_type(text: str) -> Optional[str]:
+    normalized = normalize_text(text)
+    matches = []
+    for doc_type, patterns in _DOCUMENT_TYPE_PATTERNS.items():
+        positions = [m.start() for p in patterns for m in [p.search(normalized)] if m]
+        if positions:
+            matches.append((min(positions), doc_type))
+    return min(matches)[1] if matches else None
+
+
+def _detect_window(text: str) -> tuple:
+    normalized = normalize_text(text)
+    candidates = []
+    for match in _WINDOW_RE.finditer(normalized):
+        context = normalized[max(0, match.start() - WINDOW_CONTEXT_CHARS):match.start()]
+        strength = 2 if _WINDOW_STRONG_CONTEXT_RE.search(context) else 1 if _WINDOW_CONTEXT_RE.search(context) else 0
+        if strength:
+            unit = match.group(2)
+            unit = "dias" if unit.startswith("DIA") else "meses" if unit.startswith("MES") else "anos"
+            candidates.append((-strength, match.start(), int(match.group(1)), unit))
+    if not candidates:
+        return None, None
+    _, _, value, unit = min(candidates)
+    return value, unit
+
+
+def _detect_required_fields(text: str) -> List[str]:
+    fields: List[str] = []
+    match = _REQUIRED_FIELDS_RE.search(text.rstrip(". "))
+    if match and not _WINDOW_RE.search(normalize_text(match.group(1))):
+        parts = re.split(r",|;|\s+e\s+", match.group(1))
+        fields += [p.strip(" .:") for p in parts if p.strip(" .:")]
+    for match in _SIGNED_BY_RE.finditer(text):
+        signers = re.split(r"\s+e\s+(?:pel[oa]s?\s+)?", match.group(1).strip())
+        fields += [f"assinatura do {signer.strip()}" for signer in signers if signer.strip()]
+    return list(dict.fromkeys(fields))
+
+
+def parse_checklist(content: str) -> List[ChecklistRule]:
+    """
+    Converte o checklist textual (Markdown com seções e itens em lista) em regras.
+    O tipo de documento de um item é o citado no próprio texto ou, se ausente, o do item pai
+    (subitens indentados) ou o do título da seção. Linhas soltas também viram regras, para que
+    nenhum requisito do checklist se perca.
+    """
+    rules: List[ChecklistRule] = []
+    section: Optional[str] = None
+    section_type: Optional[str] = None
+    parents: List[tuple] = []  # (indentação, tipo de documento)
+    for line in (content or "").splitlines():
+        if not line.strip():
+            continue
+        bullet = _BULLET_RE.match(line)
+        heading = None if bullet else _SECTION_RE.match(line.strip())
+        if heading or (not bullet and line.strip().endswith(":")):
+            section = next((g for g in heading.groups() if g), line.strip()) if heading else line.strip()
+            section = section.strip(" :*")
+            section_type = _detect_document_type(section)
+            parents = []
+            continue
+        indent, text = (len(bullet.group(1)), bullet.group(2).strip()) if bullet else (0, line.strip())
+        parents = [p for p in parents if p[0] < indent]
+        doc_type = _detect_document_type(text) or (parents[-1][1] if parents else None) or section_type
+        value, unit = _detect_window(text)
+        rules.append(ChecklistRule(
+            id=f"R{len(rules) + 1:02d}",
+            secao=section,
+            tipoDocumento=doc_type,
+            texto=text,
+            janelaValor=value,
+            janelaUnidade=unit,
+            camposObrigatorios=_detect_required_fields(text),
+        ))
+        parents.append((indent, doc_type))
+    return rules
+
+
+class Checklist(BaseModel):
+    """Checklist de app_configs com suas regras estruturadas e a versão usada no cache."""
+    config_name: str
+    content: str = ""
+    updated_at: Optional[str] = None
+    etag: Optional[str] = None
+    checked_at: float = 0.0
+    rules: List[ChecklistRule] = Field(default_factory=list)
+
+    def relevant_rules(self, document_types: Iterable[str]) -> List[ChecklistRule]:
+        """Regras dos tipos de documento do caso e regras gerais (sem tipo de documento)."""
+        types = set(document_types)
+        return [rule for rule in self.rules if rule.tipoDocumento is None or rule.tipoDocumento in types]
+
+    def render_for_documents(self, documents: List[Dict[str, Any]]) -> str:
+        """
+        Texto do input '{checklist}' para um caso: apenas as regras aplicáveis aos tipos de
+        documento presentes, mais uma linha por item exigido sem documento correspondente
+        (para que a ausência seja apontada). Sem regras estruturadas, retorna o texto original.
+        """
+        if not self.rules or not env_flag("CHECKLIST_STRUCTURED", True):
+            return self.content
+        types = {doc.get("type") for doc in documents if doc.get("type")}
+        relevant = self.relevant_rules(types)
+        lines = [f"Regras do checklist '{self.config_name}' aplicáveis aos documentos do caso "
+                 f"({len(relevant)} de {len(self.rules)} regras):"]
+        section = None
+        for rule in relevant:
+            if rule.secao != section:
+                section = rule.secao
+                lines += ["", f"### {section}"] if section else [""]
+            lines.append(rule.describe())
+        absent = [rule for rule in self.rules if rule.tipoDocumento and rule.tipoDocumento not in types]
+        if absent:
+            lines += ["", "Itens exigidos pelo checklist sem documento correspondente no caso (verificar a ausência):"]
+            for rule in absent:
+                text = rule.texto if len(rule.texto) <= CHECKLIST_ABSENT_ITEM_MAX_CHARS else rule.texto[:CHECKLIST_ABSENT_ITEM_MAX_CHARS] + "..."
+                lines.append(f"- [{rule.id}] ({rule.tipoDocumento}) {text}")
+        return "\n".join(lines)
+
+
+_memory_cache: Dict[str, Checklist] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_path(config_name: str) -> Path:
+    safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in config_name)
+    return cache_base_dir() / "checklist" / f"{safe_name}.json"
+
+
+def _read_cached(config_name: str) -> Optional[Checklist]:
+    cached = _memory_cache.get(config_name)
+    if cached is not None:
+        return cached
+    path = _cache_path(config_name)
+    if not path.exists():
+        return None
+    try:
+        return Checklist.model_validate_json(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        logger.warning(f"Cache do checklist '{config_name}' ilegível; será recarregado: {e}")
+        return None
+
+
+def _write_cached(checklist: Checklist) -> None:
+    _memory_cache[checklist.config_name] = checklist
+    path = _cache_path(checklist.config_name)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(checklist.model_dump_json(), encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Falha ao gravar o cache do checklist '{checklist.config_name}': {e}")
+
+
+def _fetch_version(client, config_name: str) -> Optional[str]:
+    """updated_at do checklist em app_configs (consulta leve, sem o conteúdo), ou None se indisponível."""
+    try:
+        response = client.table("app_configs").select("updated_at").eq("config_name", config_name).single().execute()
+        return str(response.data.get("updated_at")) if response.data and response.data.get("updated_at") else None
+    except Exception as e:
+        logger.info(f"Versão do checklist '{config_name}' indisponível ({e}); o conteúdo será consultado.")
+        return None
+
+
+def load_checklist(client, config_name: str = "checklist_cadastro_pj") -> Checklist:
+    """
+    Retorna o checklist `config_name` de app_configs já convertido em regras.
+    O resultado fica em cache (memória e <CADASTRO_CACHE_DIR>/checklist/): dentro de
+    CHECKLIST_CHECK_INTERVAL_SECONDS nenhuma consulta é feita; depois disso, apenas o
+    updated_at é consultado e o conteúdo só é baixado (e re-parseado, se o hash mudou)
+    quando a versão muda. Em caso de falha do Supabase, usa o cache existente.
+    Sem cache e sem Supabase, retorna um checklist vazio (content == "").
+    """
+    interval = float(os.getenv("CHECKLIST_CHECK_INTERVAL_SECONDS", CHECKLIST_CHECK_INTERVAL_SECONDS_DEFAULT))
+    with _cache_lock:
+        cached = _read_cached(config_name)
+        if cached is not None and time.time() - cached.checked_at < interval:
+            return cached
+
+        version = _fetch_version(client, config_name) if client is not None else None
+        if cached is not None and version is not None and version == cached.updated_at:
+            checklist = cached.model_copy(update={"checked_at": time.time()})
+            _write_cached(checklist)
+            return checklist
+
+        try:
+            response = client.table("app_configs").select("*").eq("config_name", config_name).single().execute()
+            data = response.data or {}
+        except Exception as e:
+            if cached is not None:
+                logger.warning(f"Falha ao consultar o checklist '{config_name}'; usando a versão em cache: {e}")
+                return cached
+            print(f"Erro ao buscar checklist de app_configs: {e}")
+            return Checklist(config_name=config_name)
+
+        content = data.get("content") or ""
+        if not content:
+            print(f"Erro: Checklist '{config_name}' não encontrado na tabela app_configs ou conteúdo vazio.")
+            return cached or Checklist(config_name=config_name)
+        etag = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        rules = cached.rules if cached is not None and cached.etag == etag else parse_checklist(content)
+        checklist = Checklist(
+            config_name=config_name,
+            content=content,
+            updated_at=str(data["updated_at"]) if data.get("updated_at") else None,
+            etag=etag,
+            checked_at=time.time(),
+            rules=rules,
+        )
+        _write_cached(checklist)
+        logger.info(f"Checklist '{config_name}' carregado: {len(rules)} regras estruturadas.")
+        return checklist
@@ -0,0 +1,193 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import httpx
+
+if TYPE_CHECKING:
+    # supabase-py é importado no primeiro get_supabase_client(), não na importação do módulo.
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# Pool de conexões HTTP (keep-alive) compartilhado por todos os usos do cliente Supabase.
+SUPABASE_POOL_SIZE_DEFAULT = 20
+SUPABASE_KEEPALIVE_SECONDS_DEFAULT = 60.0
+SUPABASE_TIMEOUT_SECONDS_DEFAULT = 30.0
+SUPABASE_CONNECT_TIMEOUT_SECONDS_DEFAULT = 10.0
+
+# Cliente HTTP compartilhado para downloads de documentos (HTTP/2 quando o pacote 'h2' estiver instalado).
+DOWNLOAD_POOL_SIZE_DEFAULT = 20
+DOWNLOAD_TIMEOUT_SECONDS_DEFAULT = 120.0
+DOWNLOAD_CONNECT_TIMEOUT_SECONDS_DEFAULT = 10.0
+
+_supabase_clients: Dict[Tuple[str, str], "Client"] = {}
+_supabase_http_clients: Dict[Tuple[str, str], httpx.Client] = {}
+_registry_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+# Threads que executam as requisições ao Supabase com prazo (ver execute_with_timeout).
+_request_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def supabase_timeout() -> httpx.Timeout:
+    """Timeouts das requisições ao Supabase (SUPABASE_TIMEOUT_SECONDS / SUPABASE_CONNECT_TIMEOUT_SECONDS)."""
+    return httpx.Timeout(
+        _env_float("SUPABASE_TIMEOUT_SECONDS", SUPABASE_TIMEOUT_SECONDS_DEFAULT),
+        connect=_env_float("SUPABASE_CONNECT_TIMEOUT_SECONDS", SUPABASE_CONNECT_TIMEOUT_SECONDS_DEFAULT),
+    )
+
+
+def supabase_pool_limits() -> httpx.Limits:
+    """Limites do pool de conexões (SUPABASE_POOL_SIZE / SUPABASE_KEEPALIVE_SECONDS)."""
+    pool_size = int(os.getenv("SUPABASE_POOL_SIZE", SUPABASE_POOL_SIZE_DEFAULT))
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=_env_float("SUPABASE_KEEPALIVE_SECONDS", SUPABASE_KEEPALIVE_SECONDS_DEFAULT),
+    )
+
+
+def _build_client_options(http_client: httpx.Client):
+    """
+    Monta as opções do cliente Supabase com o pool compartilhado.
+    Versões do supabase-py sem suporte a 'httpx_client' recebem apenas os timeouts
+    (nesse caso o PostgREST usa o pool interno do próprio cliente, que também é único por processo).
+    """
+    try:
+        from supabase.lib.client_options import SyncClientOptions as OptionsClass
+    except ImportError:
+        from supabase.lib.client_options import ClientOptions as OptionsClass
+
+    timeout = _env_float("SUPABASE_TIMEOUT_SECONDS", SUPABASE_TIMEOUT_SECONDS_DEFAULT)
+    try:
+        return OptionsClass(
+            postgrest_client_timeout=timeout,
+            storage_client_timeout=timeout,
+            httpx_client=http_client,
+        )
+    except TypeError:
+        logger.info("supabase-py sem suporte a 'httpx_client'; usando apenas os timeouts configurados.")
+        return OptionsClass(postgrest_client_timeout=timeout, storage_client_timeout=timeout)
+
+
+def get_supabase_client(supabase_url: Optional[str] = None, supabase_key: Optional[str] = None) -> "Client":
+    """
+    Retorna o cliente Supabase compartilhado pelo processo para (url, key), criando-o na
+    primeira chamada. Todas as ferramentas e o main.py usam este registro, de modo que uma
+    execução (ou um lote de execuções) reutiliza as mesmas sessões TCP/TLS.
+    Por padrão lê SUPABASE_URL e SUPABASE_SERVICE_KEY do ambiente.
+    Levanta ValueError se a configuração estiver ausente; erros de create_client são propagados.
+    """
+    supabase_url = supabase_url or os.getenv("SUPABASE_URL")
+    supabase_key = supabase_key or os.getenv("SUPABASE_SERVICE_KEY")
+    if not supabase_url or not supabase_key:
+        raise ValueError("SUPABASE_URL e SUPABASE_SERVICE_KEY devem estar configuradas.")
+
+    registry_key = (supabase_url, supabase_key)
+    client = _supabase_clients.get(registry_key)
+    if client is not None:
+        return client
+
+    with _registry_lock:
+        client = _supabase_clients.get(registry_key)
+        if client is None:
+            from supabase import create_client
+
+            http_client = httpx.Client(limits=supabase_pool_limits(), timeout=supabase_timeout())
+            try:
+                client = create_client(supabase_url, supabase_key, options=_build_client_options(http_client))
+            except Exception:
+                http_client.close()
+                raise
+            _supabase_http_clients[registry_key] = http_client
+            _supabase_clients[registry_key] = client
+            logger.info("Cliente Supabase compartilhado inicializado (pool de conexões keep-alive).")
+    return client
+
+
+def _get_request_executor() -> ThreadPoolExecutor:
+    global _request_executor
+    if _request_executor is not None:
+        return _request_executor
+    with _registry_lock:
+        if _request_executor is None:
+            _request_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SUPABASE_POOL_SIZE", SUPABASE_POOL_SIZE_DEFAULT)),
+                thread_name_prefix="supabase-request",
+            )
+    return _request_executor
+
+
+def execute_with_timeout(request: Any, timeout: Optional[float] = None) -> Any:
+    """
+    Executa `request.execute()` (query PostgREST ou RPC do supabase-py) aguardando no máximo
+    `timeout` segundos; sem timeout, executa diretamente na thread atual.
+    O timeout do pool (SUPABASE_TIMEOUT_SECONDS) é fixo na criação do cliente, por isso o prazo
+    da ferramenta é aplicado na espera: ao estourar, levanta concurrent.futures.TimeoutError e a
+    requisição termina em segundo plano, limitada pelo timeout do pool.
+    """
+    if timeout is None:
+        return request.execute()
+    return _get_request_executor().submit(request.execute).result(timeout=max(timeout, 0.0))
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 é usado se DOWNLOAD_HTTP2 não o desabilitar e o pacote 'h2' estiver disponível."""
+    if os.getenv("DOWNLOAD_HTTP2", "true").strip().lower() not in ("1", "true", "sim", "yes", "on"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Retorna o cliente httpx compartilhado pelo processo para downloads de documentos:
+    conexões keep-alive reutilizadas entre chamadas, casos e threads (httpx.Client é
+    thread-safe), HTTP/2 quando disponível e timeouts explícitos.
+    Configuração: DOWNLOAD_POOL_SIZE, DOWNLOAD_TIMEOUT_SECONDS, DOWNLOAD_CONNECT_TIMEOUT_SECONDS, DOWNLOAD_HTTP2.
+    """
+    global _http_client
+    if _http_client is not None:
+        return _http_client
+    with _registry_lock:
+        if _http_client is None:
+            pool_size = int(os.getenv("DOWNLOAD_POOL_SIZE", DOWNLOAD_POOL_SIZE_DEFAULT))
+            _http_client = httpx.Client(
+                http2=_http2_enabled(),
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(
+                    _env_float("DOWNLOAD_TIMEOUT_SECONDS", DOWNLOAD_TIMEOUT_SECONDS_DEFAULT),
+                    connect=_env_float("DOWNLOAD_CONNECT_TIMEOUT_SECONDS", DOWNLOAD_CONNECT_TIMEOUT_SECONDS_DEFAULT),
+                ),
+            )
+            logger.info("Cliente HTTP compartilhado para downloads inicializado.")
+    return _http_client
+
+
+def close_supabase_clients() -> None:
+    """Fecha os pools HTTP e esvazia o registro (útil em testes e no encerramento do processo)."""
+    with _registry_lock:
+        for http_client in _supabase_http_clients.values():
+            http_client.close()
+        _supabase_http_clients.clear()
+        _supabase_clients.clear()
+
+
+def close_http_client() -> None:
+    """Fecha o cliente HTTP compartilhado de downloads."""
+    global _http_client
+    with _registry_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .budgets import current_deadline
+from .text_utils import is_empty, normalize_value, parse_json_object
+from .tools.cache import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Compactação determinística do contexto entre tarefas (seção `context_compaction` de cada
+# tarefa em tasks.yaml). O contexto bruto recebido da CrewAI é arquivado para auditoria.
+CHARS_PER_TOKEN = 4
+CONTEXT_MAX_TOKENS_DEFAULT = 4000
+CONTEXT_MAX_FIELD_CHARS_DEFAULT = 600
+MIN_FIELD_CHARS = 80
+KEEP_STATUS_DEFAULT = ["Não Conforme", "Pendência"]
+CONTEXT_ARCHIVE_DIR_DEFAULT = Path(__file__).resolve().parent.parent.parent / "reports" / "context_archive"
+# Mesmo separador usado pela CrewAI ao agregar as saídas das tarefas de contexto.
+CONTEXT_DIVIDER = "\n\n----------\n\n"
+# Registro, dentro de cada seção, do que foi omitido para caber em `max_tokens`.
+OMITTED_BY_STATUS_KEY = "itensOmitidosPorStatus"
+OMITTED_ITEMS_KEY = "itensOmitidosPorLimite"
+OMITTED_FIELDS_KEY = "camposOmitidosPorLimite"
+SECTION_OMITTED_NOTE = "[seção omitida por limite de contexto; íntegra no arquivo de auditoria]"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _output_data(task_output) -> Any:
+    """Dados estruturados de uma TaskOutput: o modelo pydantic, o JSON da resposta ou o texto bruto."""
+    model = getattr(task_output, "pydantic", None)
+    if model is not None:
+        return model.model_dump()
+    if getattr(task_output, "json_dict", None):
+        return task_output.json_dict
+    raw = task_output.raw or ""
+    try:
+        return parse_json_object(raw)
+    except ValueError:
+        return raw
+
+
+def _prune(value: Any) -> Any:
+    """Remove campos vazios e entradas repetidas de listas (comparadas pela forma normalizada)."""
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if not is_empty(v)}
+    if isinstance(value, list):
+        items, seen = [], set()
+        for item in (_prune(v) for v in value):
+            key = normalize_value(item)
+            if is_empty(item) or key in seen:
+                continue
+            seen.add(key)
+            items.append(item)
+        return items
+    return value
+
+
+def _socio_key(socio: Dict[str, Any]) -> str:
+    cpf = re.sub(r"\D", "", str(socio.get("cpf") or ""))
+    return cpf or normalize_value(socio.get("nomeCompleto") or "")
+
+
+def _dedupe_socios(socios: List[Any]) -> List[Any]:
+    """Agrupa sócios repetidos (mesmo CPF ou nome), mantendo o primeiro valor de cada campo."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    others = []
+    for socio in socios:
+        key = _socio_key(socio) if isinstance(socio, dict) else ""
+        if not key:
+            others.append(socio)
+            continue
+        target = merged.setdefault(key, {})
+        for field, value in socio.items():
+            target.setdefault(field, value)
+    return list(merged.values()) + others
+
+
+def _compact_validation(data: Dict[str, Any], keep_status: List[str]) -> Dict[str, Any]:
+    """Mantém apenas os itens com status relevante para a tarefa seguinte; os demais viram contagens."""
+    kept, omitted = [], {}
+    for item in data.get("itens") or []:
+        status = item.get("status") if isinstance(item, dict) else None
+        if status in keep_status:
+            kept.append({k: v for k, v in item.items() if k != "documentoEncontrado" or v != "Sim"})
+        else:
+            omitted[status or "?"] = omitted.get(status or "?", 0) + 1
+    compacted: Dict[str, Any] = {"itens": kept}
+    if omitted:
+        compacted[OMITTED_BY_STATUS_KEY] = omitted
+    return compacted
+
+
+def _compact_data(data: Any, config: Dict[str, Any]) -> Any:
+    if isinstance(data, dict) and isinstance(data.get("itens"), list):
+        data = _compact_validation(data, config.get("keep_status") or KEEP_STATUS_DEFAULT)
+    data = _prune(data)
+    if isinstance(data, dict) and isinstance(data.get("dadosSociosRepresentantes"), list):
+        data["dadosSociosRepresentantes"] = _dedupe_socios(data["dadosSociosRepresentantes"])
+    return data
+
+
+def _truncate_strings(value: Any, max_chars: int) -> Any:
+    if isinstance(value, dict):
+        return {k: _truncate_strings(v, max_chars) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_truncate_strings(v, max_chars) for v in value]
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + " [...]"
+    return value
+
+
+def _render_section(data: Any) -> str:
+    return data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _render(sections: List[Any], max_field_chars: int) -> str:
+    return CONTEXT_DIVIDER.join(_render_section(_truncate_strings(data, max_field_chars)) for data in sections)
+
+
+def _shrink(data: Any) -> Optional[Any]:
+    """
+    Versão menor de uma seção, sempre cortada em um limite de item ou de campo: remove o último
+    item da maior lista ou o maior campo (registrando a omissão na própria seção) e, em textos,
+    a segunda metade das linhas. Retorna None se não houver o que remover.
+    """
+    if isinstance(data, str):
+        cut = data.rfind("\n", 0, len(data) // 2 + 1)
+        return data[:cut] + "\n[...]" if cut > 0 else None
+    if isinstance(data, list):
+        return data[:-1] if data else None
+    if not isinstance(data, dict):
+        return None
+    bookkeeping = (OMITTED_BY_STATUS_KEY, OMITTED_ITEMS_KEY, OMITTED_FIELDS_KEY)
+    candidates = [k for k in data if k not in bookkeeping]
+    if not candidates:
+        return None
+    key = max(candidates, key=lambda k: len(_render_section(data[k])))
+    data = dict(data)
+    value = data[key]
+    if isinstance(value, list) and value:
+        data[key] = value[:-1]
+        omitted = dict(data.get(OMITTED_ITEMS_KEY) or {})
+        omitted[key] = omitted.get(key, 0) + 1
+        data[OMITTED_ITEMS_KEY] = omitted
+        return data
+    shrunk = _shrink(value) if isinstance(value, dict) else None
+    if shrunk is not None:
+        data[key] = shrunk
+    else:
+        del data[key]
+        data[OMITTED_FIELDS_KEY] = list(data.get(OMITTED_FIELDS_KEY) or []) + [key]
+    return data
+
+
+def _fit_sections(sections: List[Any], max_chars: int) -> Tuple[str, int]:
+    """
+    Reduz as seções até o texto caber em `max_chars`. As seções anteriores (ex: a validação) são
+    reduzidas antes da última, a saída da tarefa imediatamente anterior e entrada principal da
+    tarefa (ex: o dossiê de extração); uma seção que não pode mais ser reduzida é omitida.
+    Retorna (texto, número de cortes).
+    """
+    sections = list(sections)
+    rendered = [_render_section(data) for data in sections]
+
+    def total() -> int:
+        return sum(map(len, rendered)) + len(CONTEXT_DIVIDER) * (len(rendered) - 1)
+
+    cuts = 0
+    for index in range(len(sections)):
+        while total() > max_chars and rendered[index] != SECTION_OMITTED_NOTE:
+            shrunk = _shrink(sections[index])
+            sections[index] = shrunk if shrunk is not None else SECTION_OMITTED_NOTE
+            rendered[index] = _render_section(sections[index])
+            cuts += 1
+    return CONTEXT_DIVIDER.join(rendered), cuts
+
+
+def compact_context(task_outputs: List[Any], config: Dict[str, Any]) -> str:
+    """
+    Compacta as saídas das tarefas de contexto: itens de validação sem pendência viram contagens,
+    campos vazios e entradas repetidas são removidos e o resultado respeita `max_tokens`
+    (encurtando textos longos e, em último caso, omitindo itens e campos inteiros, primeiro
+    das seções anteriores e por último da saída da tarefa imediatamente anterior; ver _fit_sections).
+    """
+    max_tokens = int(config.get("max_tokens") or CONTEXT_MAX_TOKENS_DEFAULT)
+    max_field_chars = int(config.get("max_field_chars") or CONTEXT_MAX_FIELD_CHARS_DEFAULT)
+    sections = [_compact_data(_output_data(output), config) for output in task_outputs]
+
+    text = _render(sections, max_field_chars)
+    while estimate_tokens(text) > max_tokens and max_field_chars > MIN_FIELD_CHARS:
+        max_field_chars = max(MIN_FIELD_CHARS, max_field_chars // 2)
+        text = _render(sections, max_field_chars)
+    note = "\n[... contexto reduzido: {cuts} itens/campos omitidos por limite; íntegra no arquivo de auditoria]"
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) > max_chars:
+        sections = [_truncate_strings(data, max_field_chars) for data in sections]
+        text, cuts = _fit_sections(sections, max_chars - len(note.format(cuts=10 ** 6)))
+        text += note.format(cuts=cuts)
+    return text
+
+
+def archive_raw_context(task_key: str, raw_context: str) -> Optional[Path]:
+    """Grava o contexto bruto em CONTEXT_ARCHIVE_DIR/<case_id>/ para auditoria. Retorna o caminho, ou None em caso de falha."""
+    deadline = current_deadline()
+    case_id = deadline.case_id if deadline is not None else "sem_caso"
+    safe_case_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(case_id))
+    archive_dir = Path(os.getenv("CONTEXT_ARCHIVE_DIR", str(CONTEXT_ARCHIVE_DIR_DEFAULT))) / safe_case_id
+    try:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"{task_key}_{datetime.now().strftime('%Y-%m-%d_%H%M%S_%f')}.md"
+        path.write_text(raw_context, encoding="utf-8")
+        return path
+    except OSError as e:
+        logger.warning(f"Falha ao arquivar o contexto bruto da tarefa '{task_key}': {e}")
+        return None
+
+
+def compaction_enabled(config: Optional[Dict[str, Any]]) -> bool:
+    """Compactação ativa se configurada para a tarefa e não desabilitada por CONTEXT_COMPACTION=false."""
+    return bool(config) and bool(config.get("enabled", True)) and env_flag("CONTEXT_COMPACTION", True)
+
+
+def compact_task_context(task_key: str, context_tasks: List[Any], raw_context: str,
+                         config: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Substitui o contexto agregado pela CrewAI (`raw_context`) pela versão compactada das saídas
+    de `context_tasks`, arquivando o original. Retorna (contexto, estatísticas).
+    """
+    outputs = [task.output for task in context_tasks if task.output is not None]
+    if not outputs or not raw_context:
+        return raw_context, {}
+    compacted = compact_context(outputs, config)
+    archive_path = archive_raw_context(task_key, raw_context) if config.get("archive", True) else None
+    stats = {
+        "task": task_key,
+        "raw_tokens": estimate_tokens(raw_context),
+        "compacted_tokens": estimate_tokens(compacted),
+        "archive": str(archive_path) if archive_path else None,
+    }
+    print(f"INFO: Contexto da tarefa '{task_key}' compactado: ~{stats['raw_tokens']} -> "
+          f"~{stats['compacted_tokens']} tokens (bruto arquivado em {stats['archive']}).")
+    return compacted, stats
@@ -0,0 +1,260 @@
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .text_utils import SECTION_PJ, SECTION_SOCIOS, is_empty, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Verificação determinística de consistência entre documentos (extração por documento):
+# cada campo é normalizado conforme seu tipo e comparado em todos os pares de documentos
+# por uma matriz de similaridade (cosseno entre vetores de trigramas). Os pares abaixo do
+# limiar formam a tabela de inconsistências entregue à análise de risco.
+NO_CONSISTENCY_TABLE_PLACEHOLDER = (
+    "(Tabela de inconsistências não disponível para este caso. Compare você mesmo os dados do dossiê cadastral.)"
+)
+
+KIND_NAME = "nome"
+KIND_ID = "identificador"
+KIND_ADDRESS = "endereco"
+KIND_MONEY = "valor"
+
+# Campos comparados: (seção, campo, tipo de comparação).
+PJ_FIELDS: List[Tuple[str, str]] = [
+    ("razaoSocial", KIND_NAME),
+    ("cnpj", KIND_ID),
+    ("enderecoSede", KIND_ADDRESS),
+    ("capitalSocial", KIND_MONEY),
+]
+SOCIO_FIELDS: List[Tuple[str, str]] = [
+    ("nomeCompleto", KIND_NAME),
+    ("cpf", KIND_ID),
+    ("enderecoResidencial", KIND_ADDRESS),
+]
+# Limiares de similaridade por tipo: (consistente a partir de, divergência leve a partir de).
+SIMILARITY_THRESHOLDS: Dict[str, Tuple[float, float]] = {
+    KIND_NAME: (0.9, 0.7),
+    KIND_ADDRESS: (0.8, 0.6),
+    KIND_ID: (1.0, 1.0),
+    KIND_MONEY: (1.0, 1.0),
+}
+SEVERITY_BY_KIND = {KIND_NAME: "Alta", KIND_ID: "Alta", KIND_ADDRESS: "Média", KIND_MONEY: "Média"}
+SEVERITY_LIGHT = "Baixa"
+# Nome com esta similaridade em grupos de CPFs diferentes indica a mesma pessoa com CPFs divergentes.
+SAME_PERSON_NAME_SIMILARITY = 0.9
+
+_NAME_STOPWORDS = {"DE", "DA", "DO", "DAS", "DOS", "E"}
+_COMPANY_SUFFIXES = {"LTDA": "LTDA", "LIMITADA": "LTDA", "SA": "SA", "ME": "ME", "EPP": "EPP", "EIRELI": "EIRELI"}
+_ADDRESS_ABBREVIATIONS = {
+    "R": "RUA", "AV": "AVENIDA", "AL": "ALAMEDA", "TV": "TRAVESSA", "PC": "PRACA", "PCA": "PRACA", "EST": "ESTRADA",
+    "ROD": "RODOVIA", "JD": "JARDIM", "VL": "VILA", "STA": "SANTA", "STO": "SANTO", "AP": "APTO", "APT": "APTO",
+    "APARTAMENTO": "APTO", "CJ": "CONJUNTO", "CONJ": "CONJUNTO", "BL": "BLOCO", "SL": "SALA", "DR": "DOUTOR",
+}
+_ADDRESS_STOPWORDS = _NAME_STOPWORDS | {"N", "NO", "NUMERO", "NRO", "CEP", "BAIRRO", "CIDADE", "UF"}
+
+
+def _tokens(value: Any) -> List[str]:
+    text = normalize_text(value)
+    text = text.replace("S/A", "SA").replace("S.A.", "SA")
+    return re.findall(r"[A-Z0-9]+", text)
+
+
+def normalize_name(value: Any) -> str:
+    tokens = [_COMPANY_SUFFIXES.get(t, t) for t in _tokens(value) if t not in _NAME_STOPWORDS]
+    return " ".join(tokens)
+
+
+def normalize_identifier(value: Any) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def normalize_address(value: Any) -> str:
+    if isinstance(value, dict):
+        value = " ".join(str(v) for v in value.values() if not is_empty(v))
+    tokens = [_ADDRESS_ABBREVIATIONS.get(t, t) for t in _tokens(value)]
+    # CEP só com dígitos (01310-100 e 01310100 viram o mesmo token)
+    text = re.sub(r"\b(\d{5}) (\d{3})\b", r"\1\2", " ".join(tokens))
+    return " ".join(t for t in text.split() if t not in _ADDRESS_STOPWORDS)
+
+
+def normalize_money(value: Any) -> str:
+    """'R$ 100.000,00' e '100000' viram '100000.00'; sem número, cai na forma textual."""
+    text = str(value or "")
+    match = re.search(r"\d[\d.,]*", text)
+    if not match:
+        return normalize_text(text)
+    number = match.group(0).rstrip(".,")
+    if "," in number:
+        number = number.replace(".", "").replace(",", ".")
+    elif number.count(".") > 1 or re.search(r"\.\d{3}$", number):
+        number = number.replace(".", "")
+    try:
+        return f"{float(number):.2f}"
+    except ValueError:
+        return normalize_text(text)
+
+
+NORMALIZERS = {
+    KIND_NAME: normalize_name,
+    KIND_ID: normalize_identifier,
+    KIND_ADDRESS: normalize_address,
+    KIND_MONEY: normalize_money,
+}
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def similarity_matrix(values: List[str], kind: str) -> np.ndarray:
+    """
+    Matriz n x n de similaridade entre valores normalizados. Identificadores e valores
+    monetários são comparados por igualdade; nomes e endereços pelo cosseno entre os
+    vetores de contagem de trigramas (uma multiplicação de matrizes para todos os pares).
+    """
+    n = len(values)
+    if kind in (KIND_ID, KIND_MONEY):
+        array = np.asarray(values, dtype=object)
+        return (array[:, None] == array[None, :]).astype(np.float32)
+    vocabulary: Dict[str, int] = {}
+    grams = [_trigrams(v) for v in values]
+    for items in grams:
+        for gram in items:
+            vocabulary.setdefault(gram, len(vocabulary))
+    matrix = np.zeros((n, max(1, len(vocabulary))), dtype=np.float32)
+    for row, items in enumerate(grams):
+        for gram in items:
+            matrix[row, vocabulary[gram]] += 1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return np.clip(matrix @ matrix.T, 0.0, 1.0)
+
+
+def _compare_field(label: str, kind: str, entries: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """Compara os valores de um campo entre documentos; retorna as linhas da tabela de inconsistências."""
+    entries = [(doc, value) for doc, value in entries if not is_empty(value)]
+    if len(entries) < 2:
+        return []
+    normalized = [NORMALIZERS[kind](value) for _, value in entries]
+    scores = similarity_matrix(normalized, kind)
+    consistent, light = SIMILARITY_THRESHOLDS[kind]
+    rows = []
+    upper_i, upper_j = np.triu_indices(len(entries), k=1)
+    for i, j in zip(upper_i.tolist(), upper_j.tolist()):
+        score = float(scores[i, j])
+        if score >= consistent:
+            continue
+        rows.append({
+            "campo": label,
+            "documentoA": entries[i][0],
+            "valorA": entries[i][1],
+            "documentoB": entries[j][0],
+            "valorB": entries[j][1],
+            "similaridade": round(score, 2),
+            "severidade": SEVERITY_LIGHT if score >= light and kind in (KIND_NAME, KIND_ADDRESS) else SEVERITY_BY_KIND[kind],
+        })
+    return rows
+
+
+def _group_socios(shards: List[Tuple[dict, Dict[str, Any]]]) -> List[List[Tuple[str, Dict[str, Any]]]]:
+    """Agrupa os sócios de todos os documentos pelo CPF e, sem CPF, pelo nome mais parecido."""
+    groups: List[List[Tuple[str, Dict[str, Any]]]] = []
+    keys: List[Tuple[str, str]] = []  # (cpf, nome normalizado) de cada grupo
+    pending = []
+    for doc, data in shards:
+        for socio in data.get(SECTION_SOCIOS) or []:
+            cpf = normalize_identifier(socio.get("cpf"))
+            entry = (doc.get("name"), socio)
+            if not cpf:
+                pending.append(entry)
+                continue
+            for index, (group_cpf, _) in enumerate(keys):
+                if group_cpf == cpf:
+                    groups[index].append(entry)
+                    break
+            else:
+                groups.append([entry])
+                keys.append((cpf, normalize_name(socio.get("nomeCompleto"))))
+    for entry in pending:
+        name = normalize_name(entry[1].get("nomeCompleto"))
+        if not name:
+            continue
+        best, best_score = None, 0.0
+        if keys:
+            scores = similarity_matrix([name] + [key_name for _, key_name in keys], KIND_NAME)[0, 1:]
+            best = int(np.argmax(scores))
+            best_score = float(scores[best])
+        if best is not None and best_score >= SIMILARITY_THRESHOLDS[KIND_NAME][1]:
+            groups[best].append(entry)
+        else:
+            groups.append([entry])
+            keys.append(("", name))
+    return groups
+
+
+def check_consistency(shards: List[Tuple[dict, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Tabela de inconsistências entre os documentos do caso (saídas de extract_document):
+    dados da PJ comparados entre todos os documentos e dados de cada sócio comparados entre
+    os documentos em que ele aparece. Inclui pessoas com nomes equivalentes e CPFs diferentes.
+    """
+    shards = sorted(shards, key=lambda item: str(item[0].get("name")))
+    rows: List[Dict[str, Any]] = []
+    compared = 0
+    for field, kind in PJ_FIELDS:
+        entries = [(doc.get("name"), (data.get(SECTION_PJ) or {}).get(field)) for doc, data in shards]
+        compared += sum(1 for _, value in entries if not is_empty(value))
+        rows += _compare_field(f"{SECTION_PJ}.{field}", kind, entries)
+
+    groups = _group_socios(shards)
+    for index, group in enumerate(groups):
+        person = next((s.get("nomeCompleto") for _, s in group if s.get("nomeCompleto")), f"sócio {index + 1}")
+        for field, kind in SOCIO_FIELDS:
+            entries = [(doc, socio.get(field)) for doc, socio in group]
+            compared += sum(1 for _, value in entries if not is_empty(value))
+            rows += _compare_field(f"socio[{person}].{field}", kind, entries)
+
+    # Mesma pessoa (nome equivalente) registrada com CPFs diferentes em documentos distintos
+    group_names = [normalize_name(next((s.get("nomeCompleto") for _, s in g if s.get("nomeCompleto")), "")) for g in groups]
+    group_cpfs = [next((normalize_identifier(s.get("cpf")) for _, s in g if s.get("cpf")), "") for g in groups]
+    if len(groups) > 1:
+        scores = similarity_matrix(group_names, KIND_NAME)
+        upper_i, upper_j = np.triu_indices(len(groups), k=1)
+        for i, j in zip(upper_i.tolist(), upper_j.tolist()):
+            if (group_names[i] and group_cpfs[i] and group_cpfs[j] and group_cpfs[i] != group_cpfs[j]
+                    and float(scores[i, j]) >= SAME_PERSON_NAME_SIMILARITY):
+                rows.append({
+                    "campo": "socio.cpf (nome equivalente, CPFs diferentes)",
+                    "documentoA": ", ".join(sorted({doc for doc, _ in groups[i]})),
+                    "valorA": group_cpfs[i],
+                    "documentoB": ", ".join(sorted({doc for doc, _ in groups[j]})),
+                    "valorB": group_cpfs[j],
+                    "similaridade": round(float(scores[i, j]), 2),
+                    "severidade": SEVERITY_BY_KIND[KIND_ID],
+                })
+    logger.info(f"Consistência entre documentos: {compared} valores comparados, {len(rows)} inconsistências.")
+    return {"valoresComparados": compared, "inconsistencias": rows}
+
+
+def format_consistency_table(consistency: Optional[Dict[str, Any]]) -> str:
+    """Texto do input '{tabela_inconsistencias}' (tabela Markdown)."""
+    if not consistency:
+        return NO_CONSISTENCY_TABLE_PLACEHOLDER
+    rows = consistency.get("inconsistencias") or []
+    header = f"Comparação determinística entre documentos: {consistency.get('valoresComparados', 0)} valores comparados, {len(rows)} inconsistências."
+    if not rows:
+        return header
+    lines = [
+        header, "",
+        "| Campo | Documento A | Valor A | Documento B | Valor B | Similaridade | Severidade |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        cells = [row["campo"], row["documentoA"], row["valorA"], row["documentoB"], row["valorB"],
+                 f"{row['similaridade']:.2f}", row["severidade"]]
+        lines.append("| " + " | ".join(str(c).replace("|", "\\|").replace("\n", " ") for c in cells) + " |")
+    return "\n".join(lines)
@@ -1,4 +1,12 @@
 # from crewai import Agent, Crew, Process, Task # Agent, Task ya no son directamente usados aquí por la clase @CrewBase
+import os
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, wait
+from typing import List, Optional
+
 from crewai import Crew, Process, Agent, Task # Mantener Crew y Process para la segunda clase, Agent y Task para la nueva
 from crewai.project import CrewBase, agent, crew, task
 # from crewai.agents.agent_builder.base_agent import BaseAgent # No es necesario para @agent
@@ -6,7 +14,31 @@ from crewai.project import CrewBase, agent, crew, task
 
 # Importar agentes e tarefas definidos localmente
 from .agents import CadastroAgents
-from .tasks import CadastroTasks
+from .tasks import CadastroTasks, load_tasks_config
+from .extraction import extract_case_dossier, NO_PRE_EXTRACTED_DOSSIER_PLACEHOLDER
+from .budgets import BudgetExceeded, CaseDeadline, deadline_scope, load_time_budgets
+from .preparse import pre_parse_case_documents, format_parsed_documents, NO_PARSED_DOCUMENTS_PLACEHOLDER
+from .checklist import parse_checklist
+from .consistency import format_consistency_table
+from .identifiers import collect_case_identifiers, format_identifier_report, identifiers_scope, validate_identifiers
+from .date_rules import collect_issue_dates, evaluate_date_windows, format_date_facts, parse_current_date
+from .tools.cache import env_flag
+from .llm_cache import llm_cache_scope
+from .tracing import KIND_RUN, KIND_STAGE, Tracer, span, trace_scope, tracing_enabled
+
+# Chaves das tarefas no tasks.yaml, também usadas como nomes das etapas no orçamento de tempo.
+STAGE_VALIDACAO = "tarefa_validacao_documental"
+STAGE_EXTRACAO = "tarefa_extracao_dados"
+STAGE_ANALISE = "tarefa_analise_risco_inconsistencias"
+# Modos de extração (EXTRACTION_MODE): uma tarefa única do agente extrator ("single") ou
+# uma extração pequena por documento, consolidada em Python ("sharded", ver extraction.py).
+EXTRACTION_MODE_SINGLE = "single"
+EXTRACTION_MODE_SHARDED = "sharded"
+# Intervalo (s) com que o kickoff é supervisionado para aplicar os orçamentos de tempo.
+DEADLINE_POLL_SECONDS = 1.0
+# Espera (s) pelo fim da thread do kickoff após o cancelamento por orçamento (KICKOFF_CANCEL_GRACE_SECONDS):
+# a chamada ao LLM em andamento não é interrompida, mas o passo seguinte do agente falha.
+KICKOFF_CANCEL_GRACE_SECONDS_DEFAULT = 10.0
 
 # Opcional: para carregar variáveis de ambiente se não estiverem já carregadas
 # from dotenv import load_dotenv
@@ -84,6 +116,8 @@ class CadastroCrewCliRunner():
     def __init__(self):
         self._agents_manager = CadastroAgents()
         self._tasks_manager = CadastroTasks()
+        # PARALLEL_TASKS=true executa validação e extração em paralelo (ver CadastroCrew)
+        self._parallel_tasks = env_flag("PARALLEL_TASKS", False)
         # Crear instancias de los agentes para que los métodos @agent los devuelvan
         self.agente_triagem_instance = self._agents_manager.triagem_validador_agente()
         self.agente_extrator_instance = self._agents_manager.extrator_info_agente()
@@ -104,20 +138,22 @@ class CadastroCrewCliRunner():
     @task
     def validacao_documental_task(self) -> Task:
         return self._tasks_manager.tarefa_validacao_documental(
-            agent=self.triagem_validador() 
+            self.triagem_validador(),
+            async_execution=self._parallel_tasks
         )
 
     @task
     def extracao_dados_task(self) -> Task:
         return self._tasks_manager.tarefa_extracao_dados(
-            agent=self.extrator_info(), 
-            context_tasks=[self.validacao_documental_task()] 
+            self.extrator_info(),
+            context_tasks=None if self._parallel_tasks else [self.validacao_documental_task()],
+            async_execution=self._parallel_tasks
         )
 
     @task
     def analise_risco_task(self) -> Task:
         return self._tasks_manager.tarefa_analise_risco(
-            agent=self.analista_risco(), 
+            self.analista_risco(),
             context_tasks=[
                 self.validacao_documental_task(),
                 self.extracao_dados_task()
@@ -146,7 +182,8 @@ class CadastroCrew:
     """
     Orquestra o "Crew de Cadastro" para validação documental, extração de dados e análise de risco.
     """
-    def __init__(self, inputs=None):
+    def __init__(self, inputs=None, agents_manager=None, pre_parse_documents=None, parallel_tasks=None,
+                 extraction_mode=None, checklist=None):
         """
         Inicializa o crew com os inputs necessários.
         O dicionário `inputs` deve conter chaves como:
@@ -156,8 +193,155 @@ class CadastroCrew:
         - current_date: str (data atual YYYY-MM-DD)
         - E potencialmente outros campos que as tasks esperam, como dados_pj.cnpj, lista_cpfs_socios
           se já forem conhecidos antes da execução da tarefa de extração.
+        `agents_manager` permite reutilizar um CadastroAgents já construído (e suas ferramentas)
+        entre várias execuções, como no runner em lote; se omitido, um novo é criado em run().
+        `pre_parse_documents` habilita a etapa de pré-parseamento concorrente dos documentos
+        antes do kickoff (padrão: variável de ambiente PRE_PARSE_DOCUMENTS, desabilitada).
+        `parallel_tasks` executa a validação documental e a extração de dados em paralelo;
+        a análise de risco aguarda as duas (padrão: variável PARALLEL_TASKS, desabilitada).
+        `extraction_mode` "sharded" substitui a tarefa de extração por uma extração por documento
+        (uma chamada pequena ao LLM por item de `documents`, em paralelo), consolidada no input
+        'dossie_pre_extraido' da análise de risco (padrão: variável EXTRACTION_MODE, "single").
+        `checklist` (checklist.Checklist) fornece as regras estruturadas usadas no cálculo das
+        janelas de validade; se omitido, o texto de inputs['checklist'] é parseado.
         """
         self.inputs = inputs if inputs else {}
+        self.agents_manager = agents_manager
+        self.pre_parse_documents = (
+            env_flag("PRE_PARSE_DOCUMENTS", False) if pre_parse_documents is None else pre_parse_documents
+        )
+        self.parallel_tasks = env_flag("PARALLEL_TASKS", False) if parallel_tasks is None else parallel_tasks
+        self.extraction_mode = (
+            extraction_mode or os.getenv("EXTRACTION_MODE", EXTRACTION_MODE_SINGLE)
+        ).strip().lower()
+        self.checklist = checklist
+        # Prazo da última execução (ver budgets.py); run() o preenche e o mantém para relatórios.
+        self.deadline = None
+        # Spans da última execução (ver tracing.py), exportadas em TRACE_DIR ao fim de run().
+        self.tracer = None
+        # Thread do kickoff ainda em execução após um BudgetExceeded e unidades da extração por
+        # documento abandonadas ao fim do seu orçamento (ver wait_for_kickoff).
+        self.kickoff_thread: Optional[threading.Thread] = None
+        self.pending_extractions: List[Future] = []
+
+    def _pre_parse(self, agents_manager, required: bool = False) -> dict:
+        """
+        Etapa opcional anterior ao kickoff: resolve e parseia em paralelo todos os documentos
+        do caso, para que os agentes recebam o conteúdo pronto via input 'parsed_documents'
+        em vez de chamar as ferramentas de Supabase/LlamaParse um documento por vez.
+        `required` força a etapa (a extração por documento depende dela).
+        Retorna {nome_do_documento: conteúdo} (vazio se desabilitada ou em caso de falha).
+        """
+        documents = self.inputs.get('documents') or []
+        if not (self.pre_parse_documents or required) or not documents:
+            return {}
+        try:
+            return pre_parse_case_documents(
+                documents,
+                supabase_doc_tool=agents_manager.supabase_doc_tool,
+                llama_parse_tool=agents_manager.llama_parse_tool,
+            )
+        except Exception as e:
+            # O pré-parseamento é uma otimização: em caso de falha, os agentes usam as ferramentas.
+            print(f"AVISO: Falha no pré-parseamento dos documentos; os agentes usarão as ferramentas. {e}")
+            return {}
+
+    def _extract_pre_dossier(self, parsed: dict, agente_extrator) -> dict:
+        """
+        Extração por documento (modo "sharded"): usa o LLM do agente extrator e os campos
+        por tipo de documento do tasks.yaml (extracao_por_documento). Retorna o dossiê consolidado.
+        """
+        documents = self.inputs.get('documents') or []
+        config = load_tasks_config()['extracao_por_documento']
+        # As chamadas não pertencem a uma Task: o opt-in do cache de respostas vem da seção do tasks.yaml.
+        with llm_cache_scope(config.get('llm_cache', False)):
+            return extract_case_dossier(documents, parsed, agente_extrator.llm, config,
+                                        abandoned=self.pending_extractions)
+
+    def _build_date_facts_input(self, parsed: dict, dossier) -> str:
+        """
+        Avalia em Python as janelas de validade do checklist (date_rules.py) com as datas de
+        emissão da extração por documento ou do conteúdo pré-parseado. Retorna o texto do
+        input 'fatos_validade_datas' (placeholder se não houver regras ou datas).
+        """
+        documents = self.inputs.get('documents') or []
+        rules = self.checklist.rules if self.checklist is not None else parse_checklist(self.inputs.get('checklist') or '')
+        current_date = parse_current_date(self.inputs.get('current_date'))
+        started_at = time.perf_counter()
+        facts = evaluate_date_windows(rules, documents, collect_issue_dates(documents, parsed, dossier), current_date)
+        print(f"INFO: {len(facts)} fatos de janela de validade calculados em {(time.perf_counter() - started_at) * 1000:.2f}ms.")
+        return format_date_facts(facts, current_date)
+
+    @staticmethod
+    def _bind_stage_budgets(deadline: CaseDeadline, stages):
+        """
+        Aplica os orçamentos de tempo às tarefas de `stages` [(tarefa, etapa)]:
+        - a etapa começa quando a tarefa inicia (CadastroTask) e termina no callback da tarefa;
+        - o step_callback de cada agente verifica o prazo a cada passo (LLM ou ferramenta) e
+          interrompe a tarefa com BudgetExceeded quando ele se esgota.
+        """
+        for crew_task, stage in stages:
+            deadline.bind_task(crew_task, stage)
+
+            def _check_budget(_step, stage=stage):
+                deadline.check(stage)
+
+            def _on_task_done(_output, stage=stage):
+                deadline.end_stage(stage)
+
+            crew_task.agent.step_callback = _check_budget
+            crew_task.callback = _on_task_done
+
+    def _kickoff_with_deadline(self, crew: Crew, kickoff_inputs: dict, deadline: CaseDeadline):
+        """
+        Executa o kickoff em uma thread supervisionada. Ao esgotar o orçamento da etapa em
+        andamento ou o prazo do caso, o prazo é cancelado (as ferramentas e o próximo passo
+        dos agentes falham imediatamente) e BudgetExceeded é levantada após esperar o fim da
+        thread por KICKOFF_CANCEL_GRACE_SECONDS. Se ela continuar viva (ex: chamada ao LLM em
+        andamento), fica em `self.kickoff_thread` para que quem controla a concorrência
+        (run_batch) aguarde seu término com wait_for_kickoff() antes de iniciar outro caso.
+        """
+        future: Future = Future()
+        context = contextvars.copy_context() # Propaga o prazo do caso para a thread do kickoff
+
+        def _target():
+            try:
+                future.set_result(context.run(crew.kickoff, inputs=kickoff_inputs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        thread = threading.Thread(target=_target, name=f"cadastro-kickoff-{deadline.case_id}", daemon=True)
+        thread.start()
+        while True:
+            try:
+                return future.result(timeout=DEADLINE_POLL_SECONDS)
+            except FutureTimeoutError:
+                try:
+                    deadline.check_running()
+                except BudgetExceeded:
+                    grace = float(os.getenv("KICKOFF_CANCEL_GRACE_SECONDS", KICKOFF_CANCEL_GRACE_SECONDS_DEFAULT))
+                    thread.join(grace)
+                    if thread.is_alive():
+                        print(f"AVISO: Kickoff do case_id '{deadline.case_id}' ainda em execução {grace:g}s após o cancelamento.")
+                        self.kickoff_thread = thread
+                    raise
+
+    def wait_for_kickoff(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o fim do trabalho abandonado pelo caso: a thread do kickoff após um
+        BudgetExceeded e as unidades da extração por documento que passaram do orçamento.
+        Retorna True se nada estiver em execução ao final da espera.
+        """
+        started_at = time.monotonic()
+        if self.pending_extractions:
+            _, pending = wait(self.pending_extractions, timeout=timeout)
+            self.pending_extractions = list(pending)
+        thread = self.kickoff_thread
+        if thread is not None:
+            thread.join(None if timeout is None else max(0.0, timeout - (time.monotonic() - started_at)))
+            if not thread.is_alive():
+                self.kickoff_thread = thread = None
+        return thread is None and not self.pending_extractions
 
     def run(self):
         """
@@ -165,8 +349,13 @@ class CadastroCrew:
         Retorna o resultado da execução do Crew.
         """
         # Instanciar os gerenciadores de agentes e tarefas
-        agents_manager = CadastroAgents()
+        # As ferramentas ficam no CadastroAgents e podem ser compartilhadas; os agentes
+        # são criados a cada run() para que execuções concorrentes não compartilhem estado.
+        agents_manager = self.agents_manager or CadastroAgents()
         tasks_manager = CadastroTasks()
+        stage_keys = [STAGE_VALIDACAO, STAGE_EXTRACAO, STAGE_ANALISE]
+        deadline = CaseDeadline(str(self.inputs.get('case_id', '')), **load_time_budgets(load_tasks_config(), stage_keys))
+        self.deadline = deadline
 
         # Criar os agentes
         agente_triagem = agents_manager.triagem_validador_agente()
@@ -175,39 +364,43 @@ class CadastroCrew:
 
         # Criar as tarefas
         # A ordem e o contexto são importantes aqui
+        sharded_extraction = self.extraction_mode == EXTRACTION_MODE_SHARDED
         # Tarefa 1: Validação Documental
-        task_validacao = tasks_manager.tarefa_validacao_documental(agente_triagem)
+        task_validacao = tasks_manager.tarefa_validacao_documental(
+            agente_triagem, async_execution=self.parallel_tasks and not sharded_extraction
+        )
+        stages = [(task_validacao, STAGE_VALIDACAO)]
 
         # Tarefa 2: Extração de Dados
-        # Esta tarefa pode depender do resultado da validação (implicitamente, pois usa os mesmos documentos)
-        # ou explicitamente se a validação gerar um output que a extração precise.
-        # Por agora, vamos assumir uma dependência sequencial simples.
-        task_extracao = tasks_manager.tarefa_extracao_dados(
-            agente_extrator,
-            context_tasks=[task_validacao] # Resultado da validação pode ser útil
-        )
+        # A extração só precisa dos documentos, não do veredito da validação. No modo paralelo
+        # as duas tarefas rodam ao mesmo tempo (async_execution) e a extração não recebe a
+        # validação como contexto; no modo sequencial o resultado da validação é repassado.
+        # No modo "sharded" a tarefa não é criada: a extração por documento roda antes do kickoff.
+        task_extracao = None
+        if not sharded_extraction:
+            task_extracao = tasks_manager.tarefa_extracao_dados(
+                agente_extrator,
+                context_tasks=None if self.parallel_tasks else [task_validacao],
+                async_execution=self.parallel_tasks
+            )
+            stages.append((task_extracao, STAGE_EXTRACAO))
 
         # Tarefa 3: Análise de Risco e Inconsistências
-        # Esta tarefa depende criticamente dos dados extraídos pela task_extracao.
+        # Esta tarefa depende criticamente dos dados extraídos pela task_extracao
+        # (ou do input 'dossie_pre_extraido' no modo "sharded").
         # Também pode usar o resultado da task_validacao para entender pendências.
+        # É síncrona: a CrewAI aguarda as tarefas assíncronas do contexto antes de iniciá-la.
         task_analise = tasks_manager.tarefa_analise_risco(
             agente_risco,
-            context_tasks=[task_validacao, task_extracao] 
+            context_tasks=[crew_task for crew_task, _ in stages]
         )
+        stages.append((task_analise, STAGE_ANALISE))
 
         # Montar o Crew
         crew = Crew(
-            agents=[
-                agente_triagem,
-                agente_extrator,
-                agente_risco
-            ],
-            tasks=[
-                task_validacao,
-                task_extracao,
-                task_analise
-            ],
-            process=Process.sequential,  # Processo sequencial por padrão
+            agents=[crew_task.agent for crew_task, _ in stages],
+            tasks=[crew_task for crew_task, _ in stages],
+            process=Process.sequential,  # Sequencial; no modo paralelo as duas primeiras tarefas são assíncronas
             verbose=True, # MODIFICADO DE 2 A True
             # memory=True, # Descomente se quiser habilitar memória de curto prazo entre tarefas
             # cache=True, # Descomente para habilitar cache de LLM para execuções repetidas
@@ -217,12 +410,78 @@ class CadastroCrew:
 
         # Executar o Crew com os inputs fornecidos na inicialização da classe CadastroCrew
         # Os inputs serão automaticamente disponibilizados para as tasks que os referenciam.
+        # Uma cópia é usada para não levar o conteúdo pré-parseado para o relatório de main.py.
         print("INFO: Iniciando o kickoff do CadastroCrew...")
         print(f"INFO: Inputs para o kickoff: {self.inputs}")
-        
-        result = crew.kickoff(inputs=self.inputs)
+        # O prazo do caso (tasks.yaml: time_budgets e max_execution_seconds) cobre o
+        # pré-parseamento e o kickoff; se esgotado, BudgetExceeded indica a etapa responsável.
+        self._bind_stage_budgets(deadline, stages)
+        # Spans da execução (tracing.py): etapas, tarefas, ferramentas e chamadas ao LLM.
+        tracer = Tracer(deadline.case_id) if tracing_enabled() else None
+        self.tracer = tracer
+        started_at = time.perf_counter()
+        try:
+            with trace_scope(tracer), deadline_scope(deadline), span(
+                "cadastro_crew_run", KIND_RUN, extraction_mode=self.extraction_mode, parallel_tasks=self.parallel_tasks
+            ):
+                kickoff_inputs = dict(self.inputs)
+                with span("pre_parseamento", KIND_STAGE, documents=len(self.inputs.get('documents') or [])):
+                    parsed = self._pre_parse(agents_manager, required=sharded_extraction)
+                documents = self.inputs.get('documents') or []
+                kickoff_inputs['parsed_documents'] = (
+                    format_parsed_documents(documents, parsed) if parsed else NO_PARSED_DOCUMENTS_PLACEHOLDER
+                )
+                dossier = None
+                if sharded_extraction:
+                    with span("extracao_por_documento", KIND_STAGE):
+                        dossier = self._extract_pre_dossier(parsed, agente_extrator)
+                # A tabela de inconsistências vai em um input próprio (fora do JSON do dossiê).
+                consistency = dossier.pop('consistencia', None) if dossier is not None else None
+                kickoff_inputs['tabela_inconsistencias'] = format_consistency_table(consistency)
+                kickoff_inputs['dossie_pre_extraido'] = (
+                    json.dumps(dossier, indent=2, ensure_ascii=False) if dossier is not None
+                    else NO_PRE_EXTRACTED_DOSSIER_PLACEHOLDER
+                )
+                kickoff_inputs['fatos_validade_datas'] = self._build_date_facts_input(parsed, dossier)
+                # CNPJ/CPF conhecidos antes do kickoff são validados localmente; os inválidos
+                # ficam registrados no contexto e a busca web não é feita para eles.
+                identifier_checks = validate_identifiers(*collect_case_identifiers(self.inputs, dossier))
+                kickoff_inputs['validacao_identificadores'] = format_identifier_report(identifier_checks)
+                with identifiers_scope(identifier_checks):
+                    with span("kickoff", KIND_STAGE):
+                        result = self._kickoff_with_deadline(crew, kickoff_inputs, deadline)
+        except BudgetExceeded as e:
+            print(f"ERRO: {e} Resumo do orçamento: {deadline.summary()}")
+            raise
+        finally:
+            self._export_trace(tracer)
+        print(f"INFO: Kickoff concluído em {time.perf_counter() - started_at:.1f}s "
+              f"(modo {'paralelo' if self.parallel_tasks else 'sequencial'}, extração {self.extraction_mode}). "
+              f"Orçamento: {deadline.summary()}")
+        self._log_task_timings(stages)
         return result
 
+    @staticmethod
+    def _export_trace(tracer) -> None:
+        """Exporta as spans da execução (JSON lines + métricas Prometheus) e registra os totais."""
+        if tracer is None:
+            return
+        trace_path = tracer.export()
+        if trace_path is not None:
+            totals = tracer.totals()
+            print(f"INFO: {len(tracer.spans)} spans exportadas em {trace_path} (e .prom): "
+                  f"{totals['bytes_in']:.0f} bytes recebidos, {totals['bytes_out']:.0f} enviados, "
+                  f"{totals['prompt_tokens']:.0f}+{totals['completion_tokens']:.0f} tokens.")
+
+    @staticmethod
+    def _log_task_timings(stages) -> None:
+        """Registra a duração de cada tarefa (Task.start_time/end_time, preenchidos pela CrewAI)."""
+        for crew_task, stage in stages:
+            duration = crew_task.execution_duration
+            if duration is not None:
+                print(f"INFO: Tarefa '{stage}' executada em {duration:.1f}s "
+                      f"({crew_task.start_time:%H:%M:%S} - {crew_task.end_time:%H:%M:%S}).")
+
 # Exemplo de como usar esta clase en main.py:
 # from .crew import CadastroCrew
 # if __name__ == "__main__":
@@ -0,0 +1,203 @@
+import re
+import calendar
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .checklist import ChecklistRule
+from .preparse import PRE_PARSE_FAILURE_PREFIX
+from .text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Avaliação determinística das janelas de validade do checklist ("emitido nos últimos 90 dias",
+# "defasagem máxima de 2 meses em relação à data atual"). Os resultados entram no prompt da
+# validação documental como fatos, no input '{fatos_validade_datas}'.
+NO_DATE_FACTS_PLACEHOLDER = (
+    "(Nenhum fato de data calculado para este caso. Aplique as regras de data do checklist a partir das datas "
+    "encontradas nos documentos e da data atual.)"
+)
+RESULT_WITHIN = "Dentro do prazo"
+RESULT_EXPIRED = "Fora do prazo"
+RESULT_FUTURE = "Data futura"
+RESULT_UNKNOWN = "Data de emissão não identificada"
+SOURCE_EXTRACTION = "extração por documento"
+SOURCE_TEXT = "texto do documento"
+
+_MONTHS = {
+    "JANEIRO": 1, "FEVEREIRO": 2, "MARCO": 3, "ABRIL": 4, "MAIO": 5, "JUNHO": 6,
+    "JULHO": 7, "AGOSTO": 8, "SETEMBRO": 9, "OUTUBRO": 10, "NOVEMBRO": 11, "DEZEMBRO": 12,
+}
+_NUMERIC_DATE_RE = re.compile(r"\b(\d{1,2})[/.\-](\d{1,2})[/.\-](\d{4}|\d{2})\b")
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_WRITTEN_DATE_RE = re.compile(r"\b(\d{1,2}) DE (" + "|".join(_MONTHS) + r") DE (\d{4})\b")
+_MONTH_YEAR_RE = re.compile(r"\b(\d{1,2})[/.\-](\d{4})\b")
+_DATE_RE = (r"(\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2} DE [A-Z]+ DE \d{4}"
+            r"|\d{1,2}[/.\-]\d{4})")
+# Datas de emissão no texto parseado: só as ancoradas em expressões de emissão/referência
+# (datas soltas, como a de abertura da empresa, não são consideradas).
+_ISSUE_DATE_RE = re.compile(
+    r"(?:DATA (?:DE |DA )?(?:EMISSAO|EXPEDICAO)|EMITID[OA] (?:EM|NO DIA)|EXPEDID[OA] EM|GERAD[OA] EM"
+    r"|(?:MES|DATA) (?:DE )?REFERENCIA|REFERENCIA|EMISSAO)\D{0,20}?" + _DATE_RE
+)
+
+
+class DateWindowFact(BaseModel):
+    """Resultado da avaliação de uma regra de janela de validade para um documento do caso."""
+    regra: str
+    tipoDocumento: str
+    documento: Optional[str] = None
+    dataEmissao: Optional[str] = None
+    fonte: Optional[str] = None
+    janela: str
+    dataLimite: str
+    idadeDias: Optional[int] = None
+    resultado: str
+
+    def describe(self) -> str:
+        if self.dataEmissao is None:
+            return (f"- [{self.regra}] {self.documento} ({self.tipoDocumento}): {self.resultado}; "
+                    f"janela de {self.janela} (emissão a partir de {self.dataLimite}).")
+        return (f"- [{self.regra}] {self.documento} ({self.tipoDocumento}): emitido em {self.dataEmissao} "
+                f"({self.fonte}), {self.idadeDias} dias antes da data atual; janela de {self.janela} "
+                f"(emissão a partir de {self.dataLimite}) => {self.resultado}.")
+
+
+def _shift_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = divmod(month_index, 12)
+    day = min(value.day, calendar.monthrange(year, month + 1)[1])
+    return date(year, month + 1, day)
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """
+    Converte datas nos formatos usados nos documentos (DD/MM/AAAA, AAAA-MM-DD, "15 de maio de 2025",
+    MM/AAAA) em date. Uma data só com mês e ano (ex: mês de referência) vale pelo último dia do mês.
+    Retorna None se o valor não for uma data válida.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = normalize_text(value)
+    try:
+        match = _ISO_DATE_RE.search(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        match = _NUMERIC_DATE_RE.search(text)
+        if match:
+            year = int(match.group(3))
+            year = year + 2000 if year < 100 else year
+            return date(year, int(match.group(2)), int(match.group(1)))
+        match = _WRITTEN_DATE_RE.search(text)
+        if match:
+            return date(int(match.group(3)), _MONTHS[match.group(2)], int(match.group(1)))
+        match = _MONTH_YEAR_RE.search(text)
+        if match:
+            year, month = int(match.group(2)), int(match.group(1))
+            return date(year, month, calendar.monthrange(year, month)[1])
+    except ValueError:
+        return None
+    return None
+
+
+def find_issue_date(text: str) -> Optional[date]:
+    """Primeira data de emissão/referência identificável no texto de um documento."""
+    for match in _ISSUE_DATE_RE.finditer(normalize_text(text or "")):
+        parsed = parse_date(match.group(1))
+        if parsed is not None:
+            return parsed
+    return None
+
+
+def collect_issue_dates(documents: List[Dict[str, Any]], parsed: Optional[Dict[str, str]] = None,
+                        dossier: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[Optional[date], Optional[str]]]:
+    """
+    Data de emissão de cada documento do caso: {nome: (data, fonte)}.
+    Usa a 'dataEmissao' da extração por documento (dossier['documentos']) quando disponível e,
+    na falta dela, procura a data no conteúdo pré-parseado.
+    """
+    extracted = {d.get("name"): d.get("dataEmissao") for d in (dossier or {}).get("documentos") or []}
+    dates: Dict[str, Tuple[Optional[date], Optional[str]]] = {}
+    for doc in documents:
+        name = doc.get("name")
+        issue_date = parse_date(extracted.get(name))
+        if issue_date is not None:
+            dates[name] = (issue_date, SOURCE_EXTRACTION)
+            continue
+        content = (parsed or {}).get(name)
+        if content and not content.startswith(PRE_PARSE_FAILURE_PREFIX):
+            issue_date = find_issue_date(content)
+            if issue_date is not None:
+                dates[name] = (issue_date, SOURCE_TEXT)
+                continue
+        dates[name] = (None, None)
+    return dates
+
+
+def window_start(rule: ChecklistRule, current_date: date) -> date:
+    """Data de emissão mais antiga aceita pela janela da regra."""
+    if rule.janelaUnidade == "dias":
+        return date.fromordinal(current_date.toordinal() - rule.janelaValor)
+    months = rule.janelaValor * (12 if rule.janelaUnidade == "anos" else 1)
+    return _shift_months(current_date, -months)
+
+
+def evaluate_date_windows(rules: List[ChecklistRule], documents: List[Dict[str, Any]],
+                          issue_dates: Dict[str, Tuple[Optional[date], Optional[str]]],
+                          current_date: date) -> List[DateWindowFact]:
+    """Avalia cada regra com janela de validade contra os documentos do caso do mesmo tipo."""
+    facts: List[DateWindowFact] = []
+    for rule in rules:
+        if rule.janelaValor is None or not rule.tipoDocumento:
+            continue
+        limit = window_start(rule, current_date)
+        for doc in documents:
+            if doc.get("type") != rule.tipoDocumento:
+                continue
+            issue_date, source = issue_dates.get(doc.get("name"), (None, None))
+            if issue_date is None:
+                result = RESULT_UNKNOWN
+            elif issue_date > current_date:
+                result = RESULT_FUTURE
+            else:
+                result = RESULT_WITHIN if issue_date >= limit else RESULT_EXPIRED
+            facts.append(DateWindowFact(
+                regra=rule.id,
+                tipoDocumento=rule.tipoDocumento,
+                documento=doc.get("name"),
+                dataEmissao=issue_date.isoformat() if issue_date else None,
+                fonte=source,
+                janela=f"{rule.janelaValor} {rule.janelaUnidade}",
+                dataLimite=limit.isoformat(),
+                idadeDias=(current_date - issue_date).days if issue_date else None,
+                resultado=result,
+            ))
+    return facts
+
+
+def format_date_facts(facts: List[DateWindowFact], current_date: date) -> str:
+    """
+    Texto do input '{fatos_validade_datas}'. Sem nenhuma data de emissão identificada (modo
+    padrão, sem pré-parseamento nem extração por documento) retorna o placeholder; os documentos
+    sem data entram numa única linha, em vez de um fato por regra e documento.
+    """
+    known = [fact for fact in facts if fact.resultado != RESULT_UNKNOWN]
+    if not known:
+        return NO_DATE_FACTS_PLACEHOLDER
+    lines = [f"Janelas de validade calculadas em Python para a data atual {current_date.isoformat()}:"]
+    lines += [fact.describe() for fact in known]
+    unknown = list(dict.fromkeys(fact.documento for fact in facts if fact.resultado == RESULT_UNKNOWN))
+    if unknown:
+        lines.append(f"{RESULT_UNKNOWN} (aplique as regras de data a partir do conteúdo): {', '.join(map(str, unknown))}")
+    return "\n".join(lines)
+
+
+def parse_current_date(value: Any) -> date:
+    """Data atual do caso (input 'current_date', AAAA-MM-DD); hoje se ausente ou inválida."""
+    return parse_date(value) or date.today()
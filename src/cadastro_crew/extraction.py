@@ -0,0 +1,263 @@
+import os
+import re
+import json
+import time
+import logging
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from .budgets import current_deadline, record_overrun
+from .consistency import check_consistency
+from .preparse import PRE_PARSE_FAILURE_PREFIX
+from .text_utils import (
+    OBJECT_SECTIONS, SECTION_FINANCEIROS, SECTION_OUTRAS, SECTION_PJ, SECTION_SOCIOS,
+    is_empty, normalize_text, normalize_value, parse_json_object,
+)
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_SHARD_CONCURRENCY_DEFAULT = 4
+# Nome da etapa no orçamento de tempo do caso (time_budgets.stages em tasks.yaml).
+SHARDED_EXTRACTION_STAGE = "extracao_por_documento"
+# Valor do input 'dossie_pre_extraido' quando a extração por documento não é usada.
+NO_PRE_EXTRACTED_DOSSIER_PLACEHOLDER = "(Nenhum dossiê pré-extraído. Utilize o dossiê cadastral fornecido no contexto.)"
+
+# Precedência entre tipos de documento na consolidação (menor = mais confiável para a seção).
+# Tipos ausentes da lista ficam por último; empates são resolvidos pelo nome do arquivo.
+SECTION_PRIORITY: Dict[str, List[str]] = {
+    SECTION_PJ: ["CNPJ", "CertidaoSimplificada", "ContratoSocial", "QuadroSocietario"],
+    SECTION_SOCIOS: ["DocumentoIdentificacaoSocio", "ContratoSocial", "CertidaoSimplificada", "QuadroSocietario",
+                     "ComprovanteEnderecoSocio"],
+    SECTION_FINANCEIROS: [],
+    SECTION_OUTRAS: ["CertidaoSimplificada", "ContratoSocial"],
+}
+# Campos de sócio cuja melhor fonte não segue a precedência da seção.
+SOCIO_FIELD_PRIORITY: Dict[str, List[str]] = {
+    "enderecoResidencial": ["ComprovanteEnderecoSocio", "DocumentoIdentificacaoSocio", "ContratoSocial"],
+    "participacaoSocietaria": ["ContratoSocial", "CertidaoSimplificada", "QuadroSocietario"],
+    "cargo": ["ContratoSocial", "CertidaoSimplificada", "QuadroSocietario"],
+}
+
+
+def _priority(order: List[str], doc_type: str) -> int:
+    return order.index(doc_type) if doc_type in order else len(order)
+
+
+def build_shard_prompt(doc: dict, content: str, fields: Dict[str, List[str]], config: dict) -> List[Dict[str, str]]:
+    """Mensagens da extração de um único documento, pedindo apenas os campos do seu tipo."""
+    skeleton: Dict[str, Any] = {"dataEmissao": None}
+    for section, section_fields in fields.items():
+        item = {field: None for field in section_fields}
+        skeleton[section] = [item] if section == SECTION_SOCIOS else item
+    max_chars = int(config.get("max_document_chars") or 0)
+    if max_chars and len(content) > max_chars:
+        content = content[:max_chars]
+    user_prompt = (
+        f"Documento: {doc.get('name')} (tipo: {doc.get('type')})\n\n"
+        f"Preencha este JSON com os dados do documento"
+        f"{' (uma entrada em socios por sócio/representante)' if SECTION_SOCIOS in fields else ''}:\n"
+        f"{json.dumps(skeleton, ensure_ascii=False, indent=2)}\n\n"
+        f"Conteúdo do documento:\n{content}"
+    )
+    return [
+        {"role": "system", "content": config.get("instructions", "")},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def extract_document(llm, doc: dict, content: str, fields: Dict[str, List[str]], config: dict) -> Dict[str, Any]:
+    """Executa a extração de um documento (uma chamada ao LLM) e mantém apenas os campos pedidos."""
+    started_at = time.perf_counter()
+    raw = llm.call(build_shard_prompt(doc, content, fields, config))
+    data = parse_json_object(str(raw))
+    result: Dict[str, Any] = {"dataEmissao": data.get("dataEmissao")}
+    for section, section_fields in fields.items():
+        value = data.get(section)
+        if section == SECTION_SOCIOS:
+            items = value if isinstance(value, list) else [value] if isinstance(value, dict) else []
+            result[section] = [
+                {field: item.get(field) for field in section_fields} for item in items if isinstance(item, dict)
+            ]
+        else:
+            value = value if isinstance(value, dict) else {}
+            result[section] = {field: value.get(field) for field in section_fields}
+    logger.info(f"Extração de '{doc.get('name')}' concluída em {time.perf_counter() - started_at:.1f}s.")
+    return result
+
+
+class DossierMerger:
+    """
+    Consolida as extrações por documento em um único dossiê, de forma determinística:
+    para cada campo vale o primeiro valor não vazio na ordem de precedência dos tipos de
+    documento (SECTION_PRIORITY / SOCIO_FIELD_PRIORITY, depois o nome do arquivo); valores
+    diferentes vindos de outros documentos são registrados em 'divergencias'.
+    Sócios são agrupados pelo CPF (dígitos) ou, sem CPF, pelo nome normalizado.
+    """
+
+    def __init__(self):
+        self.dossier: Dict[str, Any] = {
+            SECTION_PJ: {},
+            "dadosSociosRepresentantes": [],
+            SECTION_FINANCEIROS: {},
+            SECTION_OUTRAS: {},
+            "documentos": [],
+            "divergencias": [],
+            "fontes": {},
+        }
+        self._socio_sources: List[Dict[str, str]] = []
+
+    def _set_field(self, target: dict, sources: dict, label: str, field: str, value: Any, source: str) -> None:
+        if is_empty(value):
+            return
+        if is_empty(target.get(field)):
+            target[field] = value
+            sources[field] = source
+        elif normalize_value(target[field]) != normalize_value(value):
+            self.dossier["divergencias"].append({
+                "campo": f"{label}.{field}",
+                "valorAdotado": target[field],
+                "fonteAdotada": sources.get(field),
+                "valorDivergente": value,
+                "fonteDivergente": source,
+            })
+
+    def _match_socio(self, socio: dict) -> Optional[int]:
+        cpf = re.sub(r"\D", "", str(socio.get("cpf") or ""))
+        name = normalize_text(socio.get("nomeCompleto") or "")
+        for index, existing in enumerate(self.dossier["dadosSociosRepresentantes"]):
+            existing_cpf = re.sub(r"\D", "", str(existing.get("cpf") or ""))
+            if cpf and existing_cpf:
+                if cpf == existing_cpf:
+                    return index
+                continue
+            if name and name == normalize_text(existing.get("nomeCompleto") or ""):
+                return index
+        return None
+
+    def _add_socio(self, socio: dict, source: str, only_field: Optional[str] = None) -> None:
+        """Agrupa `socio` com a pessoa correspondente; com `only_field`, só esse campo é consolidado."""
+        index = self._match_socio(socio)
+        if index is None:
+            self.dossier["dadosSociosRepresentantes"].append({})
+            self._socio_sources.append({})
+            index = len(self._socio_sources) - 1
+            only_field = None # Pessoa nova: registra também os dados de identificação
+        target = self.dossier["dadosSociosRepresentantes"][index]
+        label = f"dadosSociosRepresentantes[{index}]"
+        for field, value in socio.items():
+            if only_field is None or field == only_field:
+                self._set_field(target, self._socio_sources[index], label, field, value, source)
+
+    def merge(self, shards: List[Tuple[dict, Dict[str, Any]]]) -> Dict[str, Any]:
+        """`shards`: [(documento, extração)] em qualquer ordem; o resultado não depende dela."""
+        shards = sorted(shards, key=lambda item: str(item[0].get("name")))
+        for doc, data in shards:
+            self.dossier["documentos"].append({
+                "name": doc.get("name"), "type": doc.get("type"), "dataEmissao": data.get("dataEmissao"),
+            })
+
+        for section in OBJECT_SECTIONS:
+            order = SECTION_PRIORITY.get(section, [])
+            sources = self.dossier["fontes"].setdefault(section, {})
+            for doc, data in sorted(shards, key=lambda item: _priority(order, item[0].get("type"))):
+                for field, value in (data.get(section) or {}).items():
+                    self._set_field(self.dossier[section], sources, section, field, value, doc.get("name"))
+
+        # Sócios: primeiro cria/agrupa as pessoas pela precedência da seção; campos com
+        # precedência própria (endereço, participação, cargo) são resolvidos campo a campo.
+        socio_shards = [(doc, data) for doc, data in shards if data.get(SECTION_SOCIOS)]
+        section_order = SECTION_PRIORITY[SECTION_SOCIOS]
+        for doc, data in sorted(socio_shards, key=lambda item: _priority(section_order, item[0].get("type"))):
+            for socio in data[SECTION_SOCIOS]:
+                self._add_socio(
+                    {k: v for k, v in socio.items() if k not in SOCIO_FIELD_PRIORITY}, doc.get("name")
+                )
+        for field, order in SOCIO_FIELD_PRIORITY.items():
+            for doc, data in sorted(socio_shards, key=lambda item: _priority(order, item[0].get("type"))):
+                for socio in data[SECTION_SOCIOS]:
+                    if field in socio:
+                        self._add_socio({
+                            "nomeCompleto": socio.get("nomeCompleto"), "cpf": socio.get("cpf"), field: socio[field],
+                        }, doc.get("name"), only_field=field)
+        self.dossier["fontes"]["dadosSociosRepresentantes"] = self._socio_sources
+        return self.dossier
+
+
+def merge_extractions(shards: List[Tuple[dict, Dict[str, Any]]]) -> Dict[str, Any]:
+    return DossierMerger().merge(shards)
+
+
+def extract_case_dossier(
+    documents: List[dict],
+    parsed: Dict[str, str],
+    llm,
+    config: dict,
+    max_concurrency: Optional[int] = None,
+    abandoned: Optional[List[Future]] = None,
+) -> Dict[str, Any]:
+    """
+    Extração por documento: uma unidade de extração por item de `documents` (com conteúdo
+    em `parsed`, saída de pre_parse_case_documents), com os campos do seu 'type'
+    (config['campos_por_tipo']), executadas em paralelo e consolidadas por merge_extractions.
+    Documentos sem campos configurados, sem conteúdo ou cuja extração falhou ficam
+    registrados em 'falhasExtracao'. A comparação entre documentos (consistency.py) fica
+    em 'consistencia'. Com um prazo de caso ativo, a etapa é limitada ao
+    orçamento 'extracao_por_documento'; as unidades ainda em execução ao fim do orçamento
+    (chamada ao LLM em andamento, que não pode ser interrompida) são acrescentadas a
+    `abandoned`, para que quem controla a concorrência aguarde seu término.
+    """
+    fields_by_type = config.get("campos_por_tipo") or {}
+    failures: List[Dict[str, str]] = []
+    units = []
+    for doc in documents:
+        content = parsed.get(doc.get("name"))
+        fields = fields_by_type.get(doc.get("type"))
+        if not fields:
+            failures.append({"documento": doc.get("name"), "motivo": f"tipo '{doc.get('type')}' sem campos configurados"})
+        elif not content or content.startswith(PRE_PARSE_FAILURE_PREFIX):
+            failures.append({"documento": doc.get("name"), "motivo": "conteúdo parseado indisponível"})
+        else:
+            units.append((doc, content, fields))
+
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("EXTRACTION_SHARD_CONCURRENCY", EXTRACTION_SHARD_CONCURRENCY_DEFAULT))
+    deadline = current_deadline()
+    timeout = None
+    if deadline is not None:
+        deadline.begin_stage(SHARDED_EXTRACTION_STAGE)
+        timeout = deadline.check(SHARDED_EXTRACTION_STAGE)
+
+    started_at = time.perf_counter()
+    shards: List[Tuple[dict, Dict[str, Any]]] = []
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="cadastro-extracao")
+    try:
+        futures = {
+            # Cada unidade herda o contexto (prazo do caso) de quem disparou a extração.
+            executor.submit(contextvars.copy_context().run, extract_document, llm, doc, content, fields, config): doc
+            for doc, content, fields in units
+        }
+        _, pending = wait(futures, timeout=timeout)
+        if pending:
+            record_overrun(SHARDED_EXTRACTION_STAGE)
+        for future, doc in futures.items():
+            if future in pending:
+                if not future.cancel() and abandoned is not None:
+                    abandoned.append(future)
+                failures.append({"documento": doc.get("name"), "motivo": "orçamento de tempo esgotado"})
+            elif future.exception() is not None:
+                logger.error(f"Erro na extração de '{doc.get('name')}': {future.exception()}")
+                failures.append({"documento": doc.get("name"), "motivo": f"{type(future.exception()).__name__} - {future.exception()}"})
+            else:
+                shards.append((doc, future.result()))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        if deadline is not None:
+            deadline.end_stage(SHARDED_EXTRACTION_STAGE)
+
+    dossier = merge_extractions(shards)
+    dossier["falhasExtracao"] = sorted(failures, key=lambda f: str(f["documento"]))
+    dossier["consistencia"] = check_consistency(shards)
+    print(f"INFO: Extração por documento: {len(shards)}/{len(documents)} documentos em {time.perf_counter() - started_at:.1f}s, "
+          f"{len(dossier['divergencias'])} divergências entre documentos.")
+    return dossier
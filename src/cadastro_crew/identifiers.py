@@ -0,0 +1,177 @@
+import re
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+# Validação local de CNPJ/CPF (formato e dígitos verificadores), executada antes do kickoff
+# para que identificadores inválidos não consumam buscas externas nem turnos do LLM.
+NO_IDENTIFIERS_PLACEHOLDER = "(Nenhum CNPJ/CPF conhecido antes da análise; valide os identificadores do dossiê.)"
+TYPE_CNPJ = "CNPJ"
+TYPE_CPF = "CPF"
+
+_CPF_WEIGHTS = (list(range(10, 1, -1)), list(range(11, 1, -1)))
+_CNPJ_WEIGHTS = ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+# Identificadores formatados em texto livre (consultas de busca, por exemplo). O CNPJ aceita
+# a raiz alfanumérica (Receita Federal, a partir de 2026).
+_FORMATTED_CPF_RE = re.compile(r"(?<![\w.])\d{3}\.\d{3}\.\d{3}-\d{2}(?![\w])")
+_FORMATTED_CNPJ_RE = re.compile(r"(?<![\w.])[0-9A-Z]{2}\.[0-9A-Z]{3}\.[0-9A-Z]{3}/[0-9A-Z]{4}-\d{2}(?![\w])", re.IGNORECASE)
+_BARE_IDENTIFIER_RE = re.compile(r"(?<![\w])(?:\d{11}|[0-9A-Z]{12}\d{2})(?![\w])", re.IGNORECASE)
+
+# Identificadores reprovados pela validação do caso em execução (ver identifiers_scope).
+_invalid_identifiers: contextvars.ContextVar[frozenset] = contextvars.ContextVar(
+    "cadastro_invalid_identifiers", default=frozenset()
+)
+
+
+class IdentifierCheck(BaseModel):
+    tipo: str
+    original: str
+    normalizado: str
+    formatado: Optional[str] = None
+    valido: bool
+    motivo: Optional[str] = None
+
+
+def normalize_cpf(value: Any) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def normalize_cnpj(value: Any) -> str:
+    return re.sub(r"[^0-9A-Z]", "", str(value or "").upper())
+
+
+def _check_digit(values: List[int], weights: List[int]) -> int:
+    remainder = sum(v * w for v, w in zip(values, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def cpf_error(value: Any) -> Optional[str]:
+    """Motivo pelo qual `value` não é um CPF válido, ou None se for válido."""
+    cpf = normalize_cpf(value)
+    if len(cpf) != 11:
+        return f"CPF deve ter 11 dígitos (tem {len(cpf)})"
+    if cpf == cpf[0] * 11:
+        return "CPF com todos os dígitos iguais"
+    digits = [int(c) for c in cpf]
+    first = _check_digit(digits[:9], _CPF_WEIGHTS[0])
+    second = _check_digit(digits[:9] + [first], _CPF_WEIGHTS[1])
+    if digits[9:] != [first, second]:
+        return "dígitos verificadores do CPF não conferem"
+    return None
+
+
+def cnpj_error(value: Any) -> Optional[str]:
+    """Motivo pelo qual `value` não é um CNPJ válido (numérico ou alfanumérico), ou None se for válido."""
+    cnpj = normalize_cnpj(value)
+    if len(cnpj) != 14:
+        return f"CNPJ deve ter 14 caracteres (tem {len(cnpj)})"
+    if not cnpj[12:].isdigit():
+        return "dígitos verificadores do CNPJ devem ser numéricos"
+    if cnpj == cnpj[0] * 14:
+        return "CNPJ com todos os caracteres iguais"
+    values = [ord(c) - 48 for c in cnpj]  # '0'-'9' -> 0-9, 'A'-'Z' -> 17-42 (regra do CNPJ alfanumérico)
+    first = _check_digit(values[:12], _CNPJ_WEIGHTS[0])
+    second = _check_digit(values[:12] + [first], _CNPJ_WEIGHTS[1])
+    if values[12:] != [first, second]:
+        return "dígitos verificadores do CNPJ não conferem"
+    return None
+
+
+def is_valid_cpf(value: Any) -> bool:
+    return cpf_error(value) is None
+
+
+def is_valid_cnpj(value: Any) -> bool:
+    return cnpj_error(value) is None
+
+
+def format_cpf(value: Any) -> str:
+    cpf = normalize_cpf(value)
+    return f"{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}" if len(cpf) == 11 else str(value)
+
+
+def format_cnpj(value: Any) -> str:
+    cnpj = normalize_cnpj(value)
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}" if len(cnpj) == 14 else str(value)
+
+
+def validate_identifiers(cnpjs: Iterable[Any] = (), cpfs: Iterable[Any] = ()) -> List[IdentifierCheck]:
+    """Valida em lote listas de CNPJs e CPFs (valores vazios e repetidos são ignorados)."""
+    checks: List[IdentifierCheck] = []
+    seen: Set[Tuple[str, str]] = set()
+    for kind, values, normalize, error, fmt in (
+        (TYPE_CNPJ, cnpjs, normalize_cnpj, cnpj_error, format_cnpj),
+        (TYPE_CPF, cpfs, normalize_cpf, cpf_error, format_cpf),
+    ):
+        for value in values:
+            normalized = normalize(value)
+            if not normalized or (kind, normalized) in seen:
+                continue
+            seen.add((kind, normalized))
+            reason = error(normalized)
+            checks.append(IdentifierCheck(
+                tipo=kind,
+                original=str(value),
+                normalizado=normalized,
+                formatado=fmt(normalized) if reason is None else None,
+                valido=reason is None,
+                motivo=reason,
+            ))
+    return checks
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return list(value)
+    return [v for v in re.split(r"[,;\s]+", str(value)) if v]
+
+
+def collect_case_identifiers(inputs: Dict[str, Any], dossier: Optional[Dict[str, Any]] = None) -> Tuple[List[Any], List[Any]]:
+    """CNPJs e CPFs conhecidos antes do kickoff: inputs do caso e, se houver, o dossiê pré-extraído."""
+    cnpjs = _as_list(inputs.get("dados_pj.cnpj"))
+    cpfs = _as_list(inputs.get("lista_cpfs_socios")) + _as_list(inputs.get("cpf_socio_principal"))
+    if dossier:
+        cnpjs += _as_list((dossier.get("dadosPessoaJuridica") or {}).get("cnpj"))
+        cpfs += [s.get("cpf") for s in dossier.get("dadosSociosRepresentantes") or [] if s.get("cpf")]
+    return cnpjs, cpfs
+
+
+def format_identifier_report(checks: List[IdentifierCheck]) -> str:
+    """Texto do input '{validacao_identificadores}'."""
+    if not checks:
+        return NO_IDENTIFIERS_PLACEHOLDER
+    lines = ["Validação local de formato e dígitos verificadores:"]
+    for check in checks:
+        if check.valido:
+            lines.append(f"- {check.tipo} {check.formatado}: válido")
+        else:
+            lines.append(f"- {check.tipo} '{check.original}': INVÁLIDO ({check.motivo}) - não pesquisar; registrar como inconsistência")
+    return "\n".join(lines)
+
+
+@contextmanager
+def identifiers_scope(checks: List[IdentifierCheck]):
+    """Registra no contexto corrente os identificadores inválidos do caso (consultados pelas ferramentas de busca)."""
+    token = _invalid_identifiers.set(frozenset(c.normalizado for c in checks if not c.valido))
+    try:
+        yield
+    finally:
+        _invalid_identifiers.reset(token)
+
+
+def invalid_identifiers_in(text: str) -> List[str]:
+    """
+    Identificadores inválidos citados em `text`: CPFs/CNPJs formatados cujo dígito verificador
+    não confere e sequências sem formatação reprovadas na validação do caso.
+    """
+    text = text or ""
+    found = [m.group(0) for m in _FORMATTED_CPF_RE.finditer(text) if not is_valid_cpf(m.group(0))]
+    found += [m.group(0) for m in _FORMATTED_CNPJ_RE.finditer(text) if not is_valid_cnpj(m.group(0))]
+    invalid = _invalid_identifiers.get()
+    if invalid:
+        found += [m.group(0) for m in _BARE_IDENTIFIER_RE.finditer(text) if m.group(0).upper() in invalid]
+    return list(dict.fromkeys(found))
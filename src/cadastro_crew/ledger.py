@@ -0,0 +1,260 @@
+import sys
+import json
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .tracing import KIND_LLM, KIND_RUN, KIND_STAGE, KIND_TASK, Tracer, tracing_enabled
+
+# Ledger de custo e recursos por caso: JSON gravado ao lado do relatório Markdown
+# (relatorio_crew_<...>.ledger.json), montado a partir das spans da execução (tracing.py)
+# e do resumo do orçamento de tempo (budgets.py). O comando `ledger` agrega os ledgers de um lote.
+LEDGER_SUFFIX = ".ledger.json"
+LEDGER_VERSION = 1
+# Agente atribuído às chamadas ao LLM feitas fora de um agente (ex: extração por documento).
+NO_AGENT = "(sem agente)"
+
+# Nomes das spans das ferramentas (ver tools/).
+SPAN_SUPABASE_LOOKUP = "supabase_document_lookup"
+SPAN_DOWNLOAD = "http_download"
+SPAN_PARSE_DOCUMENT = "llamaparse_document"
+SPAN_PARSE_JOB = "llamaparse_job"
+SPAN_KB_QUERY = "knowledge_base_query"
+SPAN_KB_RPC = "supabase_rpc_match_kb_chunks"
+SPAN_EMBEDDING = "embedding_encode"
+SPAN_SERPER_SEARCH = "serper_search"
+SPAN_SERPER_API = "serper_api"
+
+
+def _ratio(hits: float, total: float) -> Optional[float]:
+    return round(hits / total, 4) if total else None
+
+
+def _cache_stats(spans: List[Any]) -> Dict[str, Any]:
+    hits = sum(1 for s in spans if s.attributes.get("cache_hit"))
+    return {"calls": len(spans), "cache_hits": hits, "cache_hit_ratio": _ratio(hits, len(spans))}
+
+
+def build_case_ledger(tracer: Tracer, status: str, budget: Optional[Dict[str, Any]] = None,
+                      report_path: Optional[Path] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Monta o ledger de um caso: tempo de parede por etapa e por tarefa, tokens de prompt e de
+    completion por agente (e respostas vindas do cache do LLM), páginas parseadas, bytes baixados
+    e chamadas à KB, ao Serper e ao Supabase com suas taxas de acerto de cache.
+    """
+    spans = tracer.snapshot()
+    by_name: Dict[str, List[Any]] = defaultdict(list)
+    for span in spans:
+        by_name[span.name].append(span)
+    run_span = next((s for s in spans if s.kind == KIND_RUN), None)
+
+    agents: Dict[str, Dict[str, Any]] = {}
+    for span in (s for s in spans if s.kind == KIND_LLM):
+        agent = agents.setdefault(span.attributes.get("agent_role") or NO_AGENT, {
+            "calls": 0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0,
+            "tokens_estimated": False,
+        })
+        agent["calls"] += 1
+        agent["cache_hits"] += bool(span.attributes.get("cache_hit"))
+        agent["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+        agent["completion_tokens"] += span.attributes.get("completion_tokens", 0)
+        agent["seconds"] = round(agent["seconds"] + span.duration_ms / 1000, 3)
+        agent["tokens_estimated"] = agent["tokens_estimated"] or bool(span.attributes.get("tokens_estimated"))
+
+    downloads = by_name[SPAN_DOWNLOAD]
+    parse_jobs = by_name[SPAN_PARSE_JOB]
+    serper = _cache_stats(by_name[SPAN_SERPER_SEARCH])
+    serper["coalesced"] = sum(1 for s in by_name[SPAN_SERPER_SEARCH] if s.attributes.get("coalesced"))
+    serper["api_calls"] = len(by_name[SPAN_SERPER_API])
+    knowledge_base = _cache_stats(by_name[SPAN_KB_QUERY])
+    knowledge_base["rpc_calls"] = len(by_name[SPAN_KB_RPC])
+    knowledge_base["embedding_batches"] = len(by_name[SPAN_EMBEDDING])
+    totals = tracer.totals()
+    return {
+        "version": LEDGER_VERSION,
+        "case_id": tracer.case_id,
+        "run_id": tracer.run_id,
+        "status": status,
+        "error": error,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "report": str(report_path) if report_path else None,
+        "wall_seconds": round(run_span.duration_ms / 1000, 3) if run_span else None,
+        "stage_seconds": {s.name: round(s.duration_ms / 1000, 3) for s in spans if s.kind == KIND_STAGE},
+        "task_seconds": {s.name: round(s.duration_ms / 1000, 3) for s in spans if s.kind == KIND_TASK},
+        "llm": {
+            "calls": sum(a["calls"] for a in agents.values()),
+            "prompt_tokens": totals["prompt_tokens"],
+            "completion_tokens": totals["completion_tokens"],
+            "by_agent": agents,
+        },
+        "llamaparse": dict(
+            _cache_stats(by_name[SPAN_PARSE_DOCUMENT]),
+            jobs=len(parse_jobs),
+            pages=sum(s.attributes.get("pages", 0) for s in parse_jobs),
+        ),
+        "downloads": {"count": len(downloads), "bytes": sum(s.attributes.get("bytes_in", 0) for s in downloads)},
+        "supabase_lookups": _cache_stats(by_name[SPAN_SUPABASE_LOOKUP]),
+        "knowledge_base": knowledge_base,
+        "serper": serper,
+        "bytes": {"received": totals["bytes_in"], "sent": totals["bytes_out"]},
+        "errors": sum(1 for s in spans if s.status != "ok"),
+        "budget": budget,
+    }
+
+
+def ledger_path_for(report_path: Path) -> Path:
+    """relatorio_crew_<...>.md -> relatorio_crew_<...>.ledger.json"""
+    return report_path.with_name(report_path.stem + LEDGER_SUFFIX)
+
+
+def fallback_ledger_path(ledger_dir: Path, case_id: str) -> Path:
+    """Caminho do ledger de um caso sem relatório: <ledger_dir>/<case_id>_<timestamp>.ledger.json"""
+    safe_case_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(case_id))
+    return Path(ledger_dir) / f"{safe_case_id}_{datetime.now().strftime('%Y-%m-%d_%H%M%S')}{LEDGER_SUFFIX}"
+
+
+def save_case_ledger(tracer: Optional[Tracer], status: str, report_path: Optional[Path],
+                     budget: Optional[Dict[str, Any]] = None, case_id: Optional[str] = None,
+                     ledger_dir: Optional[Path] = None, error: Optional[str] = None) -> Optional[Path]:
+    """
+    Grava o ledger do caso ao lado do relatório. Sem relatório (falha ao salvá-lo, ou erro na
+    execução), o ledger vai para `ledger_dir` (fallback_ledger_path) com o status e o erro, para
+    que casos com falha também entrem na agregação do lote; sem spans (falha antes da execução),
+    o ledger de `case_id` fica vazio. Retorna o caminho, ou None com TRACING_ENABLED=false,
+    sem relatório nem `ledger_dir`, ou em caso de falha.
+    """
+    if tracer is None:
+        if case_id is None or not tracing_enabled():
+            return None
+        tracer = Tracer(case_id)
+    if report_path is None and ledger_dir is None:
+        return None
+    try:
+        ledger = build_case_ledger(tracer, status, budget=budget, report_path=report_path, error=error)
+        if report_path is not None:
+            path = ledger_path_for(Path(report_path))
+        else:
+            Path(ledger_dir).mkdir(parents=True, exist_ok=True)
+            path = fallback_ledger_path(ledger_dir, tracer.case_id)
+        path.write_text(json.dumps(ledger, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"INFO: Ledger de recursos do caso salvo em: {path}")
+        return path
+    except Exception as e:
+        print(f"AVISO: Falha ao salvar o ledger do case_id '{tracer.case_id}': {e}")
+        return None
+
+
+def load_ledgers(paths: Iterable[Path]) -> List[Dict[str, Any]]:
+    """Lê os ledgers dos arquivos e diretórios informados (diretórios são percorridos recursivamente)."""
+    files: List[Path] = []
+    for path in map(Path, paths):
+        files += sorted(path.rglob(f"*{LEDGER_SUFFIX}")) if path.is_dir() else [path]
+    ledgers = []
+    for file in files:
+        try:
+            ledgers.append(json.loads(file.read_text(encoding="utf-8")))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"AVISO: Ledger ignorado ({file}): {e}")
+    return ledgers
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    array = np.asarray(values, dtype=np.float64)
+    summary = {f"p{q}": round(float(np.percentile(array, q)), 3) for q in (50, 95)}
+    summary.update(mean=round(float(array.mean()), 3), max=round(float(array.max()), 3), total=round(float(array.sum()), 3))
+    return summary
+
+
+def _sum(ledgers: List[Dict[str, Any]], section: str, key: str) -> float:
+    return sum((ledger.get(section) or {}).get(key) or 0 for ledger in ledgers)
+
+
+def summarize_ledgers(ledgers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Agrega os ledgers de um lote: distribuições por caso e totais, por tarefa e por agente."""
+    task_seconds: Dict[str, List[float]] = defaultdict(list)
+    agents: Dict[str, Counter] = defaultdict(Counter)
+    for ledger in ledgers:
+        for task, seconds in (ledger.get("task_seconds") or {}).items():
+            task_seconds[task].append(seconds)
+        for agent, usage in ((ledger.get("llm") or {}).get("by_agent") or {}).items():
+            agents[agent].update({k: usage.get(k, 0) for k in ("calls", "cache_hits", "prompt_tokens", "completion_tokens")})
+
+    def cached(section: str, **extra_keys: str) -> Dict[str, Any]:
+        calls, hits = _sum(ledgers, section, "calls"), _sum(ledgers, section, "cache_hits")
+        summary = {"calls": calls, "cache_hits": hits, "cache_hit_ratio": _ratio(hits, calls)}
+        summary.update({name: _sum(ledgers, section, key) for name, key in extra_keys.items()})
+        return summary
+
+    return {
+        "cases": len(ledgers),
+        "status": dict(Counter(ledger.get("status") for ledger in ledgers)),
+        "wall_seconds": _distribution([l["wall_seconds"] for l in ledgers if l.get("wall_seconds") is not None]),
+        "task_seconds": {task: _distribution(values) for task, values in sorted(task_seconds.items())},
+        "prompt_tokens": _distribution([(l.get("llm") or {}).get("prompt_tokens", 0) for l in ledgers]),
+        "completion_tokens": _distribution([(l.get("llm") or {}).get("completion_tokens", 0) for l in ledgers]),
+        "llm_by_agent": {agent: dict(usage) for agent, usage in sorted(agents.items())},
+        "llamaparse": cached("llamaparse", jobs="jobs", pages="pages"),
+        "download_bytes": _distribution([(l.get("downloads") or {}).get("bytes", 0) for l in ledgers]),
+        "knowledge_base": cached("knowledge_base", rpc_calls="rpc_calls"),
+        "serper": cached("serper", api_calls="api_calls", coalesced="coalesced"),
+        "supabase_lookups": cached("supabase_lookups"),
+    }
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Resumo legível da agregação (mesmo conteúdo do JSON)."""
+    def fmt(values: Dict[str, Any]) -> str:
+        return ", ".join(f"{k}={v}" for k, v in values.items()) if values else "-"
+
+    lines = [
+        f"Ledgers: {summary['cases']} casos {summary['status']}",
+        f"Tempo de parede por caso (s): {fmt(summary['wall_seconds'])}",
+    ]
+    lines += [f"  Tarefa {task} (s): {fmt(values)}" for task, values in summary["task_seconds"].items()]
+    lines += [
+        f"Tokens de prompt por caso: {fmt(summary['prompt_tokens'])}",
+        f"Tokens de completion por caso: {fmt(summary['completion_tokens'])}",
+    ]
+    lines += [f"  Agente {agent}: {fmt(usage)}" for agent, usage in summary["llm_by_agent"].items()]
+    lines += [
+        f"LlamaParse: {fmt(summary['llamaparse'])}",
+        f"Bytes baixados por caso: {fmt(summary['download_bytes'])}",
+        f"Knowledge Base: {fmt(summary['knowledge_base'])}",
+        f"Serper: {fmt(summary['serper'])}",
+        f"Consultas de documentos (Supabase): {fmt(summary['supabase_lookups'])}",
+    ]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Uso:
+        ledger                                 (todos os ledgers em reports/)
+        ledger reports/lote_2025_06 outro.ledger.json --output resumo.json
+    """
+    parser = argparse.ArgumentParser(prog="ledger", description="Agrega os ledgers de recursos dos casos de um lote.")
+    parser.add_argument("paths", nargs="*", type=Path, help="arquivos .ledger.json ou diretórios (padrão: reports/)")
+    parser.add_argument("--output", type=Path, default=None, help="grava a agregação em JSON")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    paths = args.paths or [Path(__file__).resolve().parent.parent.parent / "reports"]
+    ledgers = load_ledgers(paths)
+    if not ledgers:
+        print(f"ERRO: Nenhum ledger ({LEDGER_SUFFIX}) encontrado em: {', '.join(map(str, paths))}")
+        return
+    summary = summarize_ledgers(ledgers)
+    print(format_summary(summary))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"INFO: Agregação salva em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from .tools.cache import DiskCache, cache_base_dir, make_cache_key
+from .tracing import KIND_LLM, span
+
+logger = logging.getLogger(__name__)
+
+# Cache persistente de respostas do LLM, endereçado pelo hash de (modelo, lista completa de
+# mensagens, schema das ferramentas, stop words). Reexecuções e replays de tarefas inalteradas
+# devolvem a resposta gravada sem chamar o modelo. As respostas contêm dados dos documentos
+# (inclusive pessoais), por isso o cache é opt-in e as entradas expiram. Modos (LLM_CACHE_MODE):
+# - "off" (padrão): sem cache;
+# - "tasks": só as tarefas com `llm_cache: true` no tasks.yaml (e a extração por documento,
+#   seção extracao_por_documento);
+# - "all": todas as chamadas;
+# - "replay": todas as chamadas, somente leitura do cache e sem modelo: um miss levanta LLMCacheMiss.
+LLM_CACHE_MODE_OFF = "off"
+LLM_CACHE_MODE_TASKS = "tasks"
+LLM_CACHE_MODE_ALL = "all"
+LLM_CACHE_MODE_REPLAY = "replay"
+LLM_CACHE_MODES = (LLM_CACHE_MODE_OFF, LLM_CACHE_MODE_TASKS, LLM_CACHE_MODE_ALL, LLM_CACHE_MODE_REPLAY)
+LLM_CACHE_MODE_DEFAULT = LLM_CACHE_MODE_OFF
+LLM_CACHE_MAX_MB_DEFAULT = 256
+# Validade das respostas gravadas (LLM_CACHE_TTL_SECONDS; 0 desativa a expiração).
+LLM_CACHE_TTL_SECONDS_DEFAULT = 7 * 24 * 3600
+
+# Opt-in do cache para chamadas feitas fora de uma Task da CrewAI (ex: extração por documento).
+_cache_scope: contextvars.ContextVar[bool] = contextvars.ContextVar("cadastro_llm_cache_scope", default=False)
+
+_llm_cache: Optional[DiskCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+class LLMCacheMiss(LookupError):
+    """Resposta ausente do cache no modo "replay" (sem modelo para responder)."""
+
+
+def llm_cache_mode() -> str:
+    mode = os.getenv("LLM_CACHE_MODE", LLM_CACHE_MODE_DEFAULT).strip().lower()
+    if mode not in LLM_CACHE_MODES:
+        logger.warning(f"LLM_CACHE_MODE '{mode}' inválido; usando '{LLM_CACHE_MODE_DEFAULT}'.")
+        return LLM_CACHE_MODE_DEFAULT
+    return mode
+
+
+def get_llm_cache() -> Optional[DiskCache]:
+    """
+    Retorna o cache de respostas do LLM compartilhado pelo processo.
+    Configuração: LLM_CACHE_DIR (padrão: <CADASTRO_CACHE_DIR>/llm), LLM_CACHE_MAX_MB e LLM_CACHE_TTL_SECONDS.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                directory = Path(os.getenv("LLM_CACHE_DIR", str(cache_base_dir() / "llm")))
+                max_mb = float(os.getenv("LLM_CACHE_MAX_MB", LLM_CACHE_MAX_MB_DEFAULT))
+                ttl = float(os.getenv("LLM_CACHE_TTL_SECONDS", LLM_CACHE_TTL_SECONDS_DEFAULT))
+                try:
+                    _llm_cache = DiskCache(directory, max_bytes=int(max_mb * 1024 * 1024),
+                                           ttl_seconds=ttl if ttl > 0 else None, suffix=".txt")
+                    logger.info(f"Cache de respostas do LLM em {directory} (limite {max_mb} MB, validade {ttl:g}s).")
+                except OSError as e:
+                    logger.warning(f"Não foi possível inicializar o cache de respostas do LLM em {directory}: {e}")
+                    return None
+    return _llm_cache
+
+
+@contextmanager
+def llm_cache_scope(enabled: bool) -> Iterator[None]:
+    """Habilita (ou não) o cache para as chamadas sem Task feitas no contexto corrente."""
+    token = _cache_scope.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _cache_scope.reset(token)
+
+
+def llm_cache_key(model: str, messages: List[Dict[str, Any]], tools: Optional[List[dict]] = None,
+                  stop: Optional[List[str]] = None) -> str:
+    return make_cache_key("llm", model, messages, tools or [], sorted(stop or []))
+
+
+def _default_model_name() -> str:
+    """Modelo que a CrewAI usaria sem LLM explícito (MODEL, MODEL_NAME, OPENAI_MODEL_NAME ou o padrão)."""
+    from crewai.cli.constants import DEFAULT_LLM_MODEL
+    return os.getenv("MODEL") or os.getenv("MODEL_NAME") or os.getenv("OPENAI_MODEL_NAME") or DEFAULT_LLM_MODEL
+
+
+class CachedLLM(BaseLLM):
+    """
+    Envolve um LLM da CrewAI (instância de BaseLLM, nome do modelo ou None para o LLM padrão
+    do ambiente) e grava/reutiliza suas respostas de texto no cache em disco. Só respostas
+    não vazias são gravadas; chamadas com `available_functions` (execução de ferramentas pelo
+    próprio LLM) não passam pelo cache. As stop words são as do LLM envolvido, que a CrewAI
+    ajusta por agente. No modo "replay" nenhum modelo é criado nem chamado.
+    """
+
+    def __init__(self, llm: Any = None, mode: Optional[str] = None):
+        self.mode = mode or llm_cache_mode()
+        if self.mode == LLM_CACHE_MODE_REPLAY:
+            # Sem modelo: `llm` só define o nome do modelo que compõe a chave do cache.
+            self.inner = None
+            model = getattr(llm, "model", None) or (llm if isinstance(llm, str) else None) or _default_model_name()
+        else:
+            from crewai.utilities.llm_utils import create_llm
+            self.inner = create_llm(llm)
+            model = self.inner.model
+        self._stop: List[str] = []
+        super().__init__(model=model, temperature=getattr(self.inner, "temperature", None), stop=list(self.stop))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stop(self) -> List[str]:
+        return self.inner.stop if self.inner is not None else self._stop
+
+    @stop.setter
+    def stop(self, value: List[str]) -> None:
+        if self.inner is not None:
+            self.inner.stop = value
+        else:
+            self._stop = value
+
+    def __getattr__(self, name: str) -> Any:
+        # Demais atributos (ex: usados pela CrewAI para o provedor) vêm do LLM envolvido.
+        inner = self.__dict__.get("inner")
+        if inner is None:
+            raise AttributeError(name)
+        return getattr(inner, name)
+
+    def supports_function_calling(self) -> bool:
+        return self.inner.supports_function_calling() if self.inner is not None else False
+
+    def supports_stop_words(self) -> bool:
+        return self.inner.supports_stop_words() if self.inner is not None else True
+
+    def get_context_window_size(self) -> int:
+        return self.inner.get_context_window_size() if self.inner is not None else super().get_context_window_size()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"mode": self.mode, "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": (self.hits / lookups) if lookups else 0.0}
+
+    def _enabled_for(self, from_task: Any) -> bool:
+        if self.mode in (LLM_CACHE_MODE_ALL, LLM_CACHE_MODE_REPLAY):
+            return True
+        if self.mode == LLM_CACHE_MODE_OFF:
+            return False
+        if from_task is not None:
+            return bool(getattr(from_task, "llm_cache", False))
+        return _cache_scope.get()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        cache = get_llm_cache() if self._enabled_for(from_task) and not available_functions else None
+        key = llm_cache_key(self.model, messages, tools, self.stop) if cache is not None else None
+        if cache is not None:
+            cached = cache.get(key)
+            self._count(cached is not None)
+            if cached is not None:
+                agent = from_agent or getattr(from_task, "agent", None)
+                with span(self.model, KIND_LLM, cache_hit=True, agent_role=getattr(agent, "role", None),
+                          task_name=getattr(from_task, "name", None), prompt_tokens=0, completion_tokens=0):
+                    return cached
+        if self.inner is None:
+            raise LLMCacheMiss(
+                f"Resposta do LLM ausente do cache (LLM_CACHE_MODE=replay, chave {key[:12] if key else '-'}...)."
+            )
+        response = self.inner.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions,
+                                   from_task=from_task, from_agent=from_agent)
+        if cache is not None and isinstance(response, str) and response.strip():
+            cache.set(key, response)
+        return response
+
+
+def wrap_llm(llm: Any = None) -> Any:
+    """Retorna `llm` envolvido pelo CachedLLM, ou inalterado com LLM_CACHE_MODE=off."""
+    if isinstance(llm, CachedLLM) or llm_cache_mode() == LLM_CACHE_MODE_OFF:
+        return llm
+    return CachedLLM(llm)
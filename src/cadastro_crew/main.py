@@ -1,16 +1,33 @@
 #!/usr/bin/env python
+from __future__ import annotations
+
+import time
+_IMPORT_STARTED_AT = time.perf_counter() # Medido por --profile-startup (startup.py)
+
 import sys
+import json
+import argparse
 import warnings
 from textwrap import dedent
 from datetime import datetime
 import os
 from dotenv import load_dotenv
 from pathlib import Path # Adicionado para manipulação de caminhos
-import yaml
-from supabase import create_client, Client # Added supabase imports
+from typing import TYPE_CHECKING
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# crew.py, agents.py e as ferramentas (crewai, crewai_tools, llama_parse, supabase) são importados
+# dentro dos comandos que os usam: a importação deste módulo fica leve (ver --profile-startup).
+from .clients import get_supabase_client
+from .budgets import BudgetExceeded
+from .models import render_crew_output, risk_summary
+from .checklist import Checklist, load_checklist
+from .ledger import format_summary, load_ledgers, save_case_ledger, summarize_ledgers
+from .startup import STARTUP_MODULES, format_import_profile, pop_profile_flag, profile_imports
 
-from .crew import CadastroCrew
-from .tools import SupabaseDocumentContentTool # Importar a nova ferramenta
+if TYPE_CHECKING:
+    from supabase import Client
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -69,32 +86,14 @@ def setup_supabase_client() -> Client | None:
         return None 
     
     try:
-        supabase_client = create_client(supabase_url, supabase_key)
+        # Cliente compartilhado pelo processo (o mesmo usado pelas ferramentas)
+        supabase_client = get_supabase_client(supabase_url, supabase_key)
         print("INFO: Cliente Supabase inicializado com sucesso em main.py (usando SERVICE_KEY conforme especificado).")
         return supabase_client
     except Exception as e:
         print(f"Erro Crítico: Falha ao inicializar o cliente Supabase em main.py: {e}")
         return None
 
-def get_checklist_content_from_app_configs(client: Client, config_name: str = "checklist_cadastro_pj") -> str:
-    """
-    Obtém o conteúdo do checklist da tabela app_configs no Supabase.
-    """
-    if not client:
-        print("Erro: Cliente Supabase não inicializado para get_checklist_content_from_app_configs.")
-        return ""
-    try:
-        response = client.table("app_configs").select("content").eq("config_name", config_name).single().execute()
-        if response.data and response.data.get("content"):
-            # print(f"Checklist '{config_name}' carregado de app_configs.")
-            return response.data["content"]
-        else:
-            print(f"Erro: Checklist '{config_name}' não encontrado na tabela app_configs ou conteúdo vazio.")
-            return "" # Retorna string vazia para evitar falha total, mas idealmente tratar o erro.
-    except Exception as e:
-        print(f"Erro ao buscar checklist de app_configs: {e}")
-        return ""
-
 def get_documents_for_case(client: Client, case_id: str) -> list:
     """
     Obtém a lista de documentos e seus tags para um case_id específico da tabela documents.
@@ -116,8 +115,13 @@ def get_documents_for_case(client: Client, case_id: str) -> list:
     }
 
     try:
-        response = client.table("documents").select("name, document_tag").eq("case_id", case_id).execute()
+        # file_url também é selecionada para pré-carregar o índice da SupabaseDocumentContentTool:
+        # as consultas dos agentes por documento viram acessos a um dicionário em memória.
+        response = client.table("documents").select("name, document_tag, file_url").eq("case_id", case_id).execute()
         if response.data:
+            from .tools import SupabaseDocumentContentTool
+
+            SupabaseDocumentContentTool.prime_case_index(case_id, response.data)
             for doc in response.data:
                 doc_name = doc.get("name")
                 doc_tag = doc.get("document_tag")
@@ -139,10 +143,100 @@ def get_documents_for_case(client: Client, case_id: str) -> list:
         print(f"Erro ao buscar documentos para o case_id '{case_id}': {e}")
         return []
 
+def build_case_inputs(client: Client, case_id: str, checklist: Checklist | str) -> dict:
+    """
+    Monta o dicionário de inputs da CadastroCrew para um case_id.
+    Com um Checklist estruturado (checklist.py), o input 'checklist' recebe apenas as regras
+    aplicáveis aos tipos de documento do caso; uma string é repassada sem alterações.
+    """
+    # Obter dinamicamente a lista de documentos para o case_id
+    dynamic_documents_list = get_documents_for_case(client, case_id)
+
+    if not dynamic_documents_list:
+        print(f"Nenhum documento configurado para ser processado para o case_id '{case_id}'. Verifique a tabela 'documents' e os 'document_tag'.")
+        # Poderia abortar aqui ou continuar dependendo da lógica desejada
+        # return 
+
+    return {
+        'case_id': case_id,
+        'documents': dynamic_documents_list, # Lista de documentos carregada dinamicamente
+        'checklist': checklist.render_for_documents(dynamic_documents_list) if isinstance(checklist, Checklist) else checklist,
+        'current_date': datetime.now().strftime('%Y-%m-%d'),
+        'dados_pj.cnpj': os.getenv('DADOS_PJ_CNPJ_FALLBACK', ''), # Este CNPJ é para a tarefa_geracao_relatorio
+        'lista_cpfs_socios': [], 
+        'cpf_socio_principal': os.getenv('CPF_SOCIO_PRINCIPAL_FALLBACK', '') 
+    }
+
+def default_reports_dir() -> Path:
+    """Diretório padrão dos relatórios e ledgers: <raiz do projeto>/reports."""
+    # Determinar o diretório raiz do projeto (assumindo que main.py está em src/cadastro_crew)
+    return Path(__file__).resolve().parent.parent.parent / "reports"
+
+def save_crew_report(inputs: dict, resultado, reports_dir: Path | None = None, include_case_id: bool = False,
+                     budget: dict | None = None) -> Path | None:
+    """
+    Salva o resultado da crew em um arquivo Markdown em `reports/`.
+    Com `include_case_id=True` o case_id entra no nome do arquivo (usado no modo em lote,
+    onde vários casos terminam no mesmo segundo).
+    `budget` (CaseDeadline.summary()) registra os tempos por etapa e a etapa que excedeu o orçamento.
+    Um CrewOutput é renderizado a partir das saídas estruturadas das tarefas (models.py), sem nova chamada ao LLM.
+    Retorna o caminho do arquivo salvo, ou None em caso de falha.
+    """
+    try:
+        if reports_dir is None:
+            reports_dir = default_reports_dir()
+        reports_dir.mkdir(parents=True, exist_ok=True) # Cria o diretório se não existir
+
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        if include_case_id:
+            safe_case_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(inputs.get('case_id', '')))
+            file_name = f"relatorio_crew_{safe_case_id}_{timestamp}.md"
+        else:
+            file_name = f"relatorio_crew_{timestamp}.md"
+        file_path = reports_dir / file_name
+
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(f"# Relatório da Execução da Crew - {timestamp}\n\n")
+            f.write("## Inputs Fornecidos:\n\n")
+            # Para não expor chaves de API ou conteúdo muito longo do checklist nos inputs do relatório
+            safe_inputs_to_log = {k: v for k, v in inputs.items() if k != 'checklist'}
+            safe_inputs_to_log['checklist_length'] = len(inputs.get('checklist', ''))
+            
+            f.write(f"```json\n{json.dumps(safe_inputs_to_log, indent=2, ensure_ascii=False)}\n```\n\n")
+            f.write("## Resultado da Crew:\n\n")
+            if isinstance(resultado, str):
+                f.write(resultado)
+            else:
+                # CrewOutput: relatório montado a partir dos modelos pydantic de cada tarefa
+                # (tarefas sem saída estruturada entram com o texto bruto)
+                f.write(render_crew_output(resultado))
+            if budget:
+                f.write("\n\n## Orçamento de Tempo:\n\n")
+                f.write(f"```json\n{json.dumps(budget, indent=2, ensure_ascii=False)}\n```\n")
+        
+        print(f"INFO: Resultado da crew salvo em: {file_path}")
+        return file_path
+
+    except Exception as e_save:
+        print(f"AVISO: Falha ao salvar o resultado da crew em arquivo: {e_save}")
+        return None
+
+def _profile_startup_if_requested(extra_modules: tuple = ()) -> None:
+    """
+    Com --profile-startup na linha de comando (removido de sys.argv), imprime o tempo de
+    importação deste módulo e de cada dependência carregada sob demanda pelo comando.
+    """
+    if pop_profile_flag(sys.argv):
+        rows = profile_imports(STARTUP_MODULES + tuple(extra_modules))
+        print(format_import_profile(rows, entry_seconds=_MAIN_IMPORT_SECONDS))
+
 def run():
     """
     Função principal para configurar e executar a CadastroCrew.
     """
+    _profile_startup_if_requested()
+    from .crew import CadastroCrew
+
     print("INFO: Iniciando a execução da CadastroCrew a partir de main.py...")
     
     # Inicializar o cliente Supabase
@@ -152,8 +246,8 @@ def run():
         return
 
     try:
-        # Obter o conteúdo do checklist da tabela app_configs
-        parsed_checklist_content = get_checklist_content_from_app_configs(s_client)
+        # Obter o checklist da tabela app_configs (regras estruturadas, em cache local)
+        parsed_checklist_content = load_checklist(s_client, CHECKLIST_CONFIG_NAME)
     except Exception as e: # Captura exceções mais genéricas da carga do checklist
         print(f"ERRO FATAL: Não foi possível carregar o checklist. {e}")
         print("Verifique a configuração do Supabase (URL, KEY) e a existência do item na tabela 'app_configs'.")
@@ -161,29 +255,11 @@ def run():
 
     # Inputs para a crew
     case_id = os.getenv('CASE_ID', 'CASO-CLIENTE-REAL-001')
-
-    # Obter dinamicamente a lista de documentos para o case_id
-    dynamic_documents_list = get_documents_for_case(s_client, case_id)
-
-    if not dynamic_documents_list:
-        print(f"Nenhum documento configurado para ser processado para o case_id '{case_id}'. Verifique a tabela 'documents' e os 'document_tag'.")
-        # Poderia abortar aqui ou continuar dependendo da lógica desejada
-        # return 
-    
-    # Inputs para a crew
-    inputs = {
-        'case_id': case_id,
-        'documents': dynamic_documents_list, # Lista de documentos carregada dinamicamente
-        'checklist': parsed_checklist_content, 
-        'current_date': datetime.now().strftime('%Y-%m-%d'),
-        'dados_pj.cnpj': os.getenv('DADOS_PJ_CNPJ_FALLBACK', ''), # Este CNPJ é para a tarefa_geracao_relatorio
-        'lista_cpfs_socios': [], 
-        'cpf_socio_principal': os.getenv('CPF_SOCIO_PRINCIPAL_FALLBACK', '') 
-    }
+    inputs = build_case_inputs(s_client, case_id, parsed_checklist_content)
 
     print(f"DEBUG: Inputs preparados para a CadastroCrew: {inputs}")
 
-    cadastro_crew = CadastroCrew(inputs=inputs)
+    cadastro_crew = CadastroCrew(inputs=inputs, checklist=parsed_checklist_content)
     print("INFO: Iniciando a execução do método run() do CadastroCrew...")
     try:
         resultado = cadastro_crew.run()
@@ -191,47 +267,194 @@ def run():
         print(resultado)
         print("---")
 
-        # Salvar o resultado em um arquivo Markdown
-        try:
-            # Determinar o diretório raiz do projeto (assumindo que main.py está em src/cadastro_crew)
-            project_root = Path(__file__).resolve().parent.parent.parent 
-            reports_dir = project_root / "reports"
-            reports_dir.mkdir(parents=True, exist_ok=True) # Cria o diretório se não existir
-
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-            file_name = f"relatorio_crew_{timestamp}.md"
-            file_path = reports_dir / file_name
-
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(f"# Relatório da Execução da Crew - {timestamp}\\n\\n")
-                f.write("## Inputs Fornecidos:\\n\\n")
-                # Para não expor chaves de API ou conteúdo muito longo do checklist nos inputs do relatório
-                safe_inputs_to_log = {k: v for k, v in inputs.items() if k != 'checklist'}
-                safe_inputs_to_log['checklist_length'] = len(inputs.get('checklist', ''))
-                
-                import json
-                f.write(f"```json\\n{json.dumps(safe_inputs_to_log, indent=2, ensure_ascii=False)}\\n```\\n\\n")
-                f.write("## Resultado da Crew:\\n\\n")
-                if isinstance(resultado, str):
-                    f.write(resultado)
-                else:
-                    # Se o resultado não for uma string (ex: objeto complexo), converter para string
-                    f.write(str(resultado))
-            
-            print(f"INFO: Resultado da crew salvo em: {file_path}")
-
-        except Exception as e_save:
-            print(f"AVISO: Falha ao salvar o resultado da crew em arquivo: {e_save}")
-
+        # Salvar o resultado em um arquivo Markdown, com o ledger de recursos ao lado
+        budget = cadastro_crew.deadline.summary()
+        report_path = save_crew_report(inputs, resultado, budget=budget)
+        save_case_ledger(cadastro_crew.tracer, "ok" if report_path else "report_failed", report_path, budget=budget,
+                         ledger_dir=default_reports_dir())
+
+    except BudgetExceeded as e:
+        print(f"ERRO: Execução da crew interrompida: {e}")
+        budget = cadastro_crew.deadline.summary()
+        report_path = save_crew_report(inputs, f"Execução interrompida: {e}", budget=budget)
+        save_case_ledger(cadastro_crew.tracer, "timeout", report_path, budget=budget,
+                         ledger_dir=default_reports_dir(), error=str(e))
     except Exception as e:
         print(f"ERRO: Uma exceção ocorreu durante a execução da crew: {e}")
         import traceback
         traceback.print_exc()
+        budget = cadastro_crew.deadline.summary() if cadastro_crew.deadline else None
+        save_case_ledger(cadastro_crew.tracer, "error", None, budget=budget, case_id=case_id, ledger_dir=default_reports_dir(), error=str(e))
+
+def get_case_ids_from_supabase(client: Client, page_size: int = 1000) -> list:
+    """
+    Obtém todos os case_id distintos da tabela documents (paginado), na ordem em que aparecem.
+    """
+    case_ids = []
+    seen = set()
+    offset = 0
+    while True:
+        response = client.table("documents").select("case_id").order("case_id").range(offset, offset + page_size - 1).execute()
+        rows = response.data or []
+        for row in rows:
+            case_id = row.get("case_id")
+            if case_id and case_id not in seen:
+                seen.add(case_id)
+                case_ids.append(case_id)
+        if len(rows) < page_size:
+            return case_ids
+        offset += page_size
+
+def _read_case_ids(lines) -> list:
+    """Lê um case_id por linha, ignorando linhas vazias e comentários (#)."""
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+def _run_single_case(case_id: str, client: Client, checklist_content: Checklist | str, agents_manager, reports_dir: Path | None) -> dict:
+    """Executa a crew para um único caso do lote e salva seu relatório e seu ledger de recursos."""
+    from .crew import CadastroCrew
+
+    started_at = time.perf_counter()
+    exceeded_stage = None
+    verdict = {}
+    cadastro_crew = None
+    ledger_dir = reports_dir or default_reports_dir()
+    try:
+        inputs = build_case_inputs(client, case_id, checklist_content)
+        cadastro_crew = CadastroCrew(inputs=inputs, agents_manager=agents_manager,
+                                     checklist=checklist_content if isinstance(checklist_content, Checklist) else None)
+        resultado = cadastro_crew.run()
+        budget = cadastro_crew.deadline.summary()
+        report_path = save_crew_report(inputs, resultado, reports_dir=reports_dir, include_case_id=True, budget=budget)
+        status = "ok" if report_path else "report_failed"
+        error = None
+        verdict = risk_summary(resultado)
+        ledger_path = save_case_ledger(cadastro_crew.tracer, status, report_path, budget=budget, ledger_dir=ledger_dir)
+    except BudgetExceeded as e:
+        print(f"ERRO: Execução da crew para o case_id '{case_id}' interrompida: {e}")
+        exceeded_stage = e.stage
+        budget = cadastro_crew.deadline.summary()
+        report_path = save_crew_report(inputs, f"Execução interrompida: {e}", reports_dir=reports_dir,
+                                       include_case_id=True, budget=budget)
+        status, error = "timeout", str(e)
+        ledger_path = save_case_ledger(cadastro_crew.tracer, status, report_path, budget=budget,
+                                       ledger_dir=ledger_dir, error=error)
+    except Exception as e:
+        print(f"ERRO: Uma exceção ocorreu durante a execução da crew para o case_id '{case_id}': {e}")
+        import traceback
+        traceback.print_exc()
+        report_path, status, error = None, "error", str(e)
+        # Mesmo sem relatório, o caso entra na agregação do lote (ledger com status e erro).
+        deadline = cadastro_crew.deadline if cadastro_crew else None
+        ledger_path = save_case_ledger(
+            cadastro_crew.tracer if cadastro_crew else None, status, None,
+            budget=deadline.summary() if deadline else None,
+            case_id=case_id, ledger_dir=ledger_dir, error=error,
+        )
+    # O worker só fica livre quando o trabalho abandonado pelo caso (kickoff cancelado, unidades
+    # da extração por documento fora do orçamento) termina de fato: do contrário a concorrência
+    # real (e a carga no LLM) passaria de --concurrency.
+    if cadastro_crew is not None and not cadastro_crew.wait_for_kickoff(timeout=0):
+        print(f"INFO: Aguardando o fim das chamadas ao LLM abandonadas do case_id '{case_id}' antes do próximo caso...")
+        cadastro_crew.wait_for_kickoff()
+    return {
+        "case_id": case_id,
+        "status": status,
+        "report": str(report_path) if report_path else None,
+        "ledger": str(ledger_path) if ledger_path else None,
+        "error": error,
+        "exceeded_stage": exceeded_stage,
+        "score_risco": verdict.get("scoreRisco"),
+        "pontuacao_risco": verdict.get("pontuacaoRisco"),
+        "seconds": round(time.perf_counter() - started_at, 2),
+    }
+
+def run_batch():
+    """
+    Executa a CadastroCrew para vários casos no mesmo processo, com um pool limitado de workers.
+    As ferramentas (clientes, modelo de embedding, caches) são construídas uma única vez e
+    compartilhadas por todos os casos.
+
+    Uso:
+        run_batch CASO-1 CASO-2 ...
+        run_batch --file casos.txt            (um case_id por linha; '-' para stdin)
+        run_batch --from-supabase             (todos os case_id distintos da tabela documents)
+        run_batch --concurrency 8 --reports-dir reports/lote ...
+        run_batch --profile-startup ...       (imprime o tempo de importação das dependências)
+    """
+    _profile_startup_if_requested()
+    from .agents import CadastroAgents
+
+    parser = argparse.ArgumentParser(prog="run_batch", description="Executa a CadastroCrew para vários casos.")
+    parser.add_argument("case_ids", nargs="*", help="case_ids a processar")
+    parser.add_argument("--file", help="arquivo com um case_id por linha ('-' para stdin)")
+    parser.add_argument("--from-supabase", action="store_true", help="processar todos os case_id da tabela documents")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")),
+                        help="número máximo de casos executados em paralelo (padrão: BATCH_CONCURRENCY ou 4)")
+    parser.add_argument("--reports-dir", type=Path, default=None, help="diretório dos relatórios (padrão: reports/)")
+    args = parser.parse_args(sys.argv[1:])
+
+    s_client = setup_supabase_client()
+    if not s_client:
+        print("ERRO FATAL: Não foi possível inicializar o cliente Supabase. Saindo.")
+        return
+
+    case_ids = list(args.case_ids)
+    if args.file == "-":
+        case_ids += _read_case_ids(sys.stdin)
+    elif args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            case_ids += _read_case_ids(f)
+    if args.from_supabase:
+        case_ids += get_case_ids_from_supabase(s_client)
+    if not case_ids and not sys.stdin.isatty():
+        case_ids = _read_case_ids(sys.stdin)
+    case_ids = list(dict.fromkeys(case_ids)) # Remove duplicados preservando a ordem
+
+    if not case_ids:
+        print("ERRO: Nenhum case_id informado (use argumentos, --file, --from-supabase ou stdin).")
+        return
+
+    try:
+        parsed_checklist_content = load_checklist(s_client, CHECKLIST_CONFIG_NAME)
+    except Exception as e:
+        print(f"ERRO FATAL: Não foi possível carregar o checklist. {e}")
+        return
+
+    concurrency = max(1, args.concurrency)
+    print(f"INFO: Executando {len(case_ids)} casos com concorrência {concurrency}...")
+    agents_manager = CadastroAgents() # Ferramentas construídas uma única vez para todo o lote
+
+    batch_started_at = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="cadastro-case") as executor:
+        futures = {
+            executor.submit(_run_single_case, case_id, s_client, parsed_checklist_content, agents_manager, args.reports_dir): case_id
+            for case_id in case_ids
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"INFO: [{len(results)}/{len(case_ids)}] case_id '{result['case_id']}': {result['status']} em {result['seconds']}s")
+
+    elapsed = time.perf_counter() - batch_started_at
+    ok = sum(1 for r in results if r["status"] == "ok")
+    print("\n---\nRESUMO DO LOTE:\n")
+    for r in sorted(results, key=lambda r: case_ids.index(r["case_id"])):
+        print(f"- {r['case_id']}: {r['status']} ({r['seconds']}s) {r['report'] or r['error'] or ''}")
+    print(f"\n{ok}/{len(results)} casos concluídos em {elapsed:.1f}s ({len(results) / elapsed * 3600:.1f} casos/hora).")
+    ledgers = load_ledgers(r["ledger"] for r in results if r["ledger"])
+    if ledgers:
+        print("\nRECURSOS DO LOTE (ledgers; use o comando `ledger` para reagregar):\n")
+        print(format_summary(summarize_ledgers(ledgers)))
+    print("---")
 
 def train():
     """
     Train the crew for a given number of iterations.
     """
+    _profile_startup_if_requested()
+    from .crew import CadastroCrew
+
     inputs = {
         "topic": "AI LLMs",
         'current_year': str(datetime.now().year)
@@ -246,6 +469,9 @@ def replay():
     """
     Replay the crew execution from a specific task.
     """
+    _profile_startup_if_requested()
+    from .crew import CadastroCrew
+
     try:
         CadastroCrew().crew().replay(task_id=sys.argv[1])
 
@@ -254,18 +480,25 @@ def replay():
 
 def test():
     """
-    Test the crew execution and returns the results.
+    Executa o benchmark offline (benchmark/) em vez do `Crew.test` da CrewAI, que depende de
+    Supabase, LlamaCloud, Serper e OpenAI reais.
+    Uso (mesma assinatura do `crewai test`): test [n_casos] [eval_llm]; eval_llm é ignorado,
+    pois as respostas vêm do LLM roteirizado. Para todas as opções, use o comando `benchmark`.
+    Retorna o código de saída do processo: 0 se todos os casos terminaram 'ok', 1 caso contrário.
     """
-    inputs = {
-        "topic": "AI LLMs",
-        "current_year": str(datetime.now().year)
-    }
-    
-    try:
-        CadastroCrew().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
+    _profile_startup_if_requested(extra_modules=("cadastro_crew.benchmark.runner",))
+    from .benchmark import run_benchmark, format_report
 
+    n_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    try:
+        report = run_benchmark(cases=n_cases, concurrency_levels=[1])
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
+    print(format_report(report))
+    failed = sum(n for level in report["levels"] for status, n in level["status"].items() if status != "ok")
+    return 1 if failed else 0
+
+_MAIN_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED_AT
 
 if __name__ == "__main__":
     # Este bloco permite executar o main.py diretamente com `python -m cadastro_crew.main`
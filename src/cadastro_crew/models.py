@@ -0,0 +1,188 @@
+import json
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+# Modelos de saída estruturada das tarefas (Task.output_pydantic). A CrewAI inclui o schema
+# no prompt de cada tarefa e valida a resposta final; as tarefas seguintes recebem o JSON
+# compacto como contexto e o relatório é montado a partir dos modelos, sem nova chamada ao LLM.
+
+StatusValidacao = Literal["Conforme", "Não Conforme", "Pendência", "Não Aplicável"]
+ScoreRisco = Literal["Baixo", "Médio", "Alto"]
+
+
+def _value(value: Any) -> str:
+    if value is None or value == "" or value == [] or value == {}:
+        return "-"
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _cell(value: Any) -> str:
+    return _value(value).replace("|", "\\|").replace("\n", " ")
+
+
+# --- Tarefa de validação documental ---
+
+class ItemValidacao(BaseModel):
+    itemChecklist: str = Field(description="Nome do documento/item do checklist.")
+    documentoEncontrado: Literal["Sim", "Não", "Não Aplicável"] = Field(description="Se há documento correspondente.")
+    arquivosAnalisados: List[str] = Field(default_factory=list, description="Arquivos (nome ou file_url) analisados para o item.")
+    status: StatusValidacao = Field(description="Status da validação do item.")
+    observacoes: str = Field(default="", description="Motivo de qualquer 'Não Conforme' ou 'Pendência', citando a regra do checklist.")
+    referenciaKnowledgeBase: Optional[str] = Field(default=None, description="Referência da Knowledge Base, se consultada.")
+
+
+class RelatorioValidacao(BaseModel):
+    itens: List[ItemValidacao] = Field(description="Um item por item do checklist.")
+
+    def pendencias(self) -> List[ItemValidacao]:
+        return [item for item in self.itens if item.status in ("Não Conforme", "Pendência")]
+
+    def to_markdown(self) -> str:
+        lines = [
+            "| Item do Checklist | Documento Encontrado | Arquivo(s) | Status | Observações |",
+            "|---|---|---|---|---|",
+        ]
+        for item in self.itens:
+            lines.append(
+                f"| {_cell(item.itemChecklist)} | {_cell(item.documentoEncontrado)} | {_cell(', '.join(item.arquivosAnalisados))} "
+                f"| {_cell(item.status)} | {_cell(item.observacoes)} |"
+            )
+        return "\n".join(lines)
+
+
+# --- Tarefa de extração de dados (dossiê cadastral) ---
+
+class DadosPessoaJuridica(BaseModel):
+    razaoSocial: Optional[str] = None
+    nomeFantasia: Optional[str] = None
+    cnpj: Optional[str] = None
+    dataConstituicao: Optional[str] = None
+    enderecoSede: Optional[Any] = Field(default=None, description="Endereço completo (texto ou objeto com logradouro, número, etc.).")
+    naturezaJuridica: Optional[str] = None
+    capitalSocial: Optional[str] = None
+    objetoSocial: Optional[str] = None
+    telefone: Optional[str] = None
+    email: Optional[str] = None
+
+
+class SocioRepresentante(BaseModel):
+    nomeCompleto: Optional[str] = None
+    cpf: Optional[str] = None
+    rg: Optional[Any] = Field(default=None, description="Número, órgão emissor, UF e data de emissão.")
+    dataNascimento: Optional[str] = None
+    nacionalidade: Optional[str] = None
+    estadoCivil: Optional[str] = None
+    profissao: Optional[str] = None
+    enderecoResidencial: Optional[Any] = None
+    participacaoSocietaria: Optional[str] = None
+    cargo: Optional[str] = None
+    dataAdmissao: Optional[str] = None
+
+
+class DadosFinanceiros(BaseModel):
+    faturamento12Meses: Optional[Any] = Field(default=None, description="Valor total e período, ou valores mensais.")
+    contadorNome: Optional[str] = None
+    contadorCrc: Optional[str] = None
+
+
+class OutrasInformacoes(BaseModel):
+    numeroRegistroContrato: Optional[str] = None
+    dataUltimaAlteracao: Optional[str] = None
+    observacoes: Optional[str] = None
+
+
+class DossieCadastral(BaseModel):
+    dadosPessoaJuridica: DadosPessoaJuridica = Field(default_factory=DadosPessoaJuridica)
+    dadosSociosRepresentantes: List[SocioRepresentante] = Field(default_factory=list)
+    dadosFinanceiros: DadosFinanceiros = Field(default_factory=DadosFinanceiros)
+    outrasInformacoes: OutrasInformacoes = Field(default_factory=OutrasInformacoes)
+
+    def to_markdown(self) -> str:
+        lines = ["**Pessoa Jurídica**", ""]
+        lines += [f"- {field}: {_value(value)}" for field, value in self.dadosPessoaJuridica.model_dump().items()]
+        for index, socio in enumerate(self.dadosSociosRepresentantes, start=1):
+            lines += ["", f"**Sócio/Representante {index}**", ""]
+            lines += [f"- {field}: {_value(value)}" for field, value in socio.model_dump().items()]
+        lines += ["", "**Dados Financeiros**", ""]
+        lines += [f"- {field}: {_value(value)}" for field, value in self.dadosFinanceiros.model_dump().items()]
+        lines += ["", "**Outras Informações**", ""]
+        lines += [f"- {field}: {_value(value)}" for field, value in self.outrasInformacoes.model_dump().items()]
+        return "\n".join(lines)
+
+
+# --- Tarefa de análise de risco ---
+
+class Inconsistencia(BaseModel):
+    descricao: str
+    documentos: List[str] = Field(default_factory=list)
+    informacaoDocumentoA: Optional[str] = None
+    informacaoDocumentoB: Optional[str] = None
+
+
+class VerificacaoExterna(BaseModel):
+    cnpj: str = Field(default="", description="Situação e reputação do CNPJ.")
+    socios: str = Field(default="", description="Descobertas relevantes sobre os principais sócios.")
+
+
+class ParecerRisco(BaseModel):
+    sumarioCaso: str
+    pendenciasCriticas: List[str] = Field(default_factory=list)
+    inconsistencias: List[Inconsistencia] = Field(default_factory=list)
+    verificacaoExterna: VerificacaoExterna = Field(default_factory=VerificacaoExterna)
+    insightsKnowledgeBase: str = ""
+    parecerRisco: str
+    scoreRisco: ScoreRisco
+    pontuacaoRisco: Optional[int] = Field(default=None, ge=0, le=100, description="Pontuação de 0 (sem risco) a 100.")
+
+    def to_markdown(self) -> str:
+        lines = ["#### 1. Sumário do Caso", "", self.sumarioCaso, "", "#### 2. Principais Pendências Documentais", ""]
+        lines += [f"- {p}" for p in self.pendenciasCriticas] or ["Nenhuma."]
+        lines += ["", "#### 3. Relatório Detalhado de Inconsistências", ""]
+        for inc in self.inconsistencias:
+            lines.append(f"- {inc.descricao} (documentos: {_value(', '.join(inc.documentos))}; "
+                         f"A: {_value(inc.informacaoDocumentoA)} / B: {_value(inc.informacaoDocumentoB)})")
+        if not self.inconsistencias:
+            lines.append("Nenhuma.")
+        lines += [
+            "", "#### 4. Resultados da Verificação Externa (Web)", "",
+            f"- CNPJ: {_value(self.verificacaoExterna.cnpj)}", f"- Sócios: {_value(self.verificacaoExterna.socios)}",
+            "", "#### 5. Insights da Knowledge Base", "", _value(self.insightsKnowledgeBase),
+            "", "#### 6. Parecer de Risco", "", self.parecerRisco,
+            "", "#### 7. Score de Risco", "",
+            f"**{self.scoreRisco}**" + (f" ({self.pontuacaoRisco}/100)" if self.pontuacaoRisco is not None else ""),
+        ]
+        return "\n".join(lines)
+
+
+def render_crew_output(resultado) -> str:
+    """
+    Monta o relatório Markdown a partir das saídas estruturadas das tarefas (CrewOutput.tasks_output).
+    Tarefas sem saída estruturada (ex: validação do modelo falhou) entram com o texto bruto.
+    """
+    tasks_output = getattr(resultado, "tasks_output", None)
+    if not tasks_output:
+        return str(resultado)
+    titles = {
+        RelatorioValidacao: "Validação Documental",
+        DossieCadastral: "Dossiê Cadastral",
+        ParecerRisco: "Análise de Risco",
+    }
+    sections = []
+    for task_output in tasks_output:
+        model = getattr(task_output, "pydantic", None)
+        title = titles.get(type(model), task_output.name or task_output.agent or "Tarefa")
+        body = model.to_markdown() if model is not None and hasattr(model, "to_markdown") else task_output.raw
+        sections.append(f"### {title}\n\n{body}")
+    return "\n\n".join(sections)
+
+
+def risk_summary(resultado) -> Dict[str, Any]:
+    """Veredito estruturado da análise de risco (score e pendências), se disponível."""
+    model = getattr(resultado, "pydantic", None)
+    if not isinstance(model, ParecerRisco):
+        return {}
+    return {"scoreRisco": model.scoreRisco, "pontuacaoRisco": model.pontuacaoRisco,
+            "pendenciasCriticas": len(model.pendenciasCriticas), "inconsistencias": len(model.inconsistencias)}
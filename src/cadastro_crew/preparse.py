@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from .budgets import current_deadline, record_overrun
+
+logger = logging.getLogger(__name__)
+
+PRE_PARSE_CONCURRENCY_DEFAULT = 6
+# Valor do input 'parsed_documents' quando o pré-parseamento está desabilitado ou não produziu nada.
+NO_PARSED_DOCUMENTS_PLACEHOLDER = "(Nenhum documento pré-parseado. Utilize as ferramentas para obter o conteúdo de cada documento.)"
+PRE_PARSE_FAILURE_PREFIX = "FALHA NO PRÉ-PARSEAMENTO"
+# Nome da etapa no orçamento de tempo do caso (time_budgets.stages em tasks.yaml).
+PRE_PARSE_STAGE = "pre_parseamento"
+
+
+async def _resolve_and_parse(doc: dict, supabase_doc_tool, llama_parse_tool, semaphore: asyncio.Semaphore) -> str:
+    """Resolve a file_url de um documento via Supabase e o parseia com LlamaParse (assíncrono)."""
+    async with semaphore:
+        doc_name = doc.get("name")
+        case_id = doc.get("case_id")
+        # A consulta ao Supabase é síncrona; roda em thread para não bloquear os demais documentos.
+        info_json = await asyncio.to_thread(supabase_doc_tool._run, document_name=doc_name, case_id=case_id)
+        try:
+            file_url = json.loads(info_json).get("file_url")
+        except (json.JSONDecodeError, AttributeError):
+            return f"{PRE_PARSE_FAILURE_PREFIX}: {info_json}"
+        if not file_url:
+            return f"{PRE_PARSE_FAILURE_PREFIX}: documento sem file_url."
+
+        started_at = time.perf_counter()
+        content = await llama_parse_tool._arun(document_url=file_url)
+        logger.info(f"Pré-parseamento de '{doc_name}' concluído em {time.perf_counter() - started_at:.1f}s.")
+        return content
+
+
+async def _pre_parse_all(
+    documents: List[dict], supabase_doc_tool, llama_parse_tool, max_concurrency: int, timeout: Optional[float] = None
+) -> Dict[str, str]:
+    """
+    Parseia todos os documentos; os que não terminarem em `timeout` segundos são cancelados
+    (os já concluídos são mantidos) e marcados como falha.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = [
+        asyncio.create_task(_resolve_and_parse(doc, supabase_doc_tool, llama_parse_tool, semaphore))
+        for doc in documents
+    ]
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        record_overrun(PRE_PARSE_STAGE)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    parsed: Dict[str, str] = {}
+    for doc, task in zip(documents, tasks):
+        if task.cancelled():
+            logger.warning(f"Pré-parseamento de '{doc.get('name')}' cancelado: orçamento de tempo esgotado.")
+            result = f"{PRE_PARSE_FAILURE_PREFIX}: orçamento de tempo esgotado."
+        else:
+            result = task.exception() or task.result()
+        if isinstance(result, BaseException):
+            logger.error(f"Erro no pré-parseamento de '{doc.get('name')}': {result}")
+            result = f"{PRE_PARSE_FAILURE_PREFIX}: {type(result).__name__} - {result}"
+        parsed[doc.get("name")] = result
+    return parsed
+
+
+def pre_parse_case_documents(
+    documents: List[dict],
+    supabase_doc_tool,
+    llama_parse_tool,
+    max_concurrency: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Resolve e parseia concorrentemente todos os documentos de um caso (saída de
+    get_documents_for_case), reutilizando SupabaseDocumentContentTool e
+    LlamaParseDirectTool._arun. Retorna {nome_do_documento: conteúdo_parseado}.
+    Falhas individuais não interrompem os demais documentos: o conteúdo
+    correspondente começa com PRE_PARSE_FAILURE_PREFIX.
+    Com um prazo de caso ativo (ver budgets.py), a etapa é limitada ao orçamento
+    'pre_parseamento'; os documentos pendentes ao fim dele ficam para as ferramentas.
+    """
+    documents = [doc for doc in documents if doc.get("name")]
+    if not documents:
+        return {}
+    if max_concurrency is None:
+        max_concurrency = int(os.getenv("PRE_PARSE_CONCURRENCY", PRE_PARSE_CONCURRENCY_DEFAULT))
+
+    deadline = current_deadline()
+    timeout = None
+    if deadline is not None:
+        deadline.begin_stage(PRE_PARSE_STAGE)
+        timeout = deadline.check(PRE_PARSE_STAGE)
+
+    started_at = time.perf_counter()
+    try:
+        parsed = asyncio.run(
+            _pre_parse_all(documents, supabase_doc_tool, llama_parse_tool, max(1, max_concurrency), timeout)
+        )
+    finally:
+        if deadline is not None:
+            deadline.end_stage(PRE_PARSE_STAGE)
+    print(f"INFO: Pré-parseamento de {len(parsed)} documentos concluído em {time.perf_counter() - started_at:.1f}s.")
+    return parsed
+
+
+def format_parsed_documents(documents: List[dict], parsed: Dict[str, str]) -> str:
+    """Formata o conteúdo pré-parseado como uma seção Markdown por documento, para o input 'parsed_documents'."""
+    if not parsed:
+        return NO_PARSED_DOCUMENTS_PLACEHOLDER
+    sections = []
+    for doc in documents:
+        name = doc.get("name")
+        if name not in parsed:
+            continue
+        sections.append(f"### Documento: {name} (tipo: {doc.get('type')})\n\n{parsed[name]}")
+    return "\n\n---\n\n".join(sections)
@@ -0,0 +1,78 @@
+import sys
+import time
+import importlib
+from typing import Any, Dict, Iterable, List, Optional
+
+# Opção aceita por todos os comandos do main.py (run_crew, run_batch, train, replay, test):
+# imprime quanto tempo leva a importação de cada dependência pesada antes de executar o comando.
+PROFILE_STARTUP_FLAG = "--profile-startup"
+
+# Módulos carregados sob demanda, na ordem em que uma execução da crew os importa. Cada linha do
+# relatório mede só o que ainda não estava carregado (ex: crewai_tools, descontado o crewai).
+# sentence_transformers (e torch) fica de fora: só é importado no fallback local da KB.
+STARTUP_MODULES = (
+    "yaml",
+    "httpx",
+    "numpy",
+    "pydantic",
+    "supabase",
+    "crewai",
+    "crewai_tools",
+    "llama_index.core",
+    "llama_parse",
+    "cadastro_crew.crew",
+    "cadastro_crew.tools.supabase_document_tool",
+    "cadastro_crew.tools.knowledge_base_query_tool",
+    "cadastro_crew.tools.serper_search_tool",
+    "cadastro_crew.tools.llama_cloud_parsing_tool",
+)
+
+
+def pop_profile_flag(argv: List[str]) -> bool:
+    """Remove PROFILE_STARTUP_FLAG de `argv` (os argumentos posicionais ficam inalterados)."""
+    if PROFILE_STARTUP_FLAG not in argv:
+        return False
+    while PROFILE_STARTUP_FLAG in argv:
+        argv.remove(PROFILE_STARTUP_FLAG)
+    return True
+
+
+def profile_imports(modules: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Importa os módulos em ordem e mede, para cada um, o tempo e a quantidade de módulos novos
+    em sys.modules. Módulos já carregados aparecem com `loaded=True` e tempo zero; falhas de
+    importação são registradas em `error` sem interromper o perfil.
+    """
+    rows = []
+    for name in modules:
+        row: Dict[str, Any] = {"module": name, "seconds": 0.0, "new_modules": 0, "loaded": name in sys.modules}
+        if not row["loaded"]:
+            before = len(sys.modules)
+            started_at = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+            row["seconds"] = time.perf_counter() - started_at
+            row["new_modules"] = len(sys.modules) - before
+        rows.append(row)
+    return rows
+
+
+def format_import_profile(rows: List[Dict[str, Any]], entry_seconds: Optional[float] = None,
+                          entry_module: str = "cadastro_crew.main") -> str:
+    """Tabela do perfil de importação, do módulo mais lento ao mais rápido, com o total."""
+    lines = ["Perfil de inicialização (importações):"]
+    if entry_seconds is not None:
+        lines.append(f"  {entry_module:<48} {entry_seconds * 1000:9.1f} ms  (importação do comando)")
+    for row in sorted(rows, key=lambda r: r["seconds"], reverse=True):
+        if row["loaded"]:
+            detail = "já carregado"
+        elif "error" in row:
+            detail = f"ERRO {row['error']}"
+        else:
+            detail = f"+{row['new_modules']} módulos"
+        lines.append(f"  {row['module']:<48} {row['seconds'] * 1000:9.1f} ms  ({detail})")
+    total = sum(r["seconds"] for r in rows) + (entry_seconds or 0.0)
+    lines.append(f"  {'total':<48} {total * 1000:9.1f} ms  ({len(sys.modules)} módulos carregados)")
+    return "\n".join(lines)
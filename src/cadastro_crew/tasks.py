@@ -1,56 +1,142 @@
-import yaml
+import functools
+import threading
+import contextvars
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Any, Dict, Optional
 from crewai import Task
 
-# Carregar configurações das tarefas do arquivo YAML
+from .budgets import enter_task_stage
+from .compaction import compaction_enabled, compact_task_context
+from .tracing import KIND_TASK, span
+from .models import RelatorioValidacao, DossieCadastral, ParecerRisco
+
+# Configurações das tarefas (arquivo YAML), lidas no primeiro uso
 tasks_config_path = Path(__file__).parent / 'config/tasks.yaml'
-with open(tasks_config_path, 'r', encoding='utf-8') as file:
-    tasks_config = yaml.safe_load(file)
+
+
+@functools.lru_cache(maxsize=None)
+def load_tasks_config() -> dict:
+    """Lê o tasks.yaml uma única vez por processo."""
+    import yaml
+
+    with open(tasks_config_path, 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+
+def __getattr__(name):
+    # `tasks_config` continua disponível como atributo do módulo (lido no primeiro acesso).
+    if name == 'tasks_config':
+        return load_tasks_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CadastroTask(Task):
+    """
+    Task da CrewAI que entra na sua etapa do orçamento de tempo (budgets.py) ao iniciar.
+    Na execução assíncrona (async_execution=True), a thread da tarefa herda o contexto
+    (contextvars) de quem dispara o kickoff, para que o prazo do caso continue valendo
+    para as ferramentas, e exceções são propagadas para o Future.
+    Com `context_compaction` (seção da tarefa em tasks.yaml), o contexto recebido das tarefas
+    anteriores é compactado antes da execução (compaction.py).
+    Cada execução é registrada como uma span (tracing.py), pai das chamadas ao LLM e às ferramentas.
+    `llm_cache` (tasks.yaml) habilita o cache de respostas do LLM para a tarefa (llm_cache.py).
+    """
+
+    config_key: Optional[str] = None
+    context_compaction: Optional[Dict[str, Any]] = None
+    llm_cache: bool = False
+
+    def _prepare_context(self, context):
+        if not compaction_enabled(self.context_compaction) or not isinstance(self.context, list):
+            return context
+        compacted, _ = compact_task_context(self.config_key or self.name or "tarefa", self.context, context,
+                                            self.context_compaction)
+        return compacted
+
+    def _span(self, agent=None):
+        agent = agent or self.agent
+        return span(self.config_key or self.name or "tarefa", KIND_TASK, agent_role=getattr(agent, "role", None),
+                    async_execution=bool(self.async_execution))
+
+    def execute_sync(self, agent=None, context=None, tools=None):
+        enter_task_stage(self)
+        with self._span(agent):
+            return super().execute_sync(agent=agent, context=self._prepare_context(context), tools=tools)
+
+    def execute_async(self, agent=None, context=None, tools=None) -> Future:
+        future: Future = Future()
+        task_context = contextvars.copy_context()
+
+        def _execute():
+            try:
+                enter_task_stage(self)
+                with self._span(agent):
+                    result = self._execute_core(agent, self._prepare_context(context), tools)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=task_context.run, args=(_execute,), name="cadastro-task-async", daemon=True).start()
+        return future
 
 class CadastroTasks:
     """
     Classe para criar e configurar as Tarefas do "Crew de Cadastro".
     As definições (description, expected_output) são carregadas do tasks.yaml.
-    Os agentes são atribuídos aqui ao criar a Task.
+    Os agentes são atribuídos aqui ao criar a Task. Cada tarefa declara seu modelo de saída
+    (output_pydantic, ver models.py): as tarefas seguintes recebem o JSON compacto como contexto.
     Os placeholders nas descriptions serão preenchidos via o dicionário `inputs` 
     passado para `Crew.kickoff()` e gerenciados pelo contexto da CrewAI.
     """
 
-    def tarefa_validacao_documental(self, agente_triagem, context_tasks=None) -> Task:
-        config = tasks_config['tarefa_validacao_documental']
+    def tarefa_validacao_documental(self, agente_triagem, context_tasks=None, async_execution=False) -> Task:
+        config = load_tasks_config()['tarefa_validacao_documental']
         # Os placeholders como {case_id}, {documents}, {checklist}, {current_date}
         # serão interpolados por CrewAI a partir do input inicial do kickoff ou do contexto.
-        return Task(
+        return CadastroTask(
             description=config['description'],
             expected_output=config['expected_output'],
             agent=agente_triagem,
-            context=context_tasks if context_tasks else []
-            # async_execution=False # Defina como True se a tarefa puder rodar em paralelo
+            context=context_tasks if context_tasks else [],
+            output_pydantic=RelatorioValidacao,
+            config_key='tarefa_validacao_documental',
+            context_compaction=config.get('context_compaction'),
+            llm_cache=bool(config.get('llm_cache', False)),
+            async_execution=async_execution # True no modo paralelo (ver CadastroCrew)
             # output_file=config.get('output_file') # Se definido no YAML
         )
 
-    def tarefa_extracao_dados(self, agente_extrator, context_tasks=None) -> Task:
-        config = tasks_config['tarefa_extracao_dados']
+    def tarefa_extracao_dados(self, agente_extrator, context_tasks=None, async_execution=False) -> Task:
+        config = load_tasks_config()['tarefa_extracao_dados']
         # Placeholders: {case_id}, {documents}
-        return Task(
+        return CadastroTask(
             description=config['description'],
             expected_output=config['expected_output'],
             agent=agente_extrator,
-            context=context_tasks if context_tasks else []
-            # async_execution=False
+            context=context_tasks if context_tasks else [],
+            output_pydantic=DossieCadastral,
+            config_key='tarefa_extracao_dados',
+            context_compaction=config.get('context_compaction'),
+            llm_cache=bool(config.get('llm_cache', False)),
+            async_execution=async_execution
             # output_file=config.get('output_file')
         )
 
     def tarefa_analise_risco(self, agente_risco, context_tasks=None) -> Task:
-        config = tasks_config['tarefa_analise_risco_inconsistencias']
+        config = load_tasks_config()['tarefa_analise_risco_inconsistencias']
         # Placeholders: {case_id}, {dados_pj.cnpj}, {lista_cpfs_socios}
         # Estes últimos ({dados_pj.cnpj}, {lista_cpfs_socios}) provavelmente virão do contexto 
         # da tarefa de extração, ou precisam ser passados no input inicial se já conhecidos.
-        return Task(
+        return CadastroTask(
             description=config['description'],
             expected_output=config['expected_output'],
             agent=agente_risco,
-            context=context_tasks if context_tasks else []
+            context=context_tasks if context_tasks else [],
+            output_pydantic=ParecerRisco,
+            config_key='tarefa_analise_risco_inconsistencias',
+            context_compaction=config.get('context_compaction'),
+            llm_cache=bool(config.get('llm_cache', False))
             # async_execution=False
             # output_file=config.get('output_file', 'report_analise_risco.md') # Exemplo de output file
         )
@@ -0,0 +1,51 @@
+import re
+import json
+import unicodedata
+from typing import Any, Dict
+
+# Normalizações e utilitários de texto compartilhados pela extração por documento, pela
+# verificação de consistência, pela compactação de contexto e pelas regras do checklist.
+
+# Seções do JSON devolvido pela extração de cada documento (extraction.py, consistency.py).
+SECTION_PJ = "dadosPessoaJuridica"
+SECTION_SOCIOS = "socios"
+SECTION_FINANCEIROS = "dadosFinanceiros"
+SECTION_OUTRAS = "outrasInformacoes"
+OBJECT_SECTIONS = (SECTION_PJ, SECTION_FINANCEIROS, SECTION_OUTRAS)
+
+
+def normalize_text(value: Any) -> str:
+    """Forma canônica para comparação: sem acentos, caixa alta, espaços colapsados."""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.upper().split())
+
+
+def normalize_value(value: Any) -> str:
+    """Compara CNPJ/CPF/números pelos dígitos e textos pela forma canônica."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    text = normalize_text(value)
+    digits = re.sub(r"\D", "", text)
+    if digits and re.fullmatch(r"[\d\s./\-]+", text):
+        return digits
+    return text
+
+
+def is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, (str, list, dict)) and not value)
+
+
+def parse_json_object(text: str) -> Dict[str, Any]:
+    """Extrai o objeto JSON da resposta do LLM (tolerando cercas ```json e texto ao redor)."""
+    text = text.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("resposta sem objeto JSON")
+    value = json.loads(text[start:end + 1])
+    if not isinstance(value, dict):
+        raise ValueError("resposta JSON não é um objeto")
+    return value
@@ -1,9 +1,32 @@
-from .llama_cloud_parsing_tool import LlamaParseDirectTool
-from .knowledge_base_query_tool import KnowledgeBaseQueryTool
-from .supabase_document_tool import SupabaseDocumentContentTool
+import importlib
+
+# Exportações carregadas sob demanda (PEP 562): importar o pacote não importa crewai_tools,
+# llama_parse/llama_index nem supabase; cada ferramenta carrega seu módulo no primeiro acesso.
+_LAZY_EXPORTS = {
+    "LlamaParseDirectTool": ".llama_cloud_parsing_tool",
+    "KnowledgeBaseQueryTool": ".knowledge_base_query_tool",
+    "invalidate_kb_result_cache": ".knowledge_base_query_tool",
+    "SupabaseDocumentContentTool": ".supabase_document_tool",
+    "CadastroSerperTool": ".serper_search_tool",
+}
 
 __all__ = [
     "LlamaParseDirectTool",
     "KnowledgeBaseQueryTool",
-    "SupabaseDocumentContentTool"
+    "invalidate_kb_result_cache",
+    "SupabaseDocumentContentTool",
+    "CadastroSerperTool"
 ]
+
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
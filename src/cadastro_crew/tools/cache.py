@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Diretório base para todos os caches persistentes do projeto.
+# Pode ser sobrescrito com a variável de ambiente CADASTRO_CACHE_DIR.
+CACHE_BASE_DIR_DEFAULT = Path.home() / ".cache" / "cadastro_crew"
+PARSE_CACHE_MAX_MB_DEFAULT = 512
+
+
+def cache_base_dir() -> Path:
+    """Retorna o diretório base dos caches em disco (CADASTRO_CACHE_DIR ou ~/.cache/cadastro_crew)."""
+    return Path(os.getenv("CADASTRO_CACHE_DIR", str(CACHE_BASE_DIR_DEFAULT)))
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Lê uma variável de ambiente booleana ('1', 'true', 'sim', 'yes', 'on')."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Gera uma chave SHA-256 estável a partir de qualquer combinação de valores serializáveis em JSON."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Calcula o SHA-256 de um arquivo local lendo-o em blocos (sem carregar tudo em memória)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Cache persistente em disco, um arquivo por entrada, com limite de tamanho total
+    e despejo LRU (baseado no mtime, que é atualizado a cada leitura).
+    Seguro para uso entre threads do mesmo processo; entre processos, as escritas
+    são atômicas (arquivo temporário + os.replace).
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, ttl_seconds: Optional[float] = None, suffix: str = ".txt"):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size_bytes = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self):
+        return self.directory.glob(f"*{self.suffix}")
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path_for(key)
+        try:
+            value = path.read_text(encoding="utf-8")
+            if self.ttl_seconds is not None:
+                # Entradas com TTL guardam o instante de criação na primeira linha
+                # (o mtime é reservado para o controle LRU).
+                created_at, _, value = value.partition("\n")
+                if time.time() - float(created_at) > self.ttl_seconds:
+                    self._remove(path)
+                    with self._lock:
+                        self.misses += 1
+                    return None
+            os.utime(path, None)  # Marca como usado recentemente (LRU)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        except OSError as e:
+            logger.warning(f"Falha ao ler entrada de cache {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path_for(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if self.ttl_seconds is not None:
+            value = f"{time.time()}\n{value}"
+        data = value.encode("utf-8")
+        try:
+            previous_size = path.stat().st_size if path.exists() else 0
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Falha ao gravar entrada de cache {path}: {e}")
+            if tmp_path.exists():
+                tmp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._size_bytes += len(data) - previous_size
+            over_limit = self._size_bytes > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._size_bytes -= size
+
+    def _evict(self) -> None:
+        """Remove as entradas menos recentemente usadas até o cache voltar a caber em max_bytes."""
+        entries = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            self._size_bytes = total
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(p)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            logger.info(f"Entrada de cache despejada (LRU): {p.name}")
+
+    def clear(self) -> None:
+        for p in list(self._entries()):
+            self._remove(p)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "directory": str(self.directory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class TTLCache:
+    """
+    Cache em memória com expiração (TTL) e limite de entradas (despejo LRU).
+    Seguro para uso entre threads; mantém contadores de hits/misses.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.monotonic() > entry[0]:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Any = None) -> None:
+        """Remove uma entrada, ou todas se `key` for None."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._data),
+            }
+
+
+_parse_cache: Optional[DiskCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[DiskCache]:
+    """
+    Retorna o cache de parseamento compartilhado pelo processo (todas as instâncias de
+    LlamaParseDirectTool e todos os agentes usam o mesmo). Retorna None se desabilitado
+    via PARSE_CACHE_ENABLED=false.
+    Configuração: PARSE_CACHE_DIR (padrão: <CADASTRO_CACHE_DIR>/parse) e PARSE_CACHE_MAX_MB.
+    """
+    global _parse_cache
+    if not env_flag("PARSE_CACHE_ENABLED", True):
+        return None
+    if _parse_cache is None:
+        with _parse_cache_lock:
+            if _parse_cache is None:
+                directory = Path(os.getenv("PARSE_CACHE_DIR", str(cache_base_dir() / "parse")))
+                max_mb = float(os.getenv("PARSE_CACHE_MAX_MB", PARSE_CACHE_MAX_MB_DEFAULT))
+                try:
+                    _parse_cache = DiskCache(directory, max_bytes=int(max_mb * 1024 * 1024), suffix=".md")
+                    logger.info(f"Cache de parseamento em {directory} (limite {max_mb} MB).")
+                except OSError as e:
+                    logger.warning(f"Não foi possível inicializar o cache de parseamento em {directory}: {e}")
+                    return None
+    return _parse_cache
+
+
+def parse_cache_key(
+    content_sha256: str,
+    parsing_preset: str,
+    language: str,
+    result_as_markdown: bool,
+    parsing_instructions: Optional[str],
+) -> str:
+    """Chave do cache de parseamento: conteúdo do arquivo + todas as opções que afetam o resultado."""
+    return make_cache_key(content_sha256, parsing_preset, language, bool(result_as_markdown), parsing_instructions or "")
@@ -0,0 +1,192 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..tracing import span
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME_DEFAULT = "sentence-transformers/all-MiniLM-L6-v2"
+QUERY_EMBEDDING_CACHE_SIZE_DEFAULT = 2048
+# Após uma falha de carregamento, novas tentativas só depois deste intervalo (segundos).
+EMBEDDING_LOAD_RETRY_SECONDS_DEFAULT = 30
+
+# Modelos carregados, compartilhados por todas as instâncias de ferramentas do processo.
+_models: Dict[str, Any] = {}
+_load_errors: Dict[str, Tuple[Exception, float]] = {}
+_models_lock = threading.Lock()
+_warmup_threads: Dict[str, threading.Thread] = {}
+
+
+def get_embedding_model(model_name: str = EMBEDDING_MODEL_NAME_DEFAULT):
+    """
+    Retorna o SentenceTransformer `model_name`, carregando-o na primeira chamada.
+    O modelo é um singleton por processo: todas as instâncias da KnowledgeBaseQueryTool
+    (e todos os casos de um lote) compartilham a mesma cópia em memória.
+    Erros de carregamento são propagados; durante EMBEDDING_LOAD_RETRY_SECONDS (padrão 30s)
+    as chamadas seguintes repetem o erro sem nova tentativa, e depois o carregamento é refeito
+    (uma falha transitória do HuggingFace/rede não desabilita a KB pelo resto do lote).
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is not None:
+            return model
+        if model_name in _load_errors:
+            error, failed_at = _load_errors[model_name]
+            retry_seconds = float(os.getenv("EMBEDDING_LOAD_RETRY_SECONDS", EMBEDDING_LOAD_RETRY_SECONDS_DEFAULT))
+            if time.monotonic() - failed_at < retry_seconds:
+                raise error
+        try:
+            # Import tardio: sentence_transformers (e torch) só são carregados quando necessário.
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        except Exception as e:
+            _load_errors[model_name] = (e, time.monotonic())
+            raise
+        _load_errors.pop(model_name, None)
+        _models[model_name] = model
+        print(f"INFO: Modelo de embedding '{model_name}' carregado.")
+        return model
+
+
+def register_embedding_model(model_name: str, model: Any) -> None:
+    """
+    Registra `model` (qualquer objeto com encode(list[str], convert_to_numpy=..., show_progress_bar=...))
+    como o modelo `model_name` do processo, sem carregar o SentenceTransformer. Usado pelo
+    benchmark offline (benchmark/fakes.py) com um embedder determinístico.
+    """
+    with _models_lock:
+        _load_errors.pop(model_name, None)
+        _models[model_name] = model
+
+
+def warm_embedding_model(model_name: str = EMBEDDING_MODEL_NAME_DEFAULT) -> Optional[threading.Thread]:
+    """
+    Inicia o carregamento do modelo em uma thread em segundo plano (daemon), para que a
+    primeira consulta não pague o custo de carga. Retorna a thread (ou None se já carregado).
+    """
+    if model_name in _models:
+        return None
+    with _models_lock:
+        thread = _warmup_threads.get(model_name)
+        if thread is not None:
+            return thread
+
+        def _warm():
+            try:
+                get_embedding_model(model_name)
+            except Exception as e:
+                logger.warning(f"Falha no pré-carregamento do modelo de embedding '{model_name}': {e}")
+
+        thread = threading.Thread(target=_warm, name=f"embedding-warmup-{model_name}", daemon=True)
+        _warmup_threads[model_name] = thread
+    thread.start()
+    return thread
+
+
+# Modelos cujo tokenizador ignora a caixa: para eles a query também é convertida para minúsculas.
+UNCASED_EMBEDDING_MODELS = frozenset({
+    "sentence-transformers/all-MiniLM-L6-v2",
+    "sentence-transformers/all-MiniLM-L12-v2",
+})
+
+
+def normalize_query(query: str, model_name: str = EMBEDDING_MODEL_NAME_DEFAULT) -> str:
+    """
+    Normaliza a query para a chave do cache (e para o encode): espaços sempre; caixa apenas
+    nos modelos uncased (UNCASED_EMBEDDING_MODELS), em que ela não altera o embedding.
+    """
+    query = " ".join(query.split())
+    return query.lower() if model_name in UNCASED_EMBEDDING_MODELS else query
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU de query normalizada -> embedding (vetor float32 somente leitura).
+    Seguro para uso entre threads; mantém contadores de hits/misses.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, normalized_query: str) -> Optional[np.ndarray]:
+        key = (model_name, normalized_query)
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model_name: str, normalized_query: str, vector: np.ndarray) -> np.ndarray:
+        vector = np.array(vector, dtype=np.float32) # Cópia compacta (não mantém o lote inteiro vivo)
+        vector.setflags(write=False) # Compartilhado entre chamadas: não pode ser alterado
+        with self._lock:
+            self._data[(model_name, normalized_query)] = vector
+            self._data.move_to_end((model_name, normalized_query))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._data),
+                "bytes": sum(v.nbytes for v in self._data.values()),
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", QUERY_EMBEDDING_CACHE_SIZE_DEFAULT))
+)
+
+
+def encode_queries(queries: Sequence[str], model_name: str = EMBEDDING_MODEL_NAME_DEFAULT) -> List[np.ndarray]:
+    """
+    Retorna os embeddings (float32) de várias queries, na mesma ordem.
+    Queries já vistas vêm do cache; as demais (sem duplicatas) são codificadas em
+    UMA única chamada a `encode`, aproveitando o processamento em lote do modelo.
+    """
+    normalized = [normalize_query(q, model_name) for q in queries]
+    vectors: Dict[str, np.ndarray] = {}
+    pending: List[str] = []
+    for nq in normalized:
+        if nq in vectors or nq in pending:
+            continue
+        cached = query_embedding_cache.get(model_name, nq)
+        if cached is not None:
+            vectors[nq] = cached
+        else:
+            pending.append(nq)
+
+    if pending:
+        model = get_embedding_model(model_name)
+        with span("embedding_encode", queries=len(pending)):
+            encoded = model.encode(pending, convert_to_numpy=True, show_progress_bar=False)
+        for nq, vector in zip(pending, np.asarray(encoded, dtype=np.float32)):
+            vectors[nq] = query_embedding_cache.put(model_name, nq, vector)
+
+    return [vectors[nq] for nq in normalized]
+
+
+def encode_query(query: str, model_name: str = EMBEDDING_MODEL_NAME_DEFAULT) -> np.ndarray:
+    """Embedding (float32) de uma única query, usando o cache LRU."""
+    return encode_queries([query], model_name)[0]
@@ -1,20 +1,49 @@
 import os
-from typing import Type, Optional
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Type, Optional, List
+import numpy as np
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
 # Dependências para a Knowledge Base (exemplo com Supabase/pgvector e SentenceTransformers)
 # pip install supabase sentence-transformers
 # Lembre-se de configurar o Supabase e a extensão pgvector
-from supabase import create_client, Client as SupabaseClient
-from sentence_transformers import SentenceTransformer
+from supabase import Client as SupabaseClient
+
+from ..budgets import BudgetExceeded, record_overrun, tool_timeout
+from ..clients import execute_with_timeout, get_supabase_client
+from ..tracing import annotate, span, traced
+from .cache import env_flag, make_cache_key, TTLCache
+from .embeddings import encode_query, encode_queries, warm_embedding_model, EMBEDDING_MODEL_NAME_DEFAULT
+from .local_vector_index import get_local_vector_index
 
 # --- Configuração da Knowledge Base (Supabase) ---
 # REMOVER a leitura de variáveis de ambiente daqui
 # SUPABASE_URL = os.getenv("SUPABASE_URL")
 # SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY") 
 KB_TABLE_NAME_DEFAULT = "knowledge_base_chunks"
-EMBEDDING_MODEL_NAME_DEFAULT = "sentence-transformers/all-MiniLM-L6-v2"
+KB_MATCH_THRESHOLD_DEFAULT = 0.5
+# Backend da busca vetorial: "supabase" (RPC match_kb_chunks no pgvector) ou "local"
+# (índice em processo, ver local_vector_index.py). Selecionado pela variável KB_BACKEND.
+KB_BACKEND_DEFAULT = "supabase"
+KB_RESULT_CACHE_TTL_SECONDS_DEFAULT = 600
+
+# Cache de resultados da busca vetorial, compartilhado por todas as instâncias da ferramenta
+# (e por todos os casos de um lote). Chave: (embedding da query, top_k, match_threshold, tabela).
+_kb_result_cache = TTLCache(
+    ttl_seconds=float(os.getenv("KB_RESULT_CACHE_TTL_SECONDS", KB_RESULT_CACHE_TTL_SECONDS_DEFAULT)),
+    max_entries=4096,
+)
+
+
+def invalidate_kb_result_cache() -> None:
+    """
+    Descarta todos os resultados em cache da Knowledge Base. Deve ser chamado sempre que
+    a tabela knowledge_base_chunks for alterada (ingestão, remoção ou reindexação de chunks).
+    """
+    _kb_result_cache.invalidate()
+    print("INFO (KnowledgeBaseQueryTool): Cache de resultados da Knowledge Base invalidado.")
 
 class KnowledgeBaseQueryToolSchema(BaseModel):
     """Define os argumentos para a ferramenta de consulta à Knowledge Base (Pydantic V2)."""
@@ -38,18 +67,22 @@ class KnowledgeBaseQueryTool(BaseTool):
     args_schema: Type[BaseModel] = KnowledgeBaseQueryToolSchema
 
     _supabase_client: Optional[SupabaseClient] = None
-    _embedding_model: Optional[SentenceTransformer] = None
 
     # Adicionar variáveis para armazenar as configs que antes eram globais
     _supabase_url: Optional[str] = None
     _supabase_service_key: Optional[str] = None
     _kb_table_name: str = KB_TABLE_NAME_DEFAULT
     _embedding_model_name: str = EMBEDDING_MODEL_NAME_DEFAULT
+    _match_threshold: float = KB_MATCH_THRESHOLD_DEFAULT
+    _kb_backend: str = KB_BACKEND_DEFAULT
 
     def __init__(self, **kwargs):
         """
-        Inicializa a ferramenta, o cliente Supabase e o modelo de embedding.
+        Inicializa a ferramenta e o cliente Supabase.
         As variáveis de ambiente são lidas AQUI, no momento da instanciação.
+        O modelo de embedding NÃO é carregado aqui: ele é carregado no primeiro _run()
+        (singleton compartilhado pelo processo), ou em segundo plano se
+        EMBEDDING_MODEL_WARMUP estiver habilitado.
         """
         super().__init__(**kwargs)
 
@@ -58,51 +91,159 @@ class KnowledgeBaseQueryTool(BaseTool):
         self._supabase_service_key = os.getenv("SUPABASE_SERVICE_KEY")
         self._kb_table_name = os.getenv("KB_TABLE_NAME", KB_TABLE_NAME_DEFAULT)
         self._embedding_model_name = os.getenv("EMBEDDING_MODEL_NAME", EMBEDDING_MODEL_NAME_DEFAULT)
+        self._match_threshold = float(os.getenv("KB_MATCH_THRESHOLD", KB_MATCH_THRESHOLD_DEFAULT))
+        self._kb_backend = os.getenv("KB_BACKEND", KB_BACKEND_DEFAULT).strip().lower()
 
         if not self._supabase_url or not self._supabase_service_key:
             print(f"ALERTA (KnowledgeBaseQueryTool): Variáveis SUPABASE_URL ({self._supabase_url is not None}) ou SUPABASE_SERVICE_KEY ({self._supabase_service_key is not None}) não configuradas ou faltando. A ferramenta pode não funcionar.")
             self._supabase_client = None
-            self._embedding_model = None
             return
 
         try:
-            self._supabase_client = create_client(self._supabase_url, self._supabase_service_key)
-            print("INFO: Cliente Supabase inicializado para a KnowledgeBaseQueryTool.")
+            self._supabase_client = get_supabase_client(self._supabase_url, self._supabase_service_key)
+            print("INFO: Cliente Supabase (compartilhado) obtido para a KnowledgeBaseQueryTool.")
         except Exception as e:
             print(f"ERRO CRÍTICO (KnowledgeBaseQueryTool): Não foi possível inicializar o cliente Supabase: {e}")
             self._supabase_client = None
 
+        if env_flag("EMBEDDING_MODEL_WARMUP", False):
+            warm_embedding_model(self._embedding_model_name)
+
+    def _check_ready(self) -> Optional[str]:
+        """Retorna uma mensagem de erro se a ferramenta não puder consultar a KB, ou None."""
         try:
-            self._embedding_model = SentenceTransformer(self._embedding_model_name)
-            print(f"INFO: Modelo de embedding \'{self._embedding_model_name}\' carregado para KnowledgeBaseQueryTool.")
-        except Exception as e:
-            print(f"ERRO CRÍTICO (KnowledgeBaseQueryTool): Não foi possível carregar o modelo de embedding \'{self._embedding_model_name}\': {e}")
-            self._embedding_model = None
+            tool_timeout("knowledge_base") # O caso ainda precisa ter prazo para a consulta
+        except BudgetExceeded as e:
+            return f"ERRO: {e}"
+        if self._kb_backend == "local":
+            return None # O índice local funciona sem Supabase (apenas com arquivos locais)
+        if not self._supabase_client:
+            return "ERRO: Ferramenta Knowledge Base não inicializada corretamente (Supabase ou Modelo de Embedding faltando)."
+        if not self._kb_table_name:
+            return "ERRO: Nome da tabela da Knowledge Base (KB_TABLE_NAME) não configurado."
+        return None
 
+    @traced("knowledge_base_query")
     def _run(self, query: str, top_k: int = 3) -> str:
         """
         Executa a consulta na Knowledge Base.
-        1. Gera o embedding da query.
+        1. Gera o embedding da query (ou o reutiliza do cache LRU de embeddings).
         2. Executa uma stored procedure (ou query direta) no Supabase para busca por similaridade.
         3. Formata e retorna os resultados.
         """
-        if not self._supabase_client or not self._embedding_model:
-            return "ERRO: Ferramenta Knowledge Base não inicializada corretamente (Supabase ou Modelo de Embedding faltando)."
+        not_ready = self._check_ready()
+        if not_ready:
+            return not_ready
 
         if not query:
             return "ERRO: A query para a Knowledge Base não pode ser vazia."
-        
-        if not self._kb_table_name:
-            return "ERRO: Nome da tabela da Knowledge Base (KB_TABLE_NAME) não configurado."
 
         print(f"INFO (KnowledgeBaseQueryTool): Recebida query para KB: \'{query}\', top_k={top_k}")
 
         try:
             # 1. Gerar embedding para a query
             print("INFO: Gerando embedding para a query...")
-            query_embedding = self._embedding_model.encode(query).tolist() # type: ignore
+            query_embedding = encode_query(query, self._embedding_model_name)
             print("INFO: Embedding da query gerado.")
+        except Exception as e:
+            print(f"ERRO CRÍTICO (KnowledgeBaseQueryTool): Não foi possível carregar o modelo de embedding \'{self._embedding_model_name}\': {e}")
+            return f"ERRO: Modelo de embedding '{self._embedding_model_name}' indisponível para a Knowledge Base."
+
+        return self._search(query_embedding, top_k)
 
+    @traced("knowledge_base_query_many")
+    def query_many(self, queries: List[str], top_k: int = 3) -> List[str]:
+        """
+        Consulta a KB para várias queries de uma vez. Os embeddings das queries ainda não
+        vistas são gerados em uma única chamada ao modelo (lote); retorna um resultado
+        formatado por query, na mesma ordem.
+        """
+        not_ready = self._check_ready()
+        if not_ready:
+            return [not_ready for _ in queries]
+        valid_queries = [q for q in queries if q]
+        try:
+            embeddings = dict(zip(valid_queries, encode_queries(valid_queries, self._embedding_model_name)))
+        except Exception as e:
+            print(f"ERRO CRÍTICO (KnowledgeBaseQueryTool): Não foi possível carregar o modelo de embedding \'{self._embedding_model_name}\': {e}")
+            return [f"ERRO: Modelo de embedding '{self._embedding_model_name}' indisponível para a Knowledge Base." for _ in queries]
+        return [
+            self._search(embeddings[q], top_k) if q else "ERRO: A query para a Knowledge Base não pode ser vazia."
+            for q in queries
+        ]
+
+    @staticmethod
+    def invalidate_cache() -> None:
+        """Hook de invalidação do cache de resultados (ver invalidate_kb_result_cache)."""
+        invalidate_kb_result_cache()
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return _kb_result_cache.stats()
+
+    def _search(self, query_embedding: np.ndarray, top_k: int) -> str:
+        """
+        Busca por similaridade a partir de um embedding já calculado, passando antes pelo
+        cache de resultados. Apenas respostas bem-sucedidas (com ou sem resultados) são guardadas.
+        """
+        cache_key = make_cache_key(
+            np.asarray(query_embedding, dtype=np.float32).tobytes().hex(), top_k, self._match_threshold, self._kb_table_name
+        )
+        cached_result = _kb_result_cache.get(cache_key)
+        annotate(cache_hit=cached_result is not None)
+        if cached_result is not None:
+            print("INFO (KnowledgeBaseQueryTool): Resultado obtido do cache da Knowledge Base.")
+            return cached_result
+
+        result = self._search_uncached(query_embedding, top_k)
+        if not result.startswith("ERRO"):
+            _kb_result_cache.set(cache_key, result)
+        return result
+
+    def _search_uncached(self, query_embedding: np.ndarray, top_k: int) -> str:
+        if self._kb_backend == "local":
+            return self._search_local(query_embedding, top_k)
+        return self._search_supabase(query_embedding, top_k)
+
+    @staticmethod
+    def _format_results(rows: list) -> str:
+        """Formata as linhas (id, content, similarity, metadata) no texto entregue ao agente."""
+        formatted_results = []
+        for i, item in enumerate(rows):
+            result_text = f"Resultado {i+1} (Similaridade: {item.get('similarity', 'N/A'):.4f}):\n"
+            result_text += f"Conteúdo: {item.get('content', 'Conteúdo não disponível')}\n"
+            if item.get('metadata'):
+                result_text += f"Metadados: {item.get('metadata')}\n"
+            result_text += "---\n"
+            formatted_results.append(result_text)
+        
+        if not formatted_results:
+            return "INFO: Nenhum resultado relevante encontrado na Knowledge Base para esta query."
+        return "\n".join(formatted_results)
+
+    def _search_local(self, query_embedding: np.ndarray, top_k: int) -> str:
+        """Busca top-k por cosseno no índice vetorial em processo (KB_BACKEND=local)."""
+        try:
+            index = get_local_vector_index(self._embedding_model_name)
+            if index.refresh_if_stale(self._supabase_client, self._kb_table_name):
+                invalidate_kb_result_cache()
+            with span("local_vector_search", chunks=len(index)):
+                rows = index.search(query_embedding, top_k, self._match_threshold)
+            print(f"INFO: {len(rows)} resultados encontrados no índice vetorial local ({len(index)} chunks).")
+            if not rows:
+                return "INFO: Nenhum resultado encontrado na Knowledge Base para esta query."
+            return self._format_results(rows)
+        except Exception as e:
+            print(f"ERRO INESPERADO ao consultar o índice vetorial local: {type(e).__name__} - {e}")
+            return f"ERRO INTERNO DA FERRAMENTA: Falha ao consultar a Knowledge Base. Detalhes: {type(e).__name__}"
+
+    def _search_supabase(self, query_embedding: np.ndarray, top_k: int) -> str:
+        """Executa a RPC de busca vetorial no Supabase (dentro do orçamento 'knowledge_base') e formata os resultados."""
+        try:
+            timeout = tool_timeout("knowledge_base")
+        except BudgetExceeded as e:
+            return f"ERRO: {e}"
+        try:
             # 2. Consultar Supabase usando uma função RPC (stored procedure) para busca de similaridade
             #    Esta função 'match_documents' (ou similar) precisaria ser criada no seu Supabase
             #    e usaria o operador de similaridade do pgvector (ex: <=>).
@@ -137,30 +278,19 @@ class KnowledgeBaseQueryTool(BaseTool):
             rpc_name = "match_kb_chunks" # Ou o nome que você der à sua função no Supabase
 
             print(f"INFO: Executando RPC '{rpc_name}' no Supabase...")
-            response = self._supabase_client.rpc(
-                rpc_name,
-                params={
-                    'query_embedding': query_embedding,
-                    'match_threshold': 0.5,  # Ajuste este limiar conforme necessário
-                    'match_count': top_k
-                }
-            ).execute()
+            params = {
+                'query_embedding': query_embedding.tolist(),
+                'match_threshold': self._match_threshold,  # KB_MATCH_THRESHOLD (padrão 0.5)
+                'match_count': top_k
+            }
+            with span(f"supabase_rpc_{rpc_name}") as rpc_span:
+                response = execute_with_timeout(self._supabase_client.rpc(rpc_name, params=params), timeout)
+                rpc_span.set(bytes_out=len(json.dumps(params)))
+                rpc_span.observe_result(response.data or [], transferred=True)
 
             if response.data:
                 print(f"INFO: {len(response.data)} resultados encontrados na KB.")
-                # Formatar os resultados
-                formatted_results = []
-                for i, item in enumerate(response.data):
-                    result_text = f"Resultado {i+1} (Similaridade: {item.get('similarity', 'N/A'):.4f}):\n"
-                    result_text += f"Conteúdo: {item.get('content', 'Conteúdo não disponível')}\n"
-                    if item.get('metadata'):
-                        result_text += f"Metadados: {item.get('metadata')}\n"
-                    result_text += "---\n"
-                    formatted_results.append(result_text)
-                
-                if not formatted_results:
-                    return "INFO: Nenhum resultado relevante encontrado na Knowledge Base para esta query."
-                return "\n".join(formatted_results)
+                return self._format_results(response.data)
             else:
                 # Isso pode acontecer se a RPC não retornar dados ou se houver um erro na RPC não capturado como exceção HTTP
                 print("ALERTA: Nenhum dado retornado pela RPC do Supabase, ou a resposta não continha 'data'.")
@@ -169,6 +299,10 @@ class KnowledgeBaseQueryTool(BaseTool):
                     return f"ERRO ao consultar KB: {response.error.message}" # type: ignore
                 return "INFO: Nenhum resultado encontrado na Knowledge Base para esta query."
 
+        except FutureTimeoutError:
+            record_overrun("knowledge_base")
+            print(f"ALERTA: Tempo esgotado ({timeout:g}s) aguardando a RPC da Knowledge Base.")
+            return "ERRO: Tempo esgotado ao consultar a Knowledge Base."
         except Exception as e:
             print(f"ERRO INESPERADO ao consultar a Knowledge Base: {type(e).__name__} - {e}")
             # import traceback
@@ -190,7 +324,7 @@ if __name__ == '__main__':
     # try:
     #     kb_tool = KnowledgeBaseQueryTool()
     #     # A verificação de inicialização agora deve ser baseada nos atributos da instância
-    #     if not kb_tool._supabase_client or not kb_tool._embedding_model:
+    #     if not kb_tool._supabase_client:
     #         print("ERRO: Falha na inicialização da ferramenta KBTool. Verifique os logs de alerta/erro da ferramenta.")
     #         exit(1)
     # except Exception as e:
@@ -1,8 +1,10 @@
 import os
 import tempfile
 import asyncio
+import time
+import hashlib
 import httpx # Usado para baixar arquivos de URLs
-from typing import Type, Optional, Literal, List, Any
+from typing import TYPE_CHECKING, Type, Optional, Literal, List, Any, Tuple
 from pydantic import BaseModel, Field, validator # MODIFICADO: Usar pydantic (V2)
 from crewai.tools import BaseTool
 from dotenv import load_dotenv
@@ -10,9 +12,16 @@ from dotenv import load_dotenv
 import logging # Adicionado para o logger que já existe
 
 # Certifique-se de instalar: pip install crewai-tools llama-parse httpx pydantic llama-index-core
-# llama-parse é a biblioteca específica para o serviço LlamaParse
-from llama_parse import LlamaParse, ParsingMode 
-from llama_index.core.schema import Document # LlamaParse retorna objetos Document do LlamaIndex
+# llama-parse é a biblioteca específica para o serviço LlamaParse. Ela (e o llama_index) só é
+# importada ao criar o parser (_get_parser_instance), não na importação do módulo.
+if TYPE_CHECKING:
+    from llama_parse import LlamaParse
+    from llama_index.core.schema import Document # LlamaParse retorna objetos Document do LlamaIndex
+
+from ..budgets import BudgetExceeded, tool_timeout, record_overrun, is_cancelled
+from ..clients import get_http_client
+from ..tracing import annotate, span, traced
+from .cache import get_parse_cache, parse_cache_key, file_sha256, TTLCache
 
 # Configuração básica de logging para a ferramenta
 logger = logging.getLogger(__name__)
@@ -27,6 +36,26 @@ LLAMA_CLOUD_API_KEY = os.getenv("LLAMA_CLOUD_API_KEY")
 # Mapearemos "fast" e "balanced" para SIMPLE, e "detailed" para DETAILED.
 ParsingPreset = Literal["simple", "detailed"]
 
+# Downloads são feitos em streaming direto para disco, em blocos, com tamanho máximo configurável.
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_MAX_MB_DEFAULT = 100
+DOWNLOAD_URL_INDEX_TTL_SECONDS_DEFAULT = 600
+
+# URL -> SHA-256 do último conteúdo baixado. Com o cache de parseamento quente, permite
+# responder sem baixar o arquivo de novo.
+_url_digest_index = TTLCache(
+    ttl_seconds=float(os.getenv("DOWNLOAD_URL_INDEX_TTL_SECONDS", DOWNLOAD_URL_INDEX_TTL_SECONDS_DEFAULT)),
+    max_entries=4096,
+)
+
+
+class DownloadTooLargeError(Exception):
+    """O documento excede o tamanho máximo de download (DOWNLOAD_MAX_MB)."""
+
+
+def _is_url(path: str) -> bool:
+    return path.startswith("http://") or path.startswith("https://")
+
 class LlamaParseDirectToolSchema(BaseModel):
     """Input schema for LlamaParseDirectTool (Pydantic V2)."""
     document_url: Optional[str] = Field(
@@ -75,11 +104,11 @@ class LlamaParseDirectTool(BaseTool):
     )
     args_schema: Type[BaseModel] = LlamaParseDirectToolSchema
     api_key: Optional[str] = None
-    _sync_parser: Optional[LlamaParse] = None # Para cache da instância síncrona
+    _sync_parser: Optional[Any] = None # Para cache da instância síncrona (LlamaParse)
 
     def __init__(self, llama_cloud_api_key: Optional[str] = None, **kwargs: Any):
         super().__init__(**kwargs)
-        resolved_api_key = llama_cloud_api_key or LLAMA_CLOUD_API_KEY
+        resolved_api_key = llama_cloud_api_key or os.getenv("LLAMA_CLOUD_API_KEY") or LLAMA_CLOUD_API_KEY
         if not resolved_api_key:
             logger.error("LLAMA_CLOUD_API_KEY não foi encontrada nas variáveis de ambiente nem fornecida diretamente.")
             raise ValueError("LLAMA_CLOUD_API_KEY não configurada para LlamaParseDirectTool.")
@@ -88,55 +117,198 @@ class LlamaParseDirectTool(BaseTool):
         # Removida a inicialização do self.client = llamacloud.LlamaCloud(...)
         # A instância de LlamaParse (de llama_parse) será criada sob demanda.
 
-    async def _download_file_if_url(self, file_path_or_url: str) -> str:
-        """Downloads a file from a URL to a temporary local path if it's a URL."""
-        # A lógica parece correta, mantida como está (com pequena correção de nome de var)
-        if file_path_or_url.startswith("http://") or file_path_or_url.startswith("https://"):
+    @staticmethod
+    def _download_to_tempfile(url: str, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """
+        Baixa `url` em streaming para um arquivo temporário, em blocos de DOWNLOAD_CHUNK_SIZE,
+        usando o cliente HTTP compartilhado (keep-alive/HTTP2). O SHA-256 é calculado durante
+        a escrita. Retorna (caminho_temporário, sha256). Levanta exceção em caso de falha
+        (o arquivo parcial é removido) ou se o tamanho exceder DOWNLOAD_MAX_MB.
+        Com `timeout`, o download inteiro (não só cada leitura) é limitado a esse tempo e
+        interrompido assim que o prazo do caso for cancelado.
+        """
+        max_bytes = int(float(os.getenv("DOWNLOAD_MAX_MB", DOWNLOAD_MAX_MB_DEFAULT)) * 1024 * 1024)
+        possible_extension = ""
+        if '.' in url.split('?')[0].split('/')[-1]:
+            possible_extension = "." + url.split('?')[0].split('/')[-1].split('.')[-1]
+
+        digest = hashlib.sha256()
+        total_bytes = 0
+        expires_at = time.monotonic() + timeout if timeout is not None else None
+        request_timeout = {"timeout": timeout} if timeout is not None else {}
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=possible_extension, mode='wb') # mode='wb' para binário
+        with span("http_download") as download_span:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(file_path_or_url)
+                with temp_file, get_http_client().stream("GET", url, **request_timeout) as response:
                     response.raise_for_status()
-                
-                possible_extension = ""
-                if '.' in file_path_or_url.split('/')[-1]:
-                    possible_extension = "." + file_path_or_url.split('/')[-1].split('.')[-1]
-
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=possible_extension, mode='wb') # mode='wb' para binário
-                temp_file.write(response.content)
-                temp_file.close()
-                logger.info(f"Arquivo baixado de {file_path_or_url} para {temp_file.name}")
-                return temp_file.name
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Erro HTTP {e.response.status_code} ao baixar {file_path_or_url}: {e.response.text}")
-                return f"Error downloading file: HTTP error {e.response.status_code}"
-            except httpx.RequestError as e:
-                logger.error(f"Erro de requisição ao baixar {file_path_or_url}: {e}")
-                return f"Error downloading file: Request failed {e}"
-            except Exception as e:
-                logger.error(f"Erro inesperado ao baixar {file_path_or_url}: {e}")
-                return f"An unexpected error occurred while downloading the file: {e}"
-        return file_path_or_url
-
-    def _get_parser_instance(self, preset: ParsingPreset, language: str, result_as_markdown: bool) -> LlamaParse:
-        """Configura e retorna uma instância do LlamaParse parser."""
+                    declared_size = int(response.headers.get("content-length") or 0)
+                    if declared_size > max_bytes:
+                        raise DownloadTooLargeError(f"{declared_size} bytes (máximo {max_bytes})")
+                    for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        total_bytes += len(chunk)
+                        if total_bytes > max_bytes:
+                            raise DownloadTooLargeError(f"mais de {max_bytes} bytes")
+                        if is_cancelled() or (expires_at is not None and time.monotonic() > expires_at):
+                            raise TimeoutError(f"download interrompido após {timeout:.0f}s" if timeout else "prazo do caso cancelado")
+                        digest.update(chunk)
+                        temp_file.write(chunk)
+                download_span.set(bytes_in=total_bytes)
+            except BaseException:
+                try:
+                    os.remove(temp_file.name)
+                except OSError as e_rm_fail:
+                    logger.warning(f"Falha ao remover arquivo temporário após erro de download: {temp_file.name}, erro: {e_rm_fail}")
+                raise
+
+        content_digest = digest.hexdigest()
+        _url_digest_index.set(url, content_digest)
+        logger.info(f"Arquivo baixado de {url} para {temp_file.name} ({total_bytes} bytes)")
+        return temp_file.name, content_digest
+
+    @staticmethod
+    def _download_error_message(url: str, error: Exception) -> str:
+        """Registra o erro de download e monta a mensagem devolvida ao agente."""
+        if isinstance(error, httpx.HTTPStatusError):
+            logger.error(f"Erro HTTP {error.response.status_code} ao baixar {url}")
+            return f"Error downloading file: HTTP error {error.response.status_code}"
+        if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+            record_overrun("llama_parse")
+            logger.error(f"Tempo esgotado ao baixar {url}: {error}")
+            return f"Error downloading file: time budget exceeded ({error})"
+        if isinstance(error, DownloadTooLargeError):
+            logger.error(f"Documento {url} excede o tamanho máximo de download: {error}")
+            return f"Error downloading file: file too large ({error})"
+        if isinstance(error, httpx.RequestError):
+            logger.error(f"Erro de requisição ao baixar {url}: {error}")
+            return f"Error downloading file: Request failed {error}"
+        logger.error(f"Erro inesperado ao baixar {url}: {error}")
+        return f"Error downloading file: unexpected error {error}"
+
+    @staticmethod
+    def _normalize_language(language: str) -> str:
+        # Corrigir o código de idioma se for passado 'por'
+        return "pt" if language.lower() == "por" else language
+
+    def _lookup_parse_cache(
+        self,
+        local_file_path: Optional[str],
+        content_digest: Optional[str],
+        parsing_preset: ParsingPreset,
+        parsing_instructions: Optional[str],
+        language: str,
+        result_as_markdown: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Consulta o cache de parseamento (endereçado pelo SHA-256 do conteúdo do arquivo + opções).
+        Se `content_digest` não for informado (arquivo local), ele é calculado a partir do arquivo.
+        Retorna (chave_do_cache, texto_em_cache). O texto é None em caso de miss;
+        a chave é None se o cache estiver desabilitado ou indisponível.
+        """
+        cache = get_parse_cache()
+        if cache is None:
+            return None, None
+        if content_digest is None:
+            try:
+                content_digest = file_sha256(local_file_path)
+            except OSError as e:
+                logger.warning(f"Não foi possível calcular o hash de {local_file_path} para o cache: {e}")
+                return None, None
+        cache_key = parse_cache_key(
+            content_digest, parsing_preset, self._normalize_language(language), result_as_markdown, parsing_instructions
+        )
+        cached_text = cache.get(cache_key)
+        annotate(cache_hit=cached_text is not None)
+        if cached_text is not None:
+            logger.info(f"Cache de parseamento HIT para {local_file_path} (sha256={content_digest[:12]}...).")
+        else:
+            logger.info(f"Cache de parseamento MISS para {local_file_path} (sha256={content_digest[:12]}...).")
+        return cache_key, cached_text
+
+    def _cached_text_for_url(
+        self,
+        url: str,
+        parsing_preset: ParsingPreset,
+        parsing_instructions: Optional[str],
+        language: str,
+        result_as_markdown: bool
+    ) -> Optional[str]:
+        """
+        Se o conteúdo desta URL já foi baixado recentemente e seu parseamento está no cache,
+        retorna o texto sem baixar o arquivo de novo.
+        """
+        content_digest = _url_digest_index.get(url)
+        if content_digest is None:
+            return None
+        _, cached_text = self._lookup_parse_cache(
+            url, content_digest, parsing_preset, parsing_instructions, language, result_as_markdown
+        )
+        return cached_text
+
+    @staticmethod
+    def _store_parse_cache(cache_key: Optional[str], full_text: str) -> None:
+        """Grava o resultado no cache de parseamento (somente resultados com conteúdo)."""
+        cache = get_parse_cache()
+        if cache is None or not cache_key or not full_text:
+            return
+        cache.set(cache_key, full_text)
+
+    @staticmethod
+    def _call_timeout() -> Tuple[Optional[float], Optional[str]]:
+        """
+        Orçamento desta chamada (download + parseamento), limitado ao prazo do caso ativo.
+        Retorna (timeout, None) ou (None, mensagem_de_erro) se o caso já não tem tempo.
+        """
+        try:
+            return tool_timeout("llama_parse"), None
+        except BudgetExceeded as e:
+            return None, f"Error: {e}"
+
+    @staticmethod
+    def _remaining(call_timeout: Optional[float], started_at: float) -> Optional[float]:
+        """Parte do orçamento da chamada que sobrou para o parseamento, após o download."""
+        if call_timeout is None:
+            return None
+        return max(1.0, call_timeout - (time.monotonic() - started_at))
+
+    @staticmethod
+    def _timeout_message(path: str, timeout: Optional[float]) -> str:
+        record_overrun("llama_parse")
+        logger.error(f"Parseamento de {path} excedeu o orçamento de tempo ({timeout:.0f}s).")
+        return f"Error: LlamaParse processing exceeded the time budget ({timeout:.0f}s)."
+
+    def _get_parser_instance(
+        self, preset: ParsingPreset, language: str, result_as_markdown: bool, timeout: Optional[float] = None,
+        parsing_instructions: Optional[str] = None
+    ) -> "LlamaParse":
+        """
+        Configura e retorna uma instância do LlamaParse parser.
+        `timeout` limita a espera pelo job (max_timeout do LlamaParse); `parsing_instructions`
+        é enviado como parsing_instruction (também faz parte da chave do cache de parseamento).
+        """
+        from llama_parse import LlamaParse
+
         api_key_to_use = self.api_key or LLAMA_CLOUD_API_KEY
         if not api_key_to_use:
             logger.error("LlamaCloud API Key não fornecida nem como argumento nem como variável de ambiente.")
 
-        # Corrigir o código de idioma se for passado 'por'
-        actual_language = "pt" if language.lower() == "por" else language
+        actual_language = self._normalize_language(language)
 
         # Usar strings diretamente para o modo, conforme a documentação de LlamaParse
         # sugere que "simple" ou "detailed" como strings são aceitáveis.
         mode_to_use_str = "detailed" if preset == "detailed" else "simple"
 
+        timeout_options = {"max_timeout": max(1, int(timeout))} if timeout is not None else {}
+        instruction_options = {"parsing_instruction": parsing_instructions} if parsing_instructions else {}
         return LlamaParse(
             api_key=api_key_to_use,
             result_type="markdown" if result_as_markdown else "text",
             language=actual_language,
-            mode=mode_to_use_str # Usando o string diretamente
+            mode=mode_to_use_str, # Usando o string diretamente
+            **timeout_options,
+            **instruction_options
         )
 
+    @traced("llamaparse_document")
     async def _arun_internal(
         self, 
         file_path_or_url: str, 
@@ -149,15 +321,49 @@ class LlamaParseDirectTool(BaseTool):
         if not self.api_key:
             return "Error: Llama Cloud API key not configured."
 
-        actual_file_path = await self._download_file_if_url(file_path_or_url)
-        if actual_file_path.startswith("Error:"): 
-            return actual_file_path 
+        call_timeout, budget_error = self._call_timeout()
+        if budget_error:
+            return budget_error
+        started_at = time.monotonic()
+
+        actual_file_path = file_path_or_url
+        content_digest: Optional[str] = None
+        temp_file_path_for_cleanup: Optional[str] = None
+        if _is_url(file_path_or_url):
+            cached_text = self._cached_text_for_url(
+                file_path_or_url, parsing_preset, parsing_instructions, language, result_as_markdown
+            )
+            if cached_text is not None:
+                return cached_text
+            try:
+                # O download em streaming é síncrono sobre o cliente compartilhado; roda em thread.
+                actual_file_path, content_digest = await asyncio.to_thread(
+                    self._download_to_tempfile, file_path_or_url, call_timeout
+                )
+                temp_file_path_for_cleanup = actual_file_path
+            except Exception as e_dl:
+                return self._download_error_message(file_path_or_url, e_dl)
 
         try:
+            cache_key, cached_text = self._lookup_parse_cache(
+                actual_file_path, content_digest, parsing_preset, parsing_instructions, language, result_as_markdown
+            )
+            if cached_text is not None:
+                return cached_text
+
             logger.info(f"Parseando documento: {actual_file_path} com preset={parsing_preset}, lang={language}")
-            parser = self._get_parser_instance(parsing_preset, language, result_as_markdown)
+            parse_timeout = self._remaining(call_timeout, started_at)
+            parser = self._get_parser_instance(
+                parsing_preset, language, result_as_markdown, parse_timeout, parsing_instructions
+            )
 
-            documents: List[Document] = await parser.aload_data(actual_file_path)
+            try:
+                # wait_for cancela o job em andamento (polling e requisições) ao fim do orçamento.
+                with span("llamaparse_job") as job_span:
+                    documents: List["Document"] = await asyncio.wait_for(parser.aload_data(actual_file_path), parse_timeout)
+                    job_span.set(pages=len(documents or []), bytes_out=os.path.getsize(actual_file_path))
+            except asyncio.TimeoutError:
+                return self._timeout_message(actual_file_path, call_timeout)
             
             if not documents:
                 logger.warning(f"LlamaParse não retornou documentos para {actual_file_path}.")
@@ -165,6 +371,7 @@ class LlamaParseDirectTool(BaseTool):
             
             full_text = "\n\n---\n\n".join([doc.text for doc in documents if doc.text])
             logger.info(f"Parseamento de {actual_file_path} concluído. Tamanho do texto: {len(full_text)}")
+            self._store_parse_cache(cache_key, full_text)
             return full_text if full_text else "LlamaParse returned document(s) with no textual content."
 
         except FileNotFoundError:
@@ -176,13 +383,14 @@ class LlamaParseDirectTool(BaseTool):
                 return f"Error during LlamaParse processing: {e.response.text} (Details: {str(e)})"
             return f"An unexpected error occurred during LlamaParse processing: {str(e)}"
         finally:
-            if (file_path_or_url.startswith("http://") or file_path_or_url.startswith("https://")) and os.path.exists(actual_file_path) and tempfile.gettempdir() in os.path.abspath(actual_file_path):
+            if temp_file_path_for_cleanup and os.path.exists(temp_file_path_for_cleanup):
                 try:
-                    os.remove(actual_file_path)
-                    logger.info(f"Arquivo temporário {actual_file_path} removido.")
+                    os.remove(temp_file_path_for_cleanup)
+                    logger.info(f"Arquivo temporário {temp_file_path_for_cleanup} removido.")
                 except Exception as e_rm:
-                    logger.warning(f"Não foi possível remover o arquivo temporário {actual_file_path}: {e_rm}")
+                    logger.warning(f"Não foi possível remover o arquivo temporário {temp_file_path_for_cleanup}: {e_rm}")
 
+    @traced("llamaparse_document")
     def _run(
         self, 
         document_url: Optional[str] = None,
@@ -203,48 +411,54 @@ class LlamaParseDirectTool(BaseTool):
              return "Error: Document source path is None after check, unexpected error."
 
         logger.info(f"Iniciando parseamento síncrono para: {source_path}")
+
+        call_timeout, budget_error = self._call_timeout()
+        if budget_error:
+            return budget_error
+        started_at = time.monotonic()
         
         actual_file_to_parse = source_path
+        content_digest: Optional[str] = None
         temp_file_path_for_cleanup: Optional[str] = None
 
-        if source_path.startswith("http://") or source_path.startswith("https://"):
+        if _is_url(source_path):
+            cached_text = self._cached_text_for_url(
+                source_path, parsing_preset, parsing_instructions, language, result_as_markdown
+            )
+            if cached_text is not None:
+                return cached_text
             logger.info(f"Baixando arquivo para execução síncrona: {source_path}")
-            temp_file_obj = None
             try:
-                with httpx.Client() as client: # Cliente síncrono
-                    response = client.get(source_path)
-                    response.raise_for_status()
-                
-                possible_extension = ""
-                if '.' in source_path.split('/')[-1]:
-                    possible_extension = "." + source_path.split('/')[-1].split('.')[-1]
-                
-                # Usar with para garantir o fechamento do arquivo temporário
-                temp_file_obj = tempfile.NamedTemporaryFile(delete=False, suffix=possible_extension, mode='wb')
-                temp_file_obj.write(response.content)
-                actual_file_to_parse = temp_file_obj.name
+                actual_file_to_parse, content_digest = self._download_to_tempfile(source_path, call_timeout)
                 temp_file_path_for_cleanup = actual_file_to_parse # Guardar para limpeza
-                temp_file_obj.close() # Fechar o arquivo para que LlamaParse possa abri-lo
-                logger.info(f"Arquivo baixado para {actual_file_to_parse}")
             except Exception as e_dl_sync:
-                logger.error(f"Erro ao baixar {source_path} sincronicamente: {e_dl_sync}")
-                if temp_file_obj and os.path.exists(temp_file_obj.name):
-                    try:
-                        os.remove(temp_file_obj.name)
-                    except Exception as e_rm_fail: 
-                        logger.warning(f"Falha ao remover arquivo temporário após erro de download: {temp_file_obj.name}, erro: {e_rm_fail}")
-                return f"Error downloading file synchronously: {e_dl_sync}"
+                return self._download_error_message(source_path, e_dl_sync)
         
         try:
-            parser = self._get_parser_instance(parsing_preset, language, result_as_markdown)
+            cache_key, cached_text = self._lookup_parse_cache(
+                actual_file_to_parse, content_digest, parsing_preset, parsing_instructions, language, result_as_markdown
+            )
+            if cached_text is not None:
+                return cached_text
+
+            parse_timeout = self._remaining(call_timeout, started_at)
+            parser = self._get_parser_instance(
+                parsing_preset, language, result_as_markdown, parse_timeout, parsing_instructions
+            )
             
-            documents: List[Document] = parser.load_data(actual_file_to_parse) 
+            with span("llamaparse_job") as job_span:
+                documents: List["Document"] = parser.load_data(actual_file_to_parse)
+                job_span.set(pages=len(documents or []), bytes_out=os.path.getsize(actual_file_to_parse))
+            if call_timeout is not None and not documents and time.monotonic() - started_at >= call_timeout:
+                # Com ignore_errors (padrão), o LlamaParse devolve lista vazia ao atingir max_timeout.
+                return self._timeout_message(actual_file_to_parse, call_timeout)
             if not documents:
                 logger.warning(f"LlamaParse não retornou documentos para {actual_file_to_parse} (sync).")
                 return "LlamaParse did not return any documents (sync)."
             
             full_text = "\n\n---\n\n".join([doc.text for doc in documents if doc.text])
             logger.info(f"Parseamento de {actual_file_to_parse} (sync) concluído. Tamanho do texto: {len(full_text)}")
+            self._store_parse_cache(cache_key, full_text)
             return full_text if full_text else "LlamaParse returned document(s) with no textual content (sync)."
 
         except FileNotFoundError:
@@ -0,0 +1,373 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .cache import cache_base_dir, env_flag
+from .embeddings import get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Diretório com exportações locais da KB (arquivos .txt/.md), por padrão a pasta knowledge/ do projeto.
+KNOWLEDGE_DIR_DEFAULT = Path(__file__).resolve().parent.parent.parent.parent / "knowledge"
+KB_LOCAL_REFRESH_SECONDS_DEFAULT = 300
+KB_LOCAL_SYNC_COLUMN_DEFAULT = "created_at"
+# Intervalo da reconciliação completa com o Supabase (ids + conteúdo, sem embeddings), que remove
+# linhas apagadas e re-sincroniza as alteradas; a marca d'água só enxerga linhas novas.
+KB_LOCAL_RECONCILE_SECONDS_DEFAULT = 3600
+LOCAL_CHUNK_MAX_CHARS = 1000
+SUPABASE_PAGE_SIZE = 500
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas (norma L2 = 1) para que o produto interno seja a similaridade de cosseno."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _parse_embedding(value: Any) -> Optional[np.ndarray]:
+    """Converte a coluna pgvector (string '[0.1,...]' via PostgREST, ou lista) em vetor float32."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _row_digest(content: Any, metadata: Any) -> str:
+    """Impressão digital de uma linha da KB (conteúdo + metadados) para detectar alterações."""
+    return hashlib.sha256(json.dumps([content, metadata], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _chunk_text(text: str, max_chars: int = LOCAL_CHUNK_MAX_CHARS) -> List[str]:
+    """Divide um texto em chunks por parágrafo, agrupando parágrafos curtos até max_chars."""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LocalVectorIndex:
+    """
+    Índice vetorial em processo para a Knowledge Base.
+    Os embeddings ficam em uma matriz float32 normalizada gravada em disco (embeddings.npy)
+    e aberta com memory-map; os textos/metadados ficam em chunks.jsonl. As consultas top-k
+    por cosseno são um único produto matriz-vetor.
+    Fontes: linhas de knowledge_base_chunks (sincronização incremental pelo Supabase, com
+    reconciliação periódica) e arquivos locais (.txt/.md) como os de knowledge/.
+    Matriz e chunks são publicados juntos, numa única tupla (`_data`), para que uma consulta
+    concorrente com uma atualização nunca combine a matriz nova com os chunks antigos.
+    O nome do modelo de embedding fica no state.json; se mudar, o índice é reconstruído.
+    """
+
+    def __init__(self, index_dir: Path, embedding_model_name: str):
+        self.index_dir = Path(index_dir)
+        self.embedding_model_name = embedding_model_name
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._matrix_path = self.index_dir / "embeddings.npy"
+        self._chunks_path = self.index_dir / "chunks.jsonl"
+        self._state_path = self.index_dir / "state.json"
+        self._lock = threading.Lock()
+        self._data: Tuple[Optional[np.ndarray], List[Dict[str, Any]]] = (None, [])
+        self._state: Dict[str, Any] = self._empty_state()
+        self._load()
+
+    # --- Persistência ---
+
+    def _empty_state(self) -> Dict[str, Any]:
+        return {"embedding_model": self.embedding_model_name, "watermark": None, "sources": {},
+                "last_refresh": 0.0, "last_reconcile": 0.0}
+
+    def _load(self) -> None:
+        if self._state_path.exists():
+            self._state.update(json.loads(self._state_path.read_text(encoding="utf-8")))
+        if self._state.get("embedding_model") != self.embedding_model_name:
+            if self._matrix_path.exists():
+                logger.warning(
+                    f"Índice vetorial local criado com o modelo '{self._state.get('embedding_model')}'; "
+                    f"será reconstruído para '{self.embedding_model_name}'."
+                )
+            self._state = self._empty_state()
+            return
+        if self._matrix_path.exists() and self._chunks_path.exists():
+            matrix = np.load(self._matrix_path, mmap_mode="r")
+            with open(self._chunks_path, "r", encoding="utf-8") as f:
+                chunks = [json.loads(line) for line in f if line.strip()]
+            if len(chunks) != matrix.shape[0]:
+                logger.warning("Índice vetorial local inconsistente (chunks x embeddings); será reconstruído.")
+                self._state = self._empty_state()
+                return
+            self._data = (matrix, chunks)
+
+    def _save(self, matrix: np.ndarray, chunks: List[Dict[str, Any]]) -> None:
+        """Grava atomicamente matriz, chunks e estado, e reabre a matriz com memory-map."""
+        tmp_matrix = self.index_dir / "embeddings.tmp.npy"
+        np.save(tmp_matrix, matrix.astype(np.float32))
+        tmp_chunks = self.index_dir / "chunks.jsonl.tmp"
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_matrix, self._matrix_path)
+        os.replace(tmp_chunks, self._chunks_path)
+        self._save_state()
+        self._data = (np.load(self._matrix_path, mmap_mode="r"), chunks)
+
+    def _save_state(self) -> None:
+        self._state_path.write_text(json.dumps(self._state, default=str), encoding="utf-8")
+
+    def _upsert(self, new_chunks: List[Dict[str, Any]], new_vectors: Optional[np.ndarray],
+                replace_source: Optional[str] = None, drop: Optional[Callable[[Dict[str, Any]], bool]] = None) -> None:
+        """
+        Substitui chunks com o mesmo id (ou todos os de `replace_source`), remove os chunks para
+        os quais `drop` retornar True e acrescenta os novos.
+        """
+        matrix, chunks = self._data
+        new_ids = {c["id"] for c in new_chunks}
+        keep = [
+            i for i, c in enumerate(chunks)
+            if c["id"] not in new_ids and (replace_source is None or c.get("source") != replace_source)
+            and not (drop and drop(c))
+        ]
+        if len(keep) == len(chunks) and not new_chunks:
+            return
+        parts = []
+        if matrix is not None:
+            parts.append(np.asarray(matrix[keep]))
+        if new_chunks:
+            parts.append(_normalize_rows(new_vectors))
+        if not parts:
+            return
+        self._save(np.vstack(parts) if len(parts) > 1 else parts[0], [chunks[i] for i in keep] + new_chunks)
+
+    # --- Fontes ---
+
+    def import_directory(self, directory: Path) -> int:
+        """
+        Indexa arquivos .txt/.md de um diretório; só re-embeda arquivos cujo conteúdo mudou e
+        remove do índice os chunks de arquivos apagados (ou que ficaram vazios).
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            return 0
+        added = 0
+        removed: Set[str] = set()
+        with self._lock:
+            seen: Set[str] = set()
+            for path in sorted(directory.rglob("*")):
+                if path.suffix.lower() not in (".txt", ".md") or not path.is_file():
+                    continue
+                text = path.read_text(encoding="utf-8", errors="replace")
+                source = f"file:{path.relative_to(directory)}"
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                chunks = _chunk_text(text)
+                if chunks:
+                    seen.add(source)
+                if self._state["sources"].get(source) == digest or not chunks:
+                    continue
+                model = get_embedding_model(self.embedding_model_name)
+                vectors = np.asarray(model.encode(chunks, convert_to_numpy=True, show_progress_bar=False), dtype=np.float32)
+                records = [
+                    {"id": f"{source}#{i}", "content": chunk, "metadata": {"source": str(path.name)}, "source": source}
+                    for i, chunk in enumerate(chunks)
+                ]
+                self._state["sources"][source] = digest
+                self._upsert(records, vectors, replace_source=source)
+                added += len(records)
+            removed = {source for source in self._state["sources"] if source.startswith("file:") and source not in seen}
+            if removed:
+                for source in removed:
+                    del self._state["sources"][source]
+                self._upsert([], None, drop=lambda c: c.get("source") in removed)
+                self._save_state()
+        if added or removed:
+            logger.info(
+                f"Índice vetorial local: {added} chunks indexados e {len(removed)} arquivos removidos a partir de {directory}."
+            )
+        return added + len(removed)
+
+    def refresh_from_supabase(self, client, table_name: str, sync_column: str = KB_LOCAL_SYNC_COLUMN_DEFAULT) -> int:
+        """
+        Sincronização incremental: busca apenas as linhas de `table_name` com `sync_column`
+        maior que a última marca d'água e as insere/atualiza no índice. A cada
+        KB_LOCAL_RECONCILE_SECONDS também reconcilia o índice com a tabela (_reconcile_supabase).
+        """
+        with self._lock:
+            watermark = self._state.get("watermark")
+            records: List[Dict[str, Any]] = []
+            vectors: List[np.ndarray] = []
+            new_watermark = watermark
+            offset = 0
+            while True:
+                query = client.table(table_name).select(f"id, content, metadata, embedding, {sync_column}")
+                if watermark:
+                    query = query.gt(sync_column, watermark)
+                response = query.order(sync_column).order("id").range(offset, offset + SUPABASE_PAGE_SIZE - 1).execute()
+                rows = response.data or []
+                for row in rows:
+                    vector = _parse_embedding(row.get("embedding"))
+                    if vector is None:
+                        continue
+                    records.append({
+                        "id": str(row.get("id")),
+                        "content": row.get("content"),
+                        "metadata": row.get("metadata"),
+                        "source": "supabase",
+                    })
+                    vectors.append(vector)
+                    new_watermark = row.get(sync_column) or new_watermark
+                if len(rows) < SUPABASE_PAGE_SIZE:
+                    break
+                offset += SUPABASE_PAGE_SIZE
+
+            if not watermark:
+                # Sincronização completa: a reconciliação só é necessária a partir daqui.
+                self._state["last_reconcile"] = time.time()
+            if records:
+                self._state["watermark"] = new_watermark
+                self._upsert(records, np.vstack(vectors))
+        if records:
+            logger.info(f"Índice vetorial local: {len(records)} chunks sincronizados de '{table_name}'.")
+        reconciled = 0
+        reconcile_seconds = float(os.getenv("KB_LOCAL_RECONCILE_SECONDS", KB_LOCAL_RECONCILE_SECONDS_DEFAULT))
+        if time.time() - float(self._state.get("last_reconcile") or 0.0) >= reconcile_seconds:
+            reconciled = self._reconcile_supabase(client, table_name)
+        return len(records) + reconciled
+
+    def _reconcile_supabase(self, client, table_name: str) -> int:
+        """
+        Compara ids e conteúdo/metadados (sem embeddings) de todas as linhas de `table_name` com
+        os chunks "supabase" do índice: remove os apagados e busca de novo, com embedding, os
+        alterados e os ausentes. Retorna o número de chunks alterados.
+        """
+        remote: Dict[str, str] = {}
+        offset = 0
+        while True:
+            response = (client.table(table_name).select("id, content, metadata")
+                        .order("id").range(offset, offset + SUPABASE_PAGE_SIZE - 1).execute())
+            rows = response.data or []
+            for row in rows:
+                remote[str(row.get("id"))] = _row_digest(row.get("content"), row.get("metadata"))
+            if len(rows) < SUPABASE_PAGE_SIZE:
+                break
+            offset += SUPABASE_PAGE_SIZE
+
+        with self._lock:
+            local = {
+                c["id"]: _row_digest(c.get("content"), c.get("metadata"))
+                for c in self._data[1] if c.get("source") == "supabase"
+            }
+            deleted = set(local) - set(remote)
+            stale = [row_id for row_id, digest in remote.items() if local.get(row_id) != digest]
+            records: List[Dict[str, Any]] = []
+            vectors: List[np.ndarray] = []
+            for start in range(0, len(stale), SUPABASE_PAGE_SIZE):
+                response = (client.table(table_name).select("id, content, metadata, embedding")
+                            .in_("id", stale[start:start + SUPABASE_PAGE_SIZE]).execute())
+                for row in response.data or []:
+                    vector = _parse_embedding(row.get("embedding"))
+                    if vector is None:
+                        continue
+                    records.append({
+                        "id": str(row.get("id")),
+                        "content": row.get("content"),
+                        "metadata": row.get("metadata"),
+                        "source": "supabase",
+                    })
+                    vectors.append(vector)
+            self._upsert(records, np.vstack(vectors) if vectors else None,
+                         drop=lambda c: c.get("source") == "supabase" and c["id"] in deleted)
+            self._state["last_reconcile"] = time.time()
+            self._save_state()
+        if deleted or records:
+            logger.info(
+                f"Índice vetorial local: reconciliação com '{table_name}' removeu {len(deleted)} "
+                f"e atualizou {len(records)} chunks."
+            )
+        return len(deleted) + len(records)
+
+    def seconds_since_refresh(self) -> float:
+        return time.time() - float(self._state.get("last_refresh") or 0.0)
+
+    def refresh_if_stale(self, supabase_client=None, table_name: Optional[str] = None) -> int:
+        """
+        Atualiza o índice de forma incremental se a última atualização tiver mais de
+        KB_LOCAL_REFRESH_SECONDS: arquivos de KB_LOCAL_SOURCE_DIR (padrão knowledge/) e,
+        se houver cliente e KB_LOCAL_SYNC_FROM_SUPABASE estiver habilitado, a tabela da KB
+        (coluna de sincronização KB_LOCAL_SYNC_COLUMN). Retorna o número de chunks alterados.
+        """
+        refresh_seconds = float(os.getenv("KB_LOCAL_REFRESH_SECONDS", KB_LOCAL_REFRESH_SECONDS_DEFAULT))
+        if self.seconds_since_refresh() < refresh_seconds:
+            return 0
+        changed = self.import_directory(Path(os.getenv("KB_LOCAL_SOURCE_DIR", str(KNOWLEDGE_DIR_DEFAULT))))
+        if supabase_client is not None and table_name and env_flag("KB_LOCAL_SYNC_FROM_SUPABASE", True):
+            try:
+                changed += self.refresh_from_supabase(
+                    supabase_client, table_name, os.getenv("KB_LOCAL_SYNC_COLUMN", KB_LOCAL_SYNC_COLUMN_DEFAULT)
+                )
+            except Exception as e:
+                logger.warning(f"Falha na sincronização incremental do índice vetorial local: {e}")
+        with self._lock:
+            self._state["last_refresh"] = time.time()
+        return changed
+
+    # --- Consulta ---
+
+    def __len__(self) -> int:
+        return len(self._data[1])
+
+    def search(self, query_embedding: np.ndarray, top_k: int, match_threshold: float) -> List[Dict[str, Any]]:
+        """Top-k por similaridade de cosseno; mesmo formato das linhas retornadas pela RPC match_kb_chunks."""
+        matrix, chunks = self._data # Leitura única: matriz e chunks sempre da mesma versão
+        if matrix is None or not chunks or top_k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        similarities = matrix @ (query / norm)
+        k = min(top_k, similarities.shape[0])
+        candidates = np.argpartition(-similarities, k - 1)[:k]
+        ranked = candidates[np.argsort(-similarities[candidates])]
+        return [
+            {
+                "id": chunks[i]["id"],
+                "content": chunks[i]["content"],
+                "metadata": chunks[i].get("metadata"),
+                "similarity": float(similarities[i]),
+            }
+            for i in ranked
+            if similarities[i] > match_threshold
+        ]
+
+
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_vector_index(embedding_model_name: str) -> LocalVectorIndex:
+    """
+    Retorna o índice vetorial local do processo (KB_LOCAL_INDEX_DIR, padrão
+    <CADASTRO_CACHE_DIR>/kb_index), carregando-o do disco na primeira chamada (e de novo,
+    reconstruindo-o, se o modelo de embedding mudar).
+    """
+    global _local_index
+    with _local_index_lock:
+        if _local_index is None or _local_index.embedding_model_name != embedding_model_name:
+            index_dir = Path(os.getenv("KB_LOCAL_INDEX_DIR", str(cache_base_dir() / "kb_index")))
+            _local_index = LocalVectorIndex(index_dir, embedding_model_name)
+        return _local_index
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from crewai_tools import SerperDevTool
+
+from ..budgets import BudgetExceeded, record_overrun, tool_timeout
+from ..identifiers import invalid_identifiers_in
+from ..tracing import annotate, span, traced
+from .cache import DiskCache, cache_base_dir, env_flag, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Tipos de consulta, cada um com seu TTL de cache (SERPER_CACHE_TTL_<TIPO>_SECONDS).
+QUERY_KIND_CNPJ = "cnpj"
+QUERY_KIND_CPF = "cpf"
+QUERY_KIND_ADDRESS = "endereco"
+QUERY_KIND_GENERAL = "geral"
+SERPER_CACHE_TTL_SECONDS_DEFAULT = {
+    QUERY_KIND_CNPJ: 7 * 24 * 3600,
+    QUERY_KIND_CPF: 7 * 24 * 3600,
+    QUERY_KIND_ADDRESS: 30 * 24 * 3600,
+    QUERY_KIND_GENERAL: 24 * 3600,
+}
+SERPER_CACHE_MAX_MB_DEFAULT = 64
+# Limite de requisições compartilhado por todos os casos do processo (token bucket).
+SERPER_RATE_PER_SECOND_DEFAULT = 5.0
+SERPER_BURST_DEFAULT = 5
+# Tempo máximo de espera (fila do rate limit ou consulta idêntica em andamento) sem prazo de caso ativo.
+SERPER_WAIT_SECONDS_DEFAULT = 30.0
+
+_CNPJ_RE = re.compile(r"\bCNPJ\b|[0-9A-Z]{2}\.?[0-9A-Z]{3}\.?[0-9A-Z]{3}/?[0-9A-Z]{4}-?\d{2}\b", re.IGNORECASE)
+_CPF_RE = re.compile(r"\bCPF\b|\b\d{3}\.?\d{3}\.?\d{3}-?\d{2}\b", re.IGNORECASE)
+_ADDRESS_RE = re.compile(r"\b(rua|r\.|avenida|av\.|alameda|travessa|rodovia|estrada|pra[çc]a|cep|endere[çc]o)\b", re.IGNORECASE)
+
+
+def classify_query(query: str) -> str:
+    """Tipo da consulta para o TTL do cache: CNPJ, CPF, endereço ou geral (nessa precedência)."""
+    if _CNPJ_RE.search(query):
+        return QUERY_KIND_CNPJ
+    if _CPF_RE.search(query):
+        return QUERY_KIND_CPF
+    if _ADDRESS_RE.search(query):
+        return QUERY_KIND_ADDRESS
+    return QUERY_KIND_GENERAL
+
+
+class TokenBucket:
+    """Rate limiter token bucket seguro para threads: `rate` tokens por segundo, até `capacity` acumulados."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.waited_seconds = 0.0
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Consome um token, esperando até `timeout` segundos. Retorna False se o tempo acabar."""
+        if self.rate <= 0:
+            return True
+        started_at = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.waited_seconds += now - started_at
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if timeout is not None and now - started_at + wait > timeout:
+                return False
+            time.sleep(wait)
+
+
+_caches: Dict[str, DiskCache] = {}
+_caches_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+_rate_limiter: Optional[TokenBucket] = None
+_stats = {"api_calls": 0, "coalesced": 0, "rate_limited": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_serper_cache(kind: str) -> Optional[DiskCache]:
+    """
+    Cache persistente das respostas do Serper para o tipo de consulta `kind`, compartilhado
+    pelo processo. Retorna None se desabilitado via SERPER_CACHE_ENABLED=false.
+    Configuração: SERPER_CACHE_DIR (padrão: <CADASTRO_CACHE_DIR>/serper), SERPER_CACHE_MAX_MB
+    e SERPER_CACHE_TTL_<TIPO>_SECONDS (CNPJ, CPF, ENDERECO, GERAL).
+    """
+    if not env_flag("SERPER_CACHE_ENABLED", True):
+        return None
+    with _caches_lock:
+        cache = _caches.get(kind)
+        if cache is None:
+            directory = Path(os.getenv("SERPER_CACHE_DIR", str(cache_base_dir() / "serper"))) / kind
+            ttl = float(os.getenv(f"SERPER_CACHE_TTL_{kind.upper()}_SECONDS", SERPER_CACHE_TTL_SECONDS_DEFAULT[kind]))
+            max_mb = float(os.getenv("SERPER_CACHE_MAX_MB", SERPER_CACHE_MAX_MB_DEFAULT))
+            try:
+                cache = DiskCache(directory, max_bytes=int(max_mb * 1024 * 1024), ttl_seconds=ttl, suffix=".json")
+            except OSError as e:
+                logger.warning(f"Não foi possível inicializar o cache do Serper em {directory}: {e}")
+                return None
+            _caches[kind] = cache
+    return cache
+
+
+def get_rate_limiter() -> TokenBucket:
+    """Token bucket do processo (SERPER_RATE_PER_SECOND, SERPER_BURST), compartilhado por todos os casos."""
+    global _rate_limiter
+    with _caches_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(
+                float(os.getenv("SERPER_RATE_PER_SECOND", SERPER_RATE_PER_SECOND_DEFAULT)),
+                int(os.getenv("SERPER_BURST", SERPER_BURST_DEFAULT)),
+            )
+    return _rate_limiter
+
+
+class CadastroSerperTool(SerperDevTool):
+    """
+    SerperDevTool com:
+    - bloqueio de buscas que citam CNPJ/CPF inválidos (dígito verificador incorreto ou
+      reprovado na validação local do caso, ver identifiers.py), sem chamar a API;
+    - cache persistente das respostas, com TTL por tipo de consulta (CNPJ, CPF, endereço, geral);
+    - coalescência de consultas idênticas em andamento (uma única requisição, várias esperas);
+    - rate limit (token bucket) compartilhado por todos os casos do processo.
+    SERPER_BASE_URL permite apontar a ferramenta para outro endpoint (ex: um stub local).
+    """
+
+    def __init__(self, **kwargs):
+        if os.getenv("SERPER_BASE_URL") and "base_url" not in kwargs:
+            kwargs["base_url"] = os.getenv("SERPER_BASE_URL").rstrip("/")
+        super().__init__(**kwargs)
+
+    def _cache_key(self, query: str, search_type: str) -> str:
+        normalized_query = " ".join(query.casefold().split())
+        return make_cache_key("serper", self.base_url, search_type, normalized_query, self.n_results,
+                              self.country, self.location, self.locale)
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        with _stats_lock:
+            stats = dict(_stats)
+        stats["rate_limit_wait_seconds"] = round(get_rate_limiter().waited_seconds, 3)
+        stats["cache"] = {kind: cache.stats() for kind, cache in _caches.items()}
+        return stats
+
+    @traced("serper_search")
+    def _run(self, **kwargs: Any) -> Any:
+        search_query = kwargs.get("search_query") or kwargs.get("query") or ""
+        invalid = invalid_identifiers_in(search_query)
+        if invalid:
+            logger.info(f"Busca Serper não realizada: identificador(es) inválido(s) {invalid}.")
+            return (
+                f"ERRO: Busca não realizada. Identificador(es) inválido(s) (formato ou dígito verificador): "
+                f"{', '.join(invalid)}. Registre como inconsistência em vez de pesquisar."
+            )
+        try:
+            wait_timeout = tool_timeout("serper", SERPER_WAIT_SECONDS_DEFAULT)
+        except BudgetExceeded as e:
+            return f"ERRO: {e}"
+
+        search_type = kwargs.get("search_type", self.search_type)
+        key = self._cache_key(search_query, search_type)
+        query_kind = classify_query(search_query)
+        cache = get_serper_cache(query_kind)
+        cached = cache.get(key) if cache is not None else None
+        annotate(query_kind=query_kind, cache_hit=cached is not None)
+        if cached is not None:
+            return json.loads(cached)
+
+        with _inflight_lock:
+            future = _inflight.get(key)
+            owner = future is None
+            if owner:
+                future = _inflight[key] = Future()
+        if not owner:
+            # Consulta idêntica em andamento (outro agente ou caso): aguarda o mesmo resultado.
+            _count("coalesced")
+            annotate(coalesced=True)
+            try:
+                return future.result(timeout=wait_timeout)
+            except FutureTimeoutError:
+                record_overrun("serper")
+                return "ERRO: Tempo esgotado aguardando uma busca idêntica em andamento."
+
+        try:
+            if not get_rate_limiter().acquire(timeout=wait_timeout):
+                _count("rate_limited")
+                record_overrun("serper")
+                result = "ERRO: Limite de requisições ao Serper atingido; tente novamente mais tarde."
+                future.set_result(result)
+                return result
+            _count("api_calls")
+            with span("serper_api") as api_span:
+                result = super()._run(**kwargs)
+                api_span.set(bytes_out=len(search_query.encode("utf-8"))).observe_result(result, transferred=True)
+            if cache is not None:
+                cache.set(key, json.dumps(result, ensure_ascii=False))
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
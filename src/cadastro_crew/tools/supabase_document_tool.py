@@ -1,18 +1,33 @@
 import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Type, Optional
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
-from supabase import create_client, Client as SupabaseClient
+from supabase import Client as SupabaseClient
 from dotenv import load_dotenv
 import logging
 import json # Importar json para serializar o dicionário de retorno
 
+from ..budgets import BudgetExceeded, record_overrun, tool_timeout
+from ..clients import execute_with_timeout, get_supabase_client
+from ..tracing import annotate, span, traced
+from .cache import TTLCache
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY") # Usar la service_role key para acceso directo
 
+# Índice em memória {case_id: {nome_do_documento: linha}}, compartilhado por todas as instâncias
+# da ferramenta (e por todos os agentes). Uma única query por caso substitui uma query por documento.
+DOCUMENT_INDEX_TTL_SECONDS_DEFAULT = 300
+_case_document_index = TTLCache(
+    ttl_seconds=float(os.getenv("DOCUMENT_INDEX_TTL_SECONDS", DOCUMENT_INDEX_TTL_SECONDS_DEFAULT)),
+    max_entries=4096,
+)
+
 class SupabaseDocumentContentSchema(BaseModel):
     """Input schema for SupabaseDocumentContentTool."""
     document_name: str = Field(description="The exact name of the document (e.g., 'checklist.pdf', '1- CNPJ.pdf') to retrieve from the 'documents' table in Supabase.")
@@ -26,32 +41,110 @@ class SupabaseDocumentContentTool(BaseTool):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        # O ambiente é relido na instanciação (ex: benchmark offline apontando para o stub local).
+        supabase_url = os.getenv("SUPABASE_URL") or SUPABASE_URL
+        supabase_key = os.getenv("SUPABASE_SERVICE_KEY") or SUPABASE_SERVICE_KEY
+        if not supabase_url or not supabase_key:
             logger.error("Supabase URL ou Service Key não configurados nas variáveis de ambiente.")
             raise ValueError("Supabase URL or Service Key not configured for SupabaseDocumentContentTool.")
         try:
-            self.supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-            logger.info("Cliente Supabase inicializado para SupabaseDocumentContentTool.")
+            self.supabase_client = get_supabase_client(supabase_url, supabase_key)
+            logger.info("Cliente Supabase (compartilhado) obtido para SupabaseDocumentContentTool.")
         except Exception as e:
             logger.error(f"Falha ao inicializar cliente Supabase para SupabaseDocumentContentTool: {e}")
             self.supabase_client = None # Garantir que está None se falhar
 
-    def _run(self, document_name: str, case_id: str) -> str:
+    @staticmethod
+    def prime_case_index(case_id: str, rows: list) -> dict:
+        """
+        Registra no índice compartilhado as linhas de 'documents' de um caso (com 'name',
+        'document_tag' e 'file_url'), por exemplo as já obtidas por get_documents_for_case.
+        Retorna o mapa {nome: linha} registrado.
+        """
+        index = {row.get("name"): row for row in rows if row.get("name")}
+        _case_document_index.set(case_id, index)
+        return index
+
+    @staticmethod
+    def invalidate_case_index(case_id: Optional[str] = None) -> None:
+        """Descarta o índice de um caso (ou de todos os casos)."""
+        _case_document_index.invalidate(case_id)
+
+    @staticmethod
+    def index_stats() -> dict:
+        return _case_document_index.stats()
+
+    def prefetch_case(self, case_id: str, timeout: Optional[float] = None) -> dict:
+        """
+        Busca em uma única query os metadados de todos os documentos do caso e os guarda no índice.
+        Com `timeout`, levanta concurrent.futures.TimeoutError se a query não responder a tempo.
+        """
         if not self.supabase_client:
-            return "Error: Supabase client not initialized."
-        try:
-            logger.info(f"Recuperando informações para o documento: '{document_name}' com case_id: '{case_id}' da tabela 'documents'.")
-            response = (
+            return {}
+        with span("supabase.select_documents_case") as current:
+            response = execute_with_timeout(
+                self.supabase_client.table("documents")
+                .select("name, document_tag, file_url")
+                .eq("case_id", case_id),
+                timeout,
+            )
+            current.observe_result(response.data or [], transferred=True)
+        index = self.prime_case_index(case_id, response.data or [])
+        logger.info(f"Índice de documentos pré-carregado para case_id '{case_id}': {len(index)} documentos.")
+        return index
+
+    def _lookup_document(self, document_name: str, case_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Procura o documento no índice do caso (pré-carregando-o se necessário); cai para a query individual.
+        `timeout` vale para a busca inteira (pré-carregamento e query individual somados).
+        """
+        started_at = time.monotonic()
+        index = _case_document_index.get(case_id)
+        annotate(cache_hit=index is not None)
+        if index is None:
+            try:
+                index = self.prefetch_case(case_id, timeout)
+            except FutureTimeoutError:
+                raise
+            except Exception as e:
+                logger.warning(f"Falha ao pré-carregar o índice do case_id '{case_id}': {e}")
+                index = {}
+        if document_name in index:
+            return index[document_name]
+
+        # Documento ausente do índice (ex: inserido após o pré-carregamento): consulta individual.
+        if timeout is not None:
+            timeout -= time.monotonic() - started_at
+        with span("supabase.select_document") as current:
+            response = execute_with_timeout(
                 self.supabase_client.table("documents")
                 .select("file_url, name, document_tag")
                 .eq("name", document_name)
                 .eq("case_id", case_id)
-                .limit(1)
-                .execute()
+                .limit(1),
+                timeout,
             )
+            current.observe_result(response.data or [], transferred=True)
+        return response.data[0] if response.data else None
+
+    @traced("supabase_document_lookup")
+    def _run(self, document_name: str, case_id: str) -> str:
+        if not self.supabase_client:
+            return "Error: Supabase client not initialized."
+        try:
+            timeout = tool_timeout("supabase")
+        except BudgetExceeded as e:
+            return f"Error: {e}"
+        try:
+            logger.info(f"Recuperando informações para o documento: '{document_name}' com case_id: '{case_id}' da tabela 'documents'.")
+            try:
+                doc_info = self._lookup_document(document_name, case_id, timeout)
+            except FutureTimeoutError:
+                record_overrun("supabase")
+                logger.warning(f"Tempo esgotado consultando o documento '{document_name}' (case_id: '{case_id}') no Supabase.")
+                return f"Error: Timed out querying Supabase for document '{document_name}' (case_id: '{case_id}')."
             
-            if response.data:
-                doc_info = response.data[0]
+            if doc_info:
                 file_url = doc_info.get("file_url")
                 
                 if file_url:
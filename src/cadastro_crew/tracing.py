@@ -0,0 +1,360 @@
+import os
+import json
+import time
+import uuid
+import inspect
+import functools
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Spans estruturadas por execução do crew (tarefas, etapas, ferramentas e chamadas ao LLM).
+# Ao fim de cada run() as spans são exportadas em TRACE_DIR/<case_id>/ como JSON lines e
+# como um arquivo de métricas no formato texto do Prometheus (TRACING_ENABLED=false desativa).
+TRACE_DIR_DEFAULT = Path(__file__).resolve().parent.parent.parent / "reports" / "traces"
+METRIC_PREFIX = "cadastro"
+
+# Tipos de span.
+KIND_RUN = "run"
+KIND_STAGE = "stage"
+KIND_TASK = "task"
+KIND_TOOL = "tool"
+KIND_LLM = "llm"
+
+# Atributos numéricos somados nas métricas (bytes transferidos e tokens).
+ATTR_BYTES_IN = "bytes_in"
+ATTR_BYTES_OUT = "bytes_out"
+ATTR_PROMPT_TOKENS = "prompt_tokens"
+ATTR_COMPLETION_TOKENS = "completion_tokens"
+# Tamanho do texto devolvido por uma ferramenta ao agente (não somado aos bytes transferidos).
+ATTR_RESULT_BYTES = "result_bytes"
+# Sem contagem de tokens do provedor, estima-se ~4 caracteres por token.
+CHARS_PER_TOKEN_ESTIMATE = 4
+# Prefixos com que as ferramentas do projeto sinalizam falha no texto devolvido ao agente.
+TOOL_ERROR_PREFIXES = ("ERRO", "Error", "An unexpected error", "FALHA")
+
+_current_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("cadastro_tracer", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("cadastro_span", default=None)
+
+
+@dataclass
+class Span:
+    """Uma operação medida: duração, status e atributos (bytes, tokens, cache etc.)."""
+    name: str
+    kind: str
+    case_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: str
+    duration_ms: float = 0.0
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name: str, value: float) -> "Span":
+        self.attributes[name] = self.attributes.get(name, 0) + value
+        return self
+
+    def fail(self, error: Any) -> "Span":
+        self.status = "error"
+        self.attributes["error"] = str(error)[:300]
+        return self
+
+    def observe_result(self, result: Any, transferred: bool = False) -> "Span":
+        """
+        Registra o tamanho do resultado (em bytes_in se ele veio pela rede, senão em result_bytes)
+        e marca a span como erro se o texto começar por um prefixo de falha das ferramentas.
+        """
+        self.add(ATTR_BYTES_IN if transferred else ATTR_RESULT_BYTES, _text_size(result))
+        if isinstance(result, str) and result.startswith(TOOL_ERROR_PREFIXES):
+            self.fail(result)
+        return self
+
+
+class Tracer:
+    """Coleta as spans de uma execução (um caso). Seguro para uso entre threads."""
+
+    def __init__(self, case_id: str):
+        self.case_id = case_id
+        self.run_id = f"{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:6]}"
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def snapshot(self) -> List[Span]:
+        with self._lock:
+            return list(self.spans)
+
+    def totals(self) -> Dict[str, float]:
+        """Totais da execução: bytes transferidos e tokens (prompt/completion)."""
+        totals = {ATTR_BYTES_IN: 0, ATTR_BYTES_OUT: 0, ATTR_PROMPT_TOKENS: 0, ATTR_COMPLETION_TOKENS: 0}
+        for span in self.snapshot():
+            for name in totals:
+                totals[name] += span.attributes.get(name, 0) or 0
+        return totals
+
+    def to_jsonl(self) -> str:
+        return "".join(
+            json.dumps(dict(asdict(span), run_id=self.run_id), ensure_ascii=False, default=str) + "\n"
+            for span in self.snapshot()
+        )
+
+    def to_prometheus(self) -> str:
+        """Métricas agregadas por (tipo, nome) no formato texto de exposição do Prometheus."""
+        durations: Dict[Tuple[str, str], List[float]] = {}
+        errors: Dict[Tuple[str, str], int] = {}
+        transferred: Dict[Tuple[str, str, str], float] = {}
+        tokens: Dict[Tuple[str, str, str], float] = {}
+        for span in self.snapshot():
+            key = (span.kind, span.name)
+            durations.setdefault(key, []).append(span.duration_ms / 1000)
+            errors[key] = errors.get(key, 0) + (span.status != "ok")
+            for direction, attr in (("in", ATTR_BYTES_IN), ("out", ATTR_BYTES_OUT)):
+                if span.attributes.get(attr):
+                    transferred[key + (direction,)] = transferred.get(key + (direction,), 0) + span.attributes[attr]
+            for token_type, attr in (("prompt", ATTR_PROMPT_TOKENS), ("completion", ATTR_COMPLETION_TOKENS)):
+                if span.attributes.get(attr):
+                    tokens[key + (token_type,)] = tokens.get(key + (token_type,), 0) + span.attributes[attr]
+
+        def labels(kind: str, name: str, **extra: str) -> str:
+            pairs = dict(case_id=self.case_id, run_id=self.run_id, kind=kind, name=name, **extra)
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs.items()) + "}"
+
+        prefix = METRIC_PREFIX
+        lines = [
+            f"# HELP {prefix}_span_duration_seconds Duração das spans por tipo e nome.",
+            f"# TYPE {prefix}_span_duration_seconds summary",
+        ]
+        for (kind, name), values in sorted(durations.items()):
+            lines.append(f"{prefix}_span_duration_seconds_sum{labels(kind, name)} {sum(values):.6f}")
+            lines.append(f"{prefix}_span_duration_seconds_count{labels(kind, name)} {len(values)}")
+        lines += [f"# HELP {prefix}_span_errors_total Spans encerradas com erro.", f"# TYPE {prefix}_span_errors_total counter"]
+        for (kind, name), count in sorted(errors.items()):
+            lines.append(f"{prefix}_span_errors_total{labels(kind, name)} {count}")
+        lines += [f"# HELP {prefix}_bytes_transferred_total Bytes enviados (out) e recebidos (in).",
+                  f"# TYPE {prefix}_bytes_transferred_total counter"]
+        for (kind, name, direction), value in sorted(transferred.items()):
+            lines.append(f"{prefix}_bytes_transferred_total{labels(kind, name, direction=direction)} {value:g}")
+        lines += [f"# HELP {prefix}_llm_tokens_total Tokens de prompt e de completion.",
+                  f"# TYPE {prefix}_llm_tokens_total counter"]
+        for (kind, name, token_type), value in sorted(tokens.items()):
+            lines.append(f"{prefix}_llm_tokens_total{labels(kind, name, type=token_type)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: Optional[Path] = None) -> Optional[Path]:
+        """
+        Grava <run_id>.jsonl e <run_id>.prom em TRACE_DIR/<case_id>/.
+        Retorna o caminho do arquivo JSON lines, ou None em caso de falha.
+        """
+        safe_case_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in self.case_id) or "sem_case_id"
+        directory = directory or Path(os.getenv("TRACE_DIR", str(TRACE_DIR_DEFAULT))) / safe_case_id
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            jsonl_path = directory / f"{self.run_id}.jsonl"
+            jsonl_path.write_text(self.to_jsonl(), encoding="utf-8")
+            (directory / f"{self.run_id}.prom").write_text(self.to_prometheus(), encoding="utf-8")
+            return jsonl_path
+        except OSError as e:
+            logger.warning(f"Falha ao exportar as spans do case_id '{self.case_id}': {e}")
+            return None
+
+
+def _escape_label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def tracing_enabled() -> bool:
+    # Lido diretamente (e não via tools.cache.env_flag): as ferramentas importam este módulo.
+    value = os.getenv("TRACING_ENABLED")
+    return value is None or value.strip().lower() in ("1", "true", "sim", "yes", "on")
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _current_tracer.get()
+
+
+@contextmanager
+def trace_scope(tracer: Optional[Tracer]) -> Iterator[Optional[Tracer]]:
+    """Torna `tracer` o coletor de spans do contexto corrente (e das threads que o copiarem)."""
+    token = _current_tracer.set(tracer)
+    if tracer is not None:
+        _ensure_llm_listener()
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+def annotate(**attributes: Any) -> None:
+    """Acrescenta atributos à span corrente (ex: cache_hit=True); sem span ativa, não faz nada."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def _new_span(name: str, kind: str, tracer: Optional[Tracer], attributes: Dict[str, Any]) -> Span:
+    parent = _current_span.get()
+    return Span(
+        name=name,
+        kind=kind,
+        case_id=tracer.case_id if tracer is not None else "",
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent is not None else None,
+        started_at=datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        attributes=dict(attributes),
+    )
+
+
+@contextmanager
+def span(name: str, kind: str = KIND_TOOL, **attributes: Any) -> Iterator[Span]:
+    """
+    Mede o bloco como uma span filha da span corrente. Exceções marcam a span como erro e
+    são propagadas. Sem tracer ativo (fora de um run() ou com TRACING_ENABLED=false) a span
+    é descartada, de modo que o código instrumentado não precisa verificar nada.
+    """
+    tracer = _current_tracer.get()
+    current = _new_span(name, kind, tracer, attributes)
+    token = _current_span.set(current)
+    started_at = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - started_at) * 1000, 3)
+        _current_span.reset(token)
+        if tracer is not None:
+            tracer.record(current)
+
+
+def traced(name: str, kind: str = KIND_TOOL) -> Callable:
+    """
+    Decorador para o _run/_arun das ferramentas: executa o método dentro de uma span e registra
+    o tamanho do resultado; textos de erro devolvidos ao agente ("ERRO: ...") marcam a span como erro.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind) as current:
+                    result = await func(*args, **kwargs)
+                    current.observe_result(result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind) as current:
+                result = func(*args, **kwargs)
+                current.observe_result(result)
+                return result
+        return wrapper
+    return decorator
+
+
+# --- Chamadas ao LLM (eventos da CrewAI) ---
+# LLMCallStarted/Completed/Failed são emitidos de forma síncrona na thread da chamada, então o
+# contexto (tracer e span corrente) é o de quem chamou o LLM. Os tokens vêm do TokenProcess do
+# agente (diferença antes/depois da chamada); sem agente, são estimados pelo tamanho do texto.
+
+_listener_lock = threading.Lock()
+_listener_registered = False
+_open_llm_spans: Dict[int, List[Tuple[Span, float, Tuple[int, int]]]] = {}
+
+
+def _agent_token_counts(agent: Any) -> Tuple[int, int]:
+    process = getattr(agent, "_token_process", None)
+    if process is None:
+        return 0, 0
+    try:
+        summary = process.get_summary()
+        return summary.prompt_tokens or 0, summary.completion_tokens or 0
+    except Exception:
+        return 0, 0
+
+
+def _text_size(value: Any) -> int:
+    if value is None:
+        return 0
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    return len(text.encode("utf-8"))
+
+
+def _on_llm_started(source: Any, event: Any) -> None:
+    tracer = _current_tracer.get()
+    if tracer is None:
+        return
+    current = _new_span(str(getattr(event, "model", None) or "llm"), KIND_LLM, tracer, {
+        "agent_role": getattr(event, "agent_role", None),
+        "task_name": getattr(event, "task_name", None),
+        ATTR_BYTES_OUT: _text_size(getattr(event, "messages", None)),
+    })
+    entry = (current, time.perf_counter(), _agent_token_counts(getattr(event, "from_agent", None)))
+    _open_llm_spans.setdefault(threading.get_ident(), []).append(entry)
+
+
+def _close_llm_span(event: Any, response: Any = None, error: Any = None) -> None:
+    tracer = _current_tracer.get()
+    stack = _open_llm_spans.get(threading.get_ident())
+    if tracer is None or not stack:
+        return
+    current, started_at, (prompt_before, completion_before) = stack.pop()
+    if not stack:
+        _open_llm_spans.pop(threading.get_ident(), None)
+    current.duration_ms = round((time.perf_counter() - started_at) * 1000, 3)
+    prompt_after, completion_after = _agent_token_counts(getattr(event, "from_agent", None))
+    if prompt_after > prompt_before:
+        current.set(prompt_tokens=prompt_after - prompt_before, completion_tokens=completion_after - completion_before)
+    else:
+        current.set(
+            prompt_tokens=current.attributes.get(ATTR_BYTES_OUT, 0) // CHARS_PER_TOKEN_ESTIMATE,
+            completion_tokens=_text_size(response) // CHARS_PER_TOKEN_ESTIMATE,
+            tokens_estimated=True,
+        )
+    current.set(bytes_in=_text_size(response))
+    if error is not None:
+        current.fail(error)
+    tracer.record(current)
+
+
+def _ensure_llm_listener() -> None:
+    """Registra (uma única vez por processo) os handlers de eventos de LLM no barramento da CrewAI."""
+    global _listener_registered
+    with _listener_lock:
+        if _listener_registered:
+            return
+        try:
+            from crewai.events import crewai_event_bus
+            from crewai.events.types.llm_events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent
+        except ImportError as e:
+            logger.warning(f"Eventos de LLM da CrewAI indisponíveis; chamadas ao LLM não serão rastreadas: {e}")
+            _listener_registered = True
+            return
+
+        @crewai_event_bus.on(LLMCallStartedEvent)
+        def _trace_llm_started(source, event):
+            _on_llm_started(source, event)
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        def _trace_llm_completed(source, event):
+            _close_llm_span(event, response=event.response)
+
+        @crewai_event_bus.on(LLMCallFailedEvent)
+        def _trace_llm_failed(source, event):
+            _close_llm_span(event, error=event.error)
+
+        _listener_registered = True